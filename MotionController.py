@@ -3,6 +3,10 @@ import keyinput
 import cv2
 import mediapipe as mp
 import time
+from pwm_steering import PwmSteering
+from stage_timer import StageTimer, CAPTURE, INFERENCE, FEATURES, OUTPUT, RENDER
+from telemetry import open_telemetry
+from async_log import log, logger
 
 mp_drawing = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
@@ -22,6 +26,23 @@ a_pressed = False
 s_pressed = False
 d_pressed = False
 
+# Steering output: 'threshold' holds A/D once the wheel passes turn_threshold,
+# 'pwm' pulses A/D with a duty cycle proportional to the wheel angle
+STEERING_MODE = 'threshold'
+PWM_FREQUENCY = 10  # Steering pulses per second
+PWM_FULL_LOCK = 150  # Height difference between the hands (pixels) for full lock
+pwm_steering = PwmSteering(keyinput.press_key, keyinput.release_key, frequency=PWM_FREQUENCY)
+if STEERING_MODE == 'pwm':
+    pwm_steering.start()
+
+# Latency of each stage of the loop; press 't' in the window for a report
+stage_timer = StageTimer()
+
+# Per-frame state goes to the AIRSYNC_TELEMETRY channel (see telemetry.py)
+# instead of being printed every frame
+TELEMETRY_RATE_HZ = 10
+telemetry = open_telemetry(rate_hz=TELEMETRY_RATE_HZ)
+
 # Function to ensure keys are properly released
 def release_all_keys():
     global w_pressed, a_pressed, s_pressed, d_pressed
@@ -55,19 +76,21 @@ def press_key_safely(key):
             keyinput.press_key('d')
             d_pressed = True
     except Exception as e:
-        print(f"Error pressing key {key}: {e}")
+        log("Error pressing key %s: %s", key, e)
 
 with mp_hands.Hands(
     model_complexity=0,
     min_detection_confidence=0.5,
     min_tracking_confidence=0.5) as hands:
   while cap.isOpened():
+    stage_timer.begin()
     success, image = cap.read(cv2.WINDOW_NORMAL)
     if not success:
-      print("Ignoring empty camera frame.")
+      log("Ignoring empty camera frame.")
       continue
 
     fp = cv2.flip(image, 1)  # --------> flipped_fp
+    stage_timer.mark(CAPTURE)
 
     # Calculating the FPS
     currentTime = time.time()
@@ -84,7 +107,9 @@ with mp_hands.Hands(
     fp.flags.writeable = False
     fp = cv2.cvtColor(fp, cv2.COLOR_BGR2RGB)
     results = hands.process(fp)
+    stage_timer.mark(INFERENCE)
     fpHeight, fpWidth, _ = fp.shape
+    drive_state = 'none'
    
     # Draw the hand annotations on the fp.
     fp.flags.writeable = True
@@ -108,9 +133,9 @@ with mp_hands.Hands(
               # Check if coordinates are valid before appending
               if pixelCoordinatesLandmark is not None:
                   co.append(list(pixelCoordinatesLandmark))
-                  print(f"Added coordinates: {pixelCoordinatesLandmark}")
               else:
-                  print("Warning: Got None coordinates for wrist landmark")
+                  log("Warning: Got None coordinates for wrist landmark")
+    stage_timer.mark(FEATURES)
     
     if len(co) == 2:
         try:
@@ -143,6 +168,7 @@ with mp_hands.Hands(
               ybp = (-1 / m) * (xbp - xm) + ym
         except:
             # Reset all keys if we can't calculate turning
+            pwm_steering.set_steering(0.0)
             release_all_keys()
             continue
 
@@ -154,9 +180,22 @@ with mp_hands.Hands(
         # Adjust the turning threshold to be more responsive for GTA 4
         turn_threshold = 50  # Lowered from 65 for more responsive turning
 
-        if co[0][0] < co[1][0] and co[0][1] - co[1][1] > turn_threshold:
+        if STEERING_MODE == 'pwm':
+            # Left hand lower than the right one steers left (negative)
+            left_hand, right_hand = sorted(co[:2])
+            steering = max(-1.0, min(1.0, (right_hand[1] - left_hand[1]) / PWM_FULL_LOCK))
+            pwm_steering.set_steering(steering)
+            drive_state = 'steer'
+            if s_pressed:
+                keyinput.release_key('s')
+                s_pressed = False
+            press_key_safely('w')
+
+            cv2.putText(fp, f"Steering {steering:+.2f}", (130,30), font, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
+
+        elif co[0][0] < co[1][0] and co[0][1] - co[1][1] > turn_threshold:
             # When turning left, also maintain forward acceleration for GTA 4
-            print("Turning Left")
+            drive_state = 'left'
             # Release opposite keys first
             if s_pressed:
                 keyinput.release_key('s')
@@ -173,7 +212,7 @@ with mp_hands.Hands(
             cv2.line(fp, (int(xap), int(yap)), (int(xm), int(ym)), (255, 0, 0), 20)
 
         elif co[1][0] > co[0][0] and co[1][1] - co[0][1] > turn_threshold:
-            print("Turning Right")
+            drive_state = 'right'
             # Release opposite keys first
             if s_pressed:
                 keyinput.release_key('s')
@@ -190,7 +229,7 @@ with mp_hands.Hands(
             cv2.line(fp, (int(xbp), int(ybp)), (int(xm), int(ym)), (255, 0, 0), 20)
 
         else:
-            print("keeping straight")
+            drive_state = 'straight'
             # Release turning keys
             if a_pressed:
                 keyinput.release_key('a')
@@ -212,7 +251,8 @@ with mp_hands.Hands(
                 cv2.line(fp, (int(xap), int(yap)), (int(xm), int(ym)), (15,185,255), 20)
 
     elif len(co)==1:
-       print("Reverse")
+       drive_state = 'reverse'
+       pwm_steering.set_steering(0.0)
        # Release forward and turning keys
        if w_pressed:
            keyinput.release_key('w')
@@ -230,15 +270,32 @@ with mp_hands.Hands(
        cv2.putText(fp, "Reverse", (130,30), font, 1.0, (0, 0, 255), 2, cv2.LINE_AA)
     else:
        # If no hands detected, release all keys for safety
+       pwm_steering.set_steering(0.0)
        release_all_keys()
+    stage_timer.mark(OUTPUT)
 
     cv2.imshow('Motion controlled game system using computer vision', fp)
     
-    if cv2.waitKey(5) & 0xFF == ord('q'):
+    key = cv2.waitKey(5) & 0xFF
+    stage_timer.mark(RENDER)
+    stage_timer.end()
+    if telemetry.due():
+      held = ''.join(k for k, pressed in (('w', w_pressed), ('a', a_pressed), ('s', s_pressed), ('d', d_pressed)) if pressed)
+      telemetry.frame(fps=round(fps, 1), state=drive_state, wrists=co, keys=held, lat=stage_timer.last_ms())
+    if key == ord('t'):
+      stage_timer.report()
+    if key == ord('q'):
       # Clean up before exiting
       release_all_keys()
       break
 
+# Write queued log lines before the exit reports
+logger.stop()
+pwm_steering.stop()
+pwm_steering.report()
+stage_timer.report()
+telemetry.close()
+logger.report()
 cap.release()
 cv2.destroyAllWindows()
 
@@ -0,0 +1,185 @@
+"""
+Timed key actions for AirSync
+Taps (press now, release later), pulses and key sequences are scheduled on a
+heap of (due time, action) entries and executed by a small background thread,
+so code in a frame loop never has to sleep to time a key.
+
+The clock is injectable: pass a fake clock and call run_due() by hand to step
+through a schedule deterministically without the thread.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class ActionScheduler:
+    """
+    Heap-based scheduler for delayed callbacks.
+
+    Args:
+        clock: Callable returning the current time in seconds
+            (time.perf_counter by default)
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._heap = []
+        self._counter = itertools.count()  # Keeps equal due times in FIFO order
+        self._cancelled = set()
+        self._condition = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+    def call_at(self, due, callback, *args):
+        """
+        Run callback(*args) at clock time `due`
+
+        Returns:
+            handle: Identifier that can be passed to cancel()
+        """
+        with self._condition:
+            handle = next(self._counter)
+            heapq.heappush(self._heap, (due, handle, callback, args))
+            # Wake the thread if this is now the earliest entry
+            if self._heap[0][1] == handle:
+                self._condition.notify()
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) after `delay` seconds"""
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def cancel(self, handle):
+        """Cancel a scheduled callback (no-op if it already ran)"""
+        with self._condition:
+            if any(entry[1] == handle for entry in self._heap):
+                self._cancelled.add(handle)
+
+    def pending(self):
+        """Number of scheduled callbacks that have not run yet"""
+        with self._condition:
+            return len(self._heap) - len(self._cancelled)
+
+    def next_due(self):
+        """Clock time of the earliest scheduled callback, or None"""
+        with self._condition:
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now=None):
+        """
+        Run every callback that is due
+
+        Args:
+            now: Time to run up to (defaults to the clock)
+
+        Returns:
+            count: Number of callbacks run
+        """
+        if now is None:
+            now = self.clock()
+        count = 0
+        while True:
+            with self._condition:
+                if not self._heap or self._heap[0][0] > now:
+                    return count
+                _, handle, callback, args = heapq.heappop(self._heap)
+                if handle in self._cancelled:
+                    self._cancelled.discard(handle)
+                    continue
+            # Callbacks run outside the lock so they may schedule more actions
+            callback(*args)
+            count += 1
+
+    # Key helpers -----------------------------------------------------------
+
+    def tap(self, key, duration, press, release):
+        """Press a key now and release it after `duration` seconds"""
+        press(key)
+        return self.call_later(duration, release, key)
+
+    def pulse(self, key, on_time, off_time, count, press, release, start_delay=0.0):
+        """
+        Press and release a key `count` times
+
+        Returns:
+            handles: Handles of every scheduled press and release
+        """
+        start = self.clock() + start_delay
+        handles = []
+        for i in range(count):
+            t = start + i * (on_time + off_time)
+            handles.append(self.call_at(t, press, key))
+            handles.append(self.call_at(t + on_time, release, key))
+        return handles
+
+    def sequence(self, steps, start_delay=0.0):
+        """
+        Schedule a list of (delay, callback, args) steps; each delay is
+        relative to the previous step
+
+        Returns:
+            handles: Handles of every scheduled step
+        """
+        t = self.clock() + start_delay
+        handles = []
+        for delay, callback, args in steps:
+            t += delay
+            handles.append(self.call_at(t, callback, *args))
+        return handles
+
+    # Background thread -----------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stop:
+                    return
+                if self._heap:
+                    timeout = self._heap[0][0] - self.clock()
+                    if timeout > 0:
+                        self._condition.wait(timeout)
+                else:
+                    self._condition.wait()
+            self.run_due()
+
+    def start(self):
+        """Start the background thread (safe to call more than once)"""
+        with self._condition:
+            if self._thread is None:
+                self._stop = False
+                self._thread = threading.Thread(target=self._run, name="ActionScheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, flush=True):
+        """
+        Stop the background thread
+
+        Args:
+            flush: Run every remaining callback immediately (so no key is
+                left pressed) instead of dropping them
+        """
+        with self._condition:
+            self._stop = True
+            self._condition.notify()
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join(timeout=1.0)
+        if flush:
+            self.run_due(now=float('inf'))
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """Shared, already started scheduler used by the key input modules"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = ActionScheduler().start()
+        return _default_scheduler
@@ -0,0 +1,149 @@
+"""
+Asynchronous, rate-limited logging for AirSync
+When stdout is a pipe (e.g. the WPF host reading the engine's output), a
+print() blocks as soon as the reader falls behind, and a message printed
+every frame then stalls the vision loop. Messages from hot paths go through
+log() instead: it formats and enqueues the line, and a background thread
+does the writing.
+
+Each message key (by default the unformatted message) is rate limited:
+repeats within the interval are counted instead of queued, and the next
+line that gets through says how many were suppressed. If the writer cannot
+keep up and the queue is full, lines are dropped and counted, never waited
+for.
+
+    from async_log import log
+    log("Error pressing key %s: %s", key, e)
+    log("Failed to capture frame. Retrying...", key='capture')
+"""
+
+import atexit
+import queue
+import sys
+import threading
+import time
+
+DEFAULT_INTERVAL = 1.0  # Seconds between two lines with the same key
+DEFAULT_CAPACITY = 1024  # Queued lines before new ones are dropped
+
+
+class AsyncLogger:
+    """
+    Queue-based logger with a background writer thread
+
+    Args:
+        stream: File object to write to; defaults to sys.stdout at write time
+        interval: Minimum seconds between two lines with the same key
+        capacity: Lines that may wait for the writer before new ones are dropped
+    """
+
+    def __init__(self, stream=None, interval=DEFAULT_INTERVAL, capacity=DEFAULT_CAPACITY):
+        self.stream = stream
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=capacity)
+        self._next_time = {}   # Key -> earliest time the key may log again
+        self._suppressed = {}  # Key -> lines suppressed since it last logged
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # Statistics
+        self.queued = 0
+        self.written = 0
+        self.suppressed = 0
+        self.dropped = 0
+
+    def log(self, message, *args, key=None, interval=None):
+        """
+        Queue a line unless its key logged within the interval
+
+        Args:
+            message: Message, %-formatted with args if any are given; formatting
+                is skipped when the line is suppressed
+            key: Rate limit key; defaults to the unformatted message
+            interval: Seconds between lines with this key (default: the logger's)
+
+        Returns:
+            queued: False if the line was suppressed or dropped
+        """
+        if key is None:
+            key = message
+        now = time.perf_counter()
+        with self._lock:
+            if now < self._next_time.get(key, 0.0):
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                self.suppressed += 1
+                return False
+            self._next_time[key] = now + (self.interval if interval is None else interval)
+            repeats = self._suppressed.pop(key, 0)
+
+        line = message % args if args else message
+        if repeats:
+            line = f"{line} ({repeats} similar suppressed)"
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.queued += 1
+        return True
+
+    def _run(self):
+        while True:
+            line = self._queue.get()
+            if line is None:
+                return
+            stream = self.stream or sys.stdout
+            try:
+                stream.write(line + '\n')
+                stream.flush()
+            except (OSError, ValueError):
+                # Closed or broken stream: nothing left to report to
+                pass
+            self.written += 1
+
+    def start(self):
+        """Start the writer thread (done automatically by the first log())"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="async-log", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """Write what is queued (waiting at most timeout seconds) and stop the writer"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary with lines queued, written, suppressed by rate
+                limiting and dropped on a full queue
+        """
+        return {
+            'queued': self.queued,
+            'written': self.written,
+            'suppressed': self.suppressed,
+            'dropped': self.dropped,
+        }
+
+    def report(self):
+        """Print the suppressed/dropped counts if anything was held back"""
+        stats = self.summary()
+        if stats['suppressed'] or stats['dropped']:
+            print(f"Log: {stats['written']} lines written, {stats['suppressed']} suppressed "
+                  f"by rate limiting, {stats['dropped']} dropped on a full queue")
+
+
+# Shared logger for the engine; drained at interpreter exit
+logger = AsyncLogger()
+log = logger.log
+atexit.register(logger.stop)
@@ -0,0 +1,237 @@
+"""
+Streaming calibration statistics for AirSync
+Calibration samples are folded into running accumulators instead of being
+kept in lists:
+
+    RunningStats     Welford mean/variance (scalars or vectors)
+    CircularMean     Mean of angles via summed unit vectors, so a neutral
+                     near +/-180 degrees averages correctly
+    MadGate          Rejects samples far from the median of a small recent
+                     window, scaled by the median absolute deviation (MAD)
+
+CalibrationAccumulator combines them for the steering wheel and decides when
+calibration can stop: as soon as the confidence intervals of the neutral
+angle and radius are tight, instead of always waiting for a fixed number of
+frames.
+"""
+
+import collections
+import math
+
+import numpy as np
+
+MAD_TO_STD = 1.4826  # MAD of normally distributed data times this is the standard deviation
+
+
+def angle_difference(a, b):
+    """Signed difference a - b in degrees, wrapped to [-180, 180)"""
+    return (a - b + 180.0) % 360.0 - 180.0
+
+
+class RunningStats:
+    """
+    Welford's online mean and variance
+
+    Args:
+        shape: Shape of each sample (() for scalars)
+    """
+
+    def __init__(self, shape=()):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """Sample variance (0 until there are two samples)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self.m2)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def ci_halfwidth(self, z=1.96):
+        """Half width of the confidence interval of the mean"""
+        if self.count < 2:
+            return np.full_like(self.m2, np.inf)
+        return z * self.std / math.sqrt(self.count)
+
+
+class CircularMean:
+    """Running mean of angles in degrees"""
+
+    def __init__(self):
+        self.count = 0
+        self.sin_sum = 0.0
+        self.cos_sum = 0.0
+
+    def add(self, angle):
+        rad = math.radians(angle)
+        self.count += 1
+        self.sin_sum += math.sin(rad)
+        self.cos_sum += math.cos(rad)
+
+    @property
+    def mean(self):
+        """Mean direction in degrees, in (-180, 180]"""
+        return math.degrees(math.atan2(self.sin_sum, self.cos_sum))
+
+    @property
+    def resultant_length(self):
+        """Length of the mean unit vector (1 = all angles equal, 0 = spread evenly)"""
+        if self.count == 0:
+            return 0.0
+        return math.hypot(self.sin_sum, self.cos_sum) / self.count
+
+    @property
+    def std(self):
+        """Circular standard deviation in degrees"""
+        r = self.resultant_length
+        if r <= 0.0:
+            return math.inf
+        return math.degrees(math.sqrt(max(0.0, -2.0 * math.log(r))))
+
+    def ci_halfwidth(self, z=1.96):
+        """Approximate half width of the confidence interval of the mean angle"""
+        if self.count < 2:
+            return math.inf
+        return z * self.std / math.sqrt(self.count)
+
+
+class MadGate:
+    """
+    Outlier test against the median of the last `window` samples
+
+    A sample is an outlier if any component is more than `threshold` robust
+    standard deviations (MAD * 1.4826, at least `floor`) from the window
+    median. Every sample enters the window, so the median follows genuine
+    changes; the first `min_samples` samples are always accepted.
+
+    Args:
+        window: Number of recent samples the median is taken over
+        threshold: Robust standard deviations a sample may be away
+        floor: Per-component minimum scale, so near-constant data does not
+            reject every tiny variation
+        min_samples: Samples to collect before rejecting anything
+    """
+
+    def __init__(self, window=15, threshold=3.5, floor=0.0, min_samples=5):
+        self.samples = collections.deque(maxlen=window)
+        self.threshold = threshold
+        self.floor = np.asarray(floor, dtype=np.float64)
+        self.min_samples = min_samples
+        self.rejected = 0
+
+    def check(self, sample):
+        """
+        Returns:
+            accepted: False if the sample is an outlier
+        """
+        sample = np.asarray(sample, dtype=np.float64)
+        accepted = True
+        if len(self.samples) >= self.min_samples:
+            history = np.array(self.samples)
+            median = np.median(history, axis=0)
+            scale = np.maximum(np.median(np.abs(history - median), axis=0) * MAD_TO_STD, self.floor)
+            accepted = bool(np.all(np.abs(sample - median) <= self.threshold * scale))
+        self.samples.append(sample)
+        if not accepted:
+            self.rejected += 1
+        return accepted
+
+
+class CalibrationAccumulator:
+    """
+    Neutral wheel centre, radius and angle from a stream of frames
+
+    Args:
+        min_frames: Accepted frames needed before stopping early
+        max_frames: Accepted frames after which calibration always stops
+        angle_ci: Stop once the neutral angle is known to within this many degrees
+        radius_ci: Stop once the radius is known to within this fraction of itself
+        mad_threshold: Outlier threshold in robust standard deviations
+    """
+
+    def __init__(self, min_frames=15, max_frames=60, angle_ci=0.5, radius_ci=0.02, mad_threshold=3.5):
+        self.min_frames = min_frames
+        self.max_frames = max_frames
+        self.angle_ci = angle_ci
+        self.radius_ci = radius_ci
+        self.center = RunningStats(shape=(2,))
+        self.radius = RunningStats()
+        self.angle = CircularMean()
+        # Components: angle deviation (deg), radius, centre x, centre y;
+        # floors are about one pixel / a tenth of a degree at 640x480
+        self.gate = MadGate(threshold=mad_threshold, floor=(0.1, 0.002, 0.002, 0.002))
+        self._reference_angle = None
+
+    @property
+    def accepted(self):
+        return self.radius.count
+
+    @property
+    def rejected(self):
+        return self.gate.rejected
+
+    def add(self, center, radius, angle):
+        """
+        Add one frame's wheel measurement
+
+        Returns:
+            accepted: False if the frame was rejected as an outlier
+        """
+        if self._reference_angle is None:
+            self._reference_angle = angle
+        # Angles enter the outlier test as wrapped deviations, so values on
+        # both sides of +/-180 degrees stay close together
+        deviation = angle_difference(angle, self._reference_angle)
+        if not self.gate.check((deviation, radius, center[0], center[1])):
+            return False
+
+        self.center.add(np.asarray(center, dtype=np.float64))
+        self.radius.add(float(radius))
+        self.angle.add(float(angle))
+        return True
+
+    def converged(self):
+        """True once both confidence intervals are within their targets"""
+        return (self.angle.ci_halfwidth() <= self.angle_ci and
+                self.radius.ci_halfwidth() <= self.radius_ci * self.radius.mean)
+
+    def done(self):
+        """True when calibration can stop"""
+        if self.accepted >= self.max_frames:
+            return True
+        return self.accepted >= self.min_frames and self.converged()
+
+    def progress(self):
+        """Rough completion between 0 and 1 for display"""
+        return min(1.0, self.accepted / self.max_frames) if not self.done() else 1.0
+
+    def result(self):
+        """
+        Returns:
+            center: Mean wheel centre as a (2,) array
+            radius: Mean wheel radius
+            angle: Circular mean wheel angle in degrees
+        """
+        return self.center.mean.copy(), float(self.radius.mean), self.angle.mean
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary with frame counts and confidence half widths
+        """
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'angle_ci_deg': self.angle.ci_halfwidth(),
+            'angle_std_deg': self.angle.std,
+            'radius_ci': float(self.radius.ci_halfwidth()),
+        }
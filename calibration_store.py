@@ -0,0 +1,88 @@
+"""
+Persisted steering calibration for AirSync
+The neutral wheel pose is saved to a per-user profile after a full
+calibration. On the next launch it is loaded instantly and only checked
+against a few frames; the full calibration runs again only if the camera
+changed or the saved neutral no longer matches the user's hands.
+
+Profile file (JSON):
+    {"center": [x, y], "radius": r, "angle": degrees,
+     "resolution": [width, height], "camera_id": 0, "created": unix time}
+"""
+
+import collections
+import json
+import os
+import time
+
+from calibration_stats import angle_difference
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.expanduser('~'), '.airsync', 'calibration.json')
+
+CalibrationProfile = collections.namedtuple(
+    'CalibrationProfile', ['center', 'radius', 'angle', 'resolution', 'camera_id', 'created'])
+
+
+def save_profile(center, radius, angle, resolution, camera_id, path=DEFAULT_PROFILE_PATH):
+    """
+    Save a calibration result (written atomically)
+
+    Returns:
+        profile: The saved CalibrationProfile
+    """
+    profile = CalibrationProfile(
+        [float(center[0]), float(center[1])], float(radius), float(angle),
+        [int(resolution[0]), int(resolution[1])], camera_id, time.time())
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(profile._asdict(), f, indent=2)
+    os.replace(tmp_path, path)
+    return profile
+
+
+def load_profile(resolution, camera_id, path=DEFAULT_PROFILE_PATH):
+    """
+    Load the saved calibration if it was made with the same camera setup
+
+    Args:
+        resolution: Current (width, height) of the camera
+        camera_id: Current camera index
+
+    Returns:
+        profile: CalibrationProfile, or None if there is no usable profile
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        profile = CalibrationProfile(**data)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Ignoring unreadable calibration profile {path}: {e}")
+        return None
+
+    if list(profile.resolution) != [int(resolution[0]), int(resolution[1])] or profile.camera_id != camera_id:
+        print("Camera changed since the last calibration")
+        return None
+    return profile
+
+
+def profile_matches(profile, angle, radius, angle_tolerance=8.0, radius_tolerance=0.25):
+    """
+    Check whether freshly measured wheel values agree with a saved profile
+
+    Args:
+        profile: Saved CalibrationProfile
+        angle: Mean wheel angle measured during verification (degrees)
+        radius: Mean wheel radius measured during verification
+        angle_tolerance: Largest accepted neutral angle difference in degrees
+        radius_tolerance: Largest accepted relative radius difference
+
+    Returns:
+        matches: True if the saved neutral can be reused
+    """
+    if abs(angle_difference(angle, profile.angle)) > angle_tolerance:
+        return False
+    return abs(radius - profile.radius) <= radius_tolerance * profile.radius
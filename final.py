@@ -18,16 +18,72 @@ import time
 import collections
 import vgamepad as vg
 import threading
+from landmark_filter import LandmarkFilterBank, landmarks_to_array
+from gesture_table import GestureTable, pack_hands
+from gesture_state import GestureStateMachine, HysteresisGate, TransitionCounter
+from template_classifier import TemplateClassifier, DEFAULT_TEMPLATE_PATH
+from motion_gestures import MotionGestureRecognizer, TRACKED_LANDMARKS
+from output_state import DiffingGamepadOutput
+from output_scheduler import OutputScheduler
+from preview import PreviewThread, RenderStats, report_render_stats
+from overlay_renderer import OverlayRenderer
+from shared_preview import SharedPreviewPublisher
+from calibration_stats import CalibrationAccumulator
+from calibration_store import DEFAULT_PROFILE_PATH, load_profile, profile_matches, save_profile
+from neutral_drift import NeutralDriftEstimator
+from stage_timer import StageTimer, CAPTURE, INFERENCE, FEATURES, OUTPUT, RENDER
+from telemetry import open_telemetry
+from async_log import log, logger
+from flight_recorder import FlightRecorder, field, DEFAULT_DUMP_DIR
+
+# Launch time, for reporting how long it takes until the first input is sent
+startup_time = time.perf_counter()
 
 # Configuration constants
 STEERING_SENSITIVITY = 3.5  # Multiplier for steering angle
 THUMB_EXTENSION_THRESHOLD = 0.08  # Distance threshold for detecting extended thumbs
 FINGER_EXTENSION_THRESHOLD = 0.1  # Distance threshold for detecting extended fingers
+THUMB_ENTER_THRESHOLD = 0.09  # Thumb counts as extended above this distance...
+THUMB_EXIT_THRESHOLD = 0.07  # ...and as closed again only below this one
+FINGER_HYSTERESIS = 0.01  # Margin around the index finger extension decision
+GESTURE_MIN_HOLD_MS = 80  # Minimum time a gesture state is held before it can flip
+GESTURE_CLASSIFIER = 'rules'  # 'rules' (finger checks) or 'templates' (recorded two-hand templates)
+TEMPLATE_PATH = DEFAULT_TEMPLATE_PATH  # Recorded with: python template_classifier.py record <label> --hands 2
+OUTPUT_RATE_HZ = 250  # Rate at which the output thread sends gamepad state, independent of camera FPS
+OUTPUT_SPIN = 0.0001  # Seconds the output thread busy-waits before each tick; more is steadier but holds the GIL longer, 0 only sleeps
+MOTION_ACTIONS = {'flick_up': 'gear_up', 'flick_down': 'gear_down'}  # Right hand motion gestures -> actions
+MOTION_TRACK_POINT = 2  # Tracked point for motion gestures (0 = wrist, 2 = index fingertip)
+MOTION_MIN_EXTENT = 0.06  # Minimum fingertip travel (fraction of the frame) for a motion gesture
 WHEEL_ROTATION_SMOOTHING = 0.5  # Smoothing factor (0-1) for steering
 DEAD_ZONE = 3.0  # Degrees of movement to ignore (dead zone)
-CALIBRATION_FRAMES = 60  # Number of frames to use for calibration
+CALIBRATION_FRAMES = 60  # Maximum number of frames to use for calibration
+CALIBRATION_MIN_FRAMES = 15  # Calibration may stop after this many frames once it is precise enough
+CALIBRATION_ANGLE_CI = 0.5  # Target 95% confidence half width of the neutral angle (degrees)
+CALIBRATION_RADIUS_CI = 0.02  # Target 95% confidence half width of the wheel radius (fraction)
+CALIBRATION_PROFILE_PATH = DEFAULT_PROFILE_PATH  # Saved neutral pose, reused on the next launch
+VERIFY_FRAMES = 8  # Frames used to check a saved calibration against the current pose
+VERIFY_TIMEOUT = 5.0  # Seconds to wait for both hands before recalibrating anyway
+VERIFY_ANGLE_TOLERANCE = 8.0  # Largest neutral angle change (degrees) that keeps the saved calibration
+CAMERA_ID = 0  # Camera index passed to cv2.VideoCapture
+DRIFT_MAX_OFFSET = 10.0  # Largest automatic correction of the neutral angle in degrees (0 disables it)
+DRIFT_TIME_CONSTANT = 30.0  # Seconds of steady straight driving to absorb most of a neutral drift
+DRIFT_STEADY_STD = 1.0  # Steering must vary less than this (degrees) to count as holding straight
+DRIFT_NEAR_NEUTRAL = 6.0  # Only poses within this many degrees of neutral are learned
 MAX_STEERING_ANGLE = 180  # Maximum degrees for full steering
 FULL_TURN_ANGLE = 90.0  # Angle at which steering reaches maximum (full turn)
+FINGERTIP_MIN_CUTOFF = 1.5  # Landmark smoothing cutoff (Hz) for fingertips
+FINGERTIP_BETA = 0.05  # Landmark smoothing speed coefficient for fingertips
+PALM_MIN_CUTOFF = 0.8  # Landmark smoothing cutoff (Hz) for wrist, knuckles and joints
+PALM_BETA = 0.01  # Landmark smoothing speed coefficient for palm points
+DISPLAY_MODE = 'preview'  # 'inline' (draw every frame), 'preview' (draw on a background thread),
+                          # 'shared' (viewer process via shared memory) or 'headless' (no window)
+PREVIEW_FPS = 15  # Frame rate of the preview in 'preview' and 'shared' modes
+STAGE_REPORT_INTERVAL = 0  # Seconds between stage timing reports (0 = on exit and on 'T' in the window)
+TELEMETRY_RATE_HZ = 10  # Frame records per second on the AIRSYNC_TELEMETRY channel (see telemetry.py)
+FLIGHT_RECORDER_SECONDS = 10  # History kept by the flight recorder (at up to 60 FPS)
+FLIGHT_RECORDER_DIR = DEFAULT_DUMP_DIR  # Where dumps go; view with: python flight_recorder.py <dump>
+FLIGHT_JUMP_THRESHOLD = 0.4  # Joystick change within one frame that counts as an anomaly and triggers a dump
+FLIGHT_POST_TRIGGER = 2.0  # Seconds still recorded after an anomaly before the dump is taken
 
 # Initialize MediaPipe
 mp_hands = mp.solutions.hands
@@ -41,8 +97,37 @@ hands = mp_hands.Hands(
     min_tracking_confidence=0.5
 )
 
-# Create virtual gamepad
+# Create virtual gamepad; only state changes are sent to it
 gamepad = vg.VX360Gamepad()
+gamepad_output = DiffingGamepadOutput(gamepad)
+
+# Buttons in the order they appear in the published output state
+OUTPUT_BUTTONS = (
+    vg.XUSB_BUTTON.XUSB_GAMEPAD_Y,               # Handbrake
+    vg.XUSB_BUTTON.XUSB_GAMEPAD_A,               # A button
+    vg.XUSB_BUTTON.XUSB_GAMEPAD_RIGHT_SHOULDER,  # Gear up
+    vg.XUSB_BUTTON.XUSB_GAMEPAD_LEFT_SHOULDER,   # Gear down
+)
+
+
+def apply_output_state(state):
+    """
+    Push a published output state to the gamepad (runs on the output thread)
+    
+    Args:
+        state: [joystick_x, left_trigger, right_trigger, *OUTPUT_BUTTONS states]
+    """
+    gamepad_output.set_left_joystick(state[0])
+    gamepad_output.set_triggers(state[1], state[2])
+    for button, pressed in zip(OUTPUT_BUTTONS, state[3:]):
+        gamepad_output.set_button(button, pressed)
+    gamepad_output.flush()
+
+
+# Target state written by the vision loop, sent at a fixed rate by the output thread
+target_output = [0.0, 0.0, 0.0] + [False] * len(OUTPUT_BUTTONS)
+output_scheduler = OutputScheduler(apply_output_state, target_output, rate_hz=OUTPUT_RATE_HZ,
+                                   spin=OUTPUT_SPIN)
 
 # For storing hand position history for prediction
 left_hand_history = collections.deque(maxlen=5)
@@ -51,6 +136,81 @@ right_hand_history = collections.deque(maxlen=5)
 # For smoothing steering input
 steering_history = collections.deque(maxlen=5)
 
+# Smooths all landmarks of both hands (slot 0 = left, slot 1 = right)
+landmark_filter = LandmarkFilterBank(
+    max_hands=2,
+    tip_min_cutoff=FINGERTIP_MIN_CUTOFF, tip_beta=FINGERTIP_BETA,
+    palm_min_cutoff=PALM_MIN_CUTOFF, palm_beta=PALM_BETA)
+raw_landmarks = np.zeros((2, 21, 3), dtype=np.float32)
+
+# Hysteresis + minimum hold between finger features and gamepad output
+gesture_gates = GestureStateMachine({
+    'left_thumb': HysteresisGate(THUMB_ENTER_THRESHOLD, THUMB_EXIT_THRESHOLD, GESTURE_MIN_HOLD_MS),
+    'right_thumb': HysteresisGate(THUMB_ENTER_THRESHOLD, THUMB_EXIT_THRESHOLD, GESTURE_MIN_HOLD_MS),
+    'left_index': HysteresisGate(FINGER_HYSTERESIS, -FINGER_HYSTERESIS, GESTURE_MIN_HOLD_MS),
+})
+gesture_transitions = TransitionCounter()
+
+# Swipe/flick/circle recognition on the right hand's trajectory
+motion_recognizer = MotionGestureRecognizer(
+    track_point=MOTION_TRACK_POINT, min_extent=MOTION_MIN_EXTENT)
+
+# Render cost of the preview when it is drawn in the control loop ('inline' mode)
+render_stats = RenderStats()
+
+# Latency of each stage of the control loop
+stage_timer = StageTimer()
+
+# Machine-readable JSON lines for the host, separate from the printed log
+telemetry = open_telemetry(rate_hz=TELEMETRY_RATE_HZ)
+
+# Last seconds of landmarks, filter state, features and outputs, dumped on
+# request ('R' in the window), on a crash or after a steering jump
+FLIGHT_FEATURES = ('center_x', 'center_y', 'radius', 'wheel_angle', 'neutral_angle',
+                   'raw_steering', 'steering', 'smoothed_steering', 'fps')
+FLIGHT_OUTPUTS = ('joystick', 'left_trigger', 'right_trigger', 'handbrake', 'button_a',
+                  'gear_up', 'gear_down')
+flight_recorder = FlightRecorder({
+    'landmarks': field((2, 21, 3)),        # Raw MediaPipe landmarks (left, right)
+    'smoothed': field((2, 21, 3)),         # Landmark filter value...
+    'derivative': field((2, 21, 3)),       # ...and its speed estimate
+    'features': field((len(FLIGHT_FEATURES),), labels=FLIGHT_FEATURES),
+    'outputs': field((len(FLIGHT_OUTPUTS),), labels=FLIGHT_OUTPUTS),
+    'tracking': field((), np.uint8, 0),    # 0 = no hands, 1 = predicted, 2 = both hands
+}, capacity=FLIGHT_RECORDER_SECONDS * 60, dump_dir=FLIGHT_RECORDER_DIR)
+
+# Hand drawing styles are built once instead of per hand per frame
+HAND_LANDMARK_STYLE = mp_drawing_styles.get_default_hand_landmarks_style()
+HAND_CONNECTION_STYLE = mp_drawing_styles.get_default_hand_connections_style()
+
+
+def draw_hand(image, hand_landmarks):
+    """Draw one hand's landmarks and connections with the cached styles"""
+    mp_drawing.draw_landmarks(
+        image, hand_landmarks, mp_hands.HAND_CONNECTIONS,
+        HAND_LANDMARK_STYLE, HAND_CONNECTION_STYLE)
+
+
+overlay = OverlayRenderer(draw_hand)
+
+
+def smooth_hand_landmarks(landmarks_left, landmarks_right):
+    """
+    Run both hands through the landmark filter bank
+    
+    Args:
+        landmarks_left: MediaPipe landmark list for the left hand
+        landmarks_right: MediaPipe landmark list for the right hand
+        
+    Returns:
+        smoothed_left: (21, 3) array of smoothed left hand landmarks
+        smoothed_right: (21, 3) array of smoothed right hand landmarks
+    """
+    landmarks_to_array(landmarks_left, out=raw_landmarks[0])
+    landmarks_to_array(landmarks_right, out=raw_landmarks[1])
+    smoothed = landmark_filter.update(raw_landmarks, time.perf_counter())
+    return smoothed[0], smoothed[1]
+
 
 def detect_steering_wheel(landmarks_left, landmarks_right):
     """
@@ -58,8 +218,8 @@ def detect_steering_wheel(landmarks_left, landmarks_right):
     based on the positions of both hands.
     
     Args:
-        landmarks_left: Array of landmarks for the left hand
-        landmarks_right: Array of landmarks for the right hand
+        landmarks_left: (21, 3) array of landmarks for the left hand
+        landmarks_right: (21, 3) array of landmarks for the right hand
         
     Returns:
         wheel_center: Center point of the wheel (x, y)
@@ -67,8 +227,8 @@ def detect_steering_wheel(landmarks_left, landmarks_right):
         wheel_angle: Current angle of the wheel
     """
     # Find center point between wrists
-    left_wrist = np.array([landmarks_left[0].x, landmarks_left[0].y])
-    right_wrist = np.array([landmarks_right[0].x, landmarks_right[0].y])
+    left_wrist = landmarks_left[0, :2].astype(np.float64)
+    right_wrist = landmarks_right[0, :2].astype(np.float64)
     
     wheel_center = (left_wrist + right_wrist) / 2
     wheel_radius = np.linalg.norm(right_wrist - left_wrist) / 2
@@ -104,104 +264,252 @@ def calculate_steering_from_neutral(current_angle, neutral_angle):
     return angle_diff
 
 
-def is_thumb_extended(hand_landmarks, is_left_hand):
+def thumb_extension(hand_landmarks):
     """
-    Detect if the thumb is extended (up) or closed (down)
+    Measure how far the thumb is extended
     
     Args:
-        hand_landmarks: Array of landmarks for the hand
-        is_left_hand: Boolean indicating if this is the left hand
+        hand_landmarks: (21, 3) array of landmarks for the hand
         
     Returns:
-        is_extended: True if thumb is extended/up, False if closed/down
+        distance: Distance from thumb tip to index finger base
     """
     # Get thumb tip and base positions
-    thumb_tip = np.array([hand_landmarks[4].x, hand_landmarks[4].y])
-    thumb_base = np.array([hand_landmarks[2].x, hand_landmarks[2].y])
+    thumb_tip = hand_landmarks[4, :2]
+    thumb_base = hand_landmarks[2, :2]
     
     # Get index finger base position (for reference)
-    index_base = np.array([hand_landmarks[5].x, hand_landmarks[5].y])
+    index_base = hand_landmarks[5, :2]
     
     # Calculate distance from thumb tip to index finger base
-    distance = np.linalg.norm(thumb_tip - index_base)
+    return np.linalg.norm(thumb_tip - index_base)
+
+
+def is_thumb_extended(hand_landmarks, is_left_hand):
+    """
+    Detect if the thumb is extended (up) or closed (down) with a single cutoff
     
-    # Determine if thumb is extended based on threshold
-    return distance > THUMB_EXTENSION_THRESHOLD
+    Args:
+        hand_landmarks: (21, 3) array of landmarks for the hand
+        is_left_hand: Boolean indicating if this is the left hand
+        
+    Returns:
+        is_extended: True if thumb is extended/up, False if closed/down
+    """
+    return thumb_extension(hand_landmarks) > THUMB_EXTENSION_THRESHOLD
 
 
-def is_index_finger_extended(hand_landmarks):
+def index_finger_extension(hand_landmarks):
     """
-    Detect if the index finger is extended (up)
+    Measure how clearly the index finger is extended
     
     Args:
-        hand_landmarks: Array of landmarks for the hand
+        hand_landmarks: (21, 3) array of landmarks for the hand
         
     Returns:
-        is_extended: True if index finger is extended/up
+        margin: Positive when the finger is extended, negative when bent
     """
     # Get index finger tip, middle knuckle, and base
-    index_tip = np.array([hand_landmarks[8].x, hand_landmarks[8].y])
-    index_middle = np.array([hand_landmarks[6].x, hand_landmarks[6].y])
-    index_base = np.array([hand_landmarks[5].x, hand_landmarks[5].y])
+    index_tip = hand_landmarks[8, :2]
+    index_middle = hand_landmarks[6, :2]
+    index_base = hand_landmarks[5, :2]
     
     # Calculate distances
     tip_to_middle = np.linalg.norm(index_tip - index_middle)
     middle_to_base = np.linalg.norm(index_middle - index_base)
     
     # If tip is farther from base than middle is, finger is likely extended
-    return tip_to_middle > FINGER_EXTENSION_THRESHOLD and tip_to_middle > middle_to_base
+    return tip_to_middle - max(FINGER_EXTENSION_THRESHOLD, middle_to_base)
 
 
-def detect_control_actions(landmarks_left, landmarks_right):
+def is_index_finger_extended(hand_landmarks):
     """
-    Detect various control actions based on hand gestures
+    Detect if the index finger is extended (up) with a single cutoff
     
     Args:
-        landmarks_left: Array of landmarks for the left hand
-        landmarks_right: Array of landmarks for the right hand
+        hand_landmarks: (21, 3) array of landmarks for the hand
+        
+    Returns:
+        is_extended: True if index finger is extended/up
+    """
+    return index_finger_extension(hand_landmarks) > 0
+
+
+# Declarative gesture definitions for the two-hand control table.
+# Gestures in the same group are alternatives; different groups combine.
+CONTROL_GESTURES = [
+    # Both thumbs down = Handbrake
+    {'name': 'handbrake', 'group': 'pedals', 'left': {'thumb': 0}, 'right': {'thumb': 0}},
+    # Right thumb down, left thumb up = Accelerate
+    {'name': 'accelerate', 'group': 'pedals', 'left': {'thumb': 1}, 'right': {'thumb': 0}},
+    # Left thumb down, right thumb up = Brake
+    {'name': 'brake', 'group': 'pedals', 'left': {'thumb': 0}, 'right': {'thumb': 1}},
+    # Left index finger up = A button
+    {'name': 'button_a', 'group': 'buttons', 'left': {'index': 1}},
+]
+
+CONTROL_STATUS_TEXT = {
+    'handbrake': "HANDBRAKE",
+    'accelerate': "ACCELERATING",
+    'brake': "BRAKING",
+}
+
+
+def build_control_actions(gestures):
+    """
+    Build the actions dictionary for one combination of matched gestures
+    
+    Args:
+        gestures: Tuple of matched gesture names
         
     Returns:
         actions: Dictionary of control actions and their states
     """
-    # Initialize control actions
     actions = {
         'accelerate': False,
         'brake': False,
         'handbrake': False,
         'button_a': False,
-        'status_text': "IDLE"
+        'gear_up': False,
+        'gear_down': False,
+        'status_text': "IDLE"  # Both thumbs up = idle (default state)
     }
     
-    # Detect thumb states
-    left_thumb_up = is_thumb_extended(landmarks_left, True)
-    right_thumb_up = is_thumb_extended(landmarks_right, False)
-    
-    # Detect index finger states
-    left_index_up = is_index_finger_extended(landmarks_left)
-    
-    # Determine control actions based on gesture combinations
-    if not left_thumb_up and not right_thumb_up:
-        # Both thumbs down = Handbrake
-        actions['handbrake'] = True
-        actions['status_text'] = "HANDBRAKE"
-    elif not right_thumb_up and left_thumb_up:
-        # Right thumb down, left thumb up = Accelerate
-        actions['accelerate'] = True
-        actions['status_text'] = "ACCELERATING"
-    elif not left_thumb_up and right_thumb_up:
-        # Left thumb down, right thumb up = Brake
-        actions['brake'] = True
-        actions['status_text'] = "BRAKING"
-    # Both thumbs up = idle (default state)
-    
-    # Check for A button (left index finger up)
-    if left_index_up:
-        actions['button_a'] = True
+    for name in gestures:
+        actions[name] = True
+        if name in CONTROL_STATUS_TEXT:
+            actions['status_text'] = CONTROL_STATUS_TEXT[name]
+    
+    if actions['button_a']:
         actions['status_text'] += " + A BUTTON"
     
     return actions
 
 
+control_table = GestureTable(CONTROL_GESTURES, hands=2, build_action=build_control_actions)
+for conflict in control_table.conflicts:
+    print(f"Warning: {conflict}")
+
+
+def detect_control_actions(landmarks_left, landmarks_right, timestamp):
+    """
+    Detect various control actions based on hand gestures
+    
+    Args:
+        landmarks_left: (21, 3) array of landmarks for the left hand
+        landmarks_right: (21, 3) array of landmarks for the right hand
+        timestamp: Frame time in seconds (for gesture hold times)
+        
+    Returns:
+        actions: Dictionary of control actions and their states. The
+            dictionary is shared by the control table and must not be modified.
+    """
+    # Measure thumb and index finger features
+    left_thumb = thumb_extension(landmarks_left)
+    left_index = index_finger_extension(landmarks_left)
+    right_thumb = thumb_extension(landmarks_right)
+    
+    # Hysteresis state machines decide the finger states
+    left_thumb_up = gesture_gates.update('left_thumb', left_thumb, timestamp)
+    left_index_up = gesture_gates.update('left_index', left_index, timestamp)
+    right_thumb_up = gesture_gates.update('right_thumb', right_thumb, timestamp)
+    
+    # Classify with a single table lookup
+    mask = pack_hands((left_thumb_up, left_index_up), (right_thumb_up,))
+    
+    # Track how many output changes the single cutoffs would have caused
+    raw_mask = pack_hands(
+        (left_thumb > THUMB_EXTENSION_THRESHOLD, left_index > 0),
+        (right_thumb > THUMB_EXTENSION_THRESHOLD,))
+    gesture_transitions.update(raw_mask, mask, timestamp)
+    
+    return control_table[mask]
+
+
+def detect_motion_actions(actions, landmarks_right, timestamp):
+    """
+    Add motion gesture events (e.g. a flick to shift gear) to the frame's actions
+    
+    Args:
+        actions: Actions dictionary from the per-frame gesture detection
+        landmarks_right: (21, 3) array of smoothed right hand landmarks
+        timestamp: Frame time in seconds
+        
+    Returns:
+        actions: The same dictionary, or a copy with the motion action set
+            on the frame a gesture is recognized
+    """
+    event = motion_recognizer.update(timestamp, landmarks_right[TRACKED_LANDMARKS, :2])
+    action = MOTION_ACTIONS.get(event)
+    if action is None:
+        return actions
+    
+    # Rare event frames copy the shared dictionary instead of modifying it
+    actions = dict(actions)
+    actions[action] = True
+    actions['status_text'] += " + " + action.replace('_', ' ').upper()
+    return actions
+
+
+def load_template_classifier():
+    """
+    Load the two-hand template classifier if it is the configured classifier
+    
+    Returns:
+        classifier: TemplateClassifier, or None to use the rule functions
+    """
+    if GESTURE_CLASSIFIER != 'templates':
+        return None
+    try:
+        # Both hands are classified together
+        classifier = TemplateClassifier.load(TEMPLATE_PATH, hands=2)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Could not load gesture templates ({e}), using rule-based gestures")
+        return None
+    print(f"Using {len(classifier.labels)} gesture templates from {TEMPLATE_PATH}")
+    return classifier
+
+
+# Action dictionaries for template labels such as "accelerate+button_a" or "idle"
+template_actions = {}
+
+
+def detect_control_actions_from_templates(classifier, smoothed_hands):
+    """
+    Detect control actions by nearest-neighbour template matching
+    
+    Args:
+        classifier: Two-hand TemplateClassifier
+        smoothed_hands: (2, 21, 3) array of smoothed [left, right] landmarks
+        
+    Returns:
+        actions: Dictionary of control actions and their states (shared, read-only)
+    """
+    label = classifier.predict(smoothed_hands)
+    if label not in template_actions:
+        gestures = tuple(name for name in (label or 'idle').split('+') if name != 'idle')
+        template_actions[label] = build_control_actions(gestures)
+    return template_actions[label]
+
+
+def report_gesture_transitions():
+    """Print how many output events per minute the gesture state machines removed"""
+    stats = gesture_transitions.summary()
+    if stats['minutes'] > 0:
+        print(f"Gesture output changes per minute: {stats['raw_per_minute']:.1f} raw, "
+              f"{stats['emitted_per_minute']:.1f} emitted "
+              f"({stats['removed_per_minute']:.1f} removed by hysteresis) "
+              f"over {stats['minutes']:.1f} min of tracking")
+
+
+def report_output_stats():
+    """Print how many gamepad events the state-diffing output layer suppressed"""
+    stats = gamepad_output.counters.summary()
+    if stats['flushes'] > 0:
+        print(f"Gamepad output: {stats['emitted']} events emitted, {stats['suppressed']} suppressed "
+              f"({stats['suppressed_ratio'] * 100:.1f}% unchanged) over {stats['flushes']} frames")
+
+
 def predict_missing_hand_position(hand_history):
     """
     Predict hand position if tracking is temporarily lost
@@ -289,113 +597,74 @@ def map_steering_to_gamepad(steering_angle, full_turn_angle=FULL_TURN_ANGLE):
     return joystick_value
 
 
-def draw_steering_wheel_overlay(image, wheel_center, wheel_radius, steering_angle, neutral_angle, actions):
+def render_frame(image, features):
     """
-    Draw visual overlay showing the steering wheel and control status
+    Draw the preview for one frame
     
     Args:
-        image: Image to draw on
-        wheel_center: Center point of the wheel (x, y) in normalized coordinates
-        wheel_radius: Radius of the wheel in normalized coordinates
-        steering_angle: Current wheel angle in degrees
-        neutral_angle: Neutral (calibrated) wheel angle in degrees
-        actions: Dictionary of control actions and their states
-    """
-    h, w, _ = image.shape
-    
-    # Convert normalized coordinates to pixel coordinates
-    center_x = int(wheel_center[0] * w)
-    center_y = int(wheel_center[1] * h)
-    radius = int(wheel_radius * w)
-    
-    # Draw the steering wheel circle
-    cv2.circle(image, (center_x, center_y), radius, (0, 255, 0), 2)
-    
-    # Draw neutral position line
-    neutral_rad = np.radians(neutral_angle)
-    neutral_end_x = center_x + int(radius * np.cos(neutral_rad))
-    neutral_end_y = center_y + int(radius * np.sin(neutral_rad))
-    cv2.line(image, (center_x, center_y), (neutral_end_x, neutral_end_y), 
-             (255, 255, 255), 1, cv2.LINE_AA)
-    
-    # Draw current position line
-    angle_rad = np.radians(steering_angle)
-    end_x = center_x + int(radius * np.cos(angle_rad))
-    end_y = center_y + int(radius * np.sin(angle_rad))
-    cv2.line(image, (center_x, center_y), (end_x, end_y), (0, 0, 255), 3, cv2.LINE_AA)
-    
-    # Calculate relative steering angle
-    relative_angle = calculate_steering_from_neutral(steering_angle, neutral_angle)
-    joystick_value = map_steering_to_gamepad(relative_angle)
-    
-    # Show steering angle value and joystick input
-    cv2.putText(image, f"Angle: {relative_angle:.1f}° (Joy: {joystick_value:.2f})", 
-               (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    
-    # Draw steering indicator bar at bottom of screen
-    bar_width = w - 80
-    bar_height = 20
-    bar_x = 40
-    bar_y = h - 40
-    
-    # Draw background bar
-    cv2.rectangle(image, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), 
-                 (100, 100, 100), cv2.FILLED)
-    
-    # Draw indicator position
-    indicator_pos = int(bar_x + (bar_width / 2) + (joystick_value * bar_width / 2))
-    cv2.rectangle(image, (indicator_pos - 5, bar_y - 5), 
-                 (indicator_pos + 5, bar_y + bar_height + 5), 
-                 (0, 0, 255), cv2.FILLED)
-    
-    # Draw center line
-    center_x = bar_x + bar_width // 2
-    cv2.line(image, (center_x, bar_y), (center_x, bar_y + bar_height), 
-             (255, 255, 255), 1)
-    
-    # Show action status
-    status_text = actions['status_text']
-    if actions['accelerate']:
-        color = (0, 255, 0)  # Green for accelerating
-    elif actions['brake']:
-        color = (0, 0, 255)  # Red for braking
-    elif actions['handbrake']:
-        color = (0, 165, 255)  # Orange for handbrake
-    else:
-        color = (200, 200, 200)  # Grey for idle
+        image: RGB camera frame (as passed to MediaPipe)
+        features: Dictionary with the frame's hands, wheel, actions, prediction
+            flag and FPS, as filled in by the main loop
     
-    cv2.putText(image, status_text, (20, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+    Returns:
+        image: BGR image with the overlay drawn
+    """
+    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    overlay.render(image, features)
+    return image
+
+
+def show_frame(image):
+    """
+    Display a rendered frame
     
-    # Show button status indicators
-    if actions['button_a']:
-        # Draw A button indicator
-        cv2.circle(image, (w - 50, 90), 20, (0, 255, 255), cv2.FILLED)
-        cv2.putText(image, "A", (w - 55, 95), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+    Returns:
+        quit: True if ESC was pressed
+    """
+    cv2.imshow('AirSync Steering Wheel', image)
+    key = cv2.waitKey(1) & 0xFF
+    if key == ord('t'):
+        stage_timer.report()
+    elif key == ord('r'):
+        flight_recorder.request('manual')
+    return key == 27
 
 
-def calibrate_steering_wheel():
+def calibrate_steering_wheel(cap, min_frames=CALIBRATION_MIN_FRAMES, max_frames=CALIBRATION_FRAMES,
+                             timeout=None):
     """
-    Run calibration to establish neutral position for the steering wheel
+    Measure the neutral position of the steering wheel
+    
+    Frames are folded into streaming accumulators (circular mean for the
+    angle, outlier rejection for glitchy frames); measuring stops once the
+    angle and radius confidence intervals are tight, after at least
+    min_frames and at most max_frames accepted frames.
+    
+    Args:
+        cap: Opened camera capture (shared with the control loop)
+        min_frames: Accepted two-hand frames needed before stopping early
+        max_frames: Accepted two-hand frames after which measuring always stops
+        timeout: Seconds after which to give up, or None to wait for the hands
     
     Returns:
         neutral_wheel_center: Calibrated center point of the wheel
         neutral_wheel_radius: Calibrated radius of the wheel
         neutral_wheel_angle: Calibrated angle of the wheel
+        (or None if the timeout expired first)
     """
-    cap = cv2.VideoCapture(0)
-    
-    centers = []
-    radii = []
-    angles = []
+    stats = CalibrationAccumulator(
+        min_frames=min_frames, max_frames=max_frames,
+        angle_ci=CALIBRATION_ANGLE_CI, radius_ci=CALIBRATION_RADIUS_CI)
     
-    print("Starting calibration...")
-    print("Please hold your hands in a natural steering wheel position.")
-    print(f"Capturing {CALIBRATION_FRAMES} frames for calibration...")
-    
-    frames_captured = 0
+    display = DISPLAY_MODE != 'headless'
+    deadline = None if timeout is None else time.perf_counter() + timeout
     
-    while frames_captured < CALIBRATION_FRAMES:
+    while not stats.done():
+        if deadline is not None and time.perf_counter() > deadline:
+            if display:
+                cv2.destroyWindow('AirSync Calibration')
+            return None
+        
         success, image = cap.read()
         if not success:
             continue
@@ -408,8 +677,9 @@ def calibrate_steering_wheel():
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         results = hands.process(image)
         
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        if display:
+            image.flags.writeable = True
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
         
         left_hand_landmarks = None
         right_hand_landmarks = None
@@ -418,10 +688,8 @@ def calibrate_steering_wheel():
             if len(results.multi_hand_landmarks) >= 2:
                 # Identify which hand is which
                 for idx, hand_landmarks in enumerate(results.multi_hand_landmarks):
-                    mp_drawing.draw_landmarks(
-                        image, hand_landmarks, mp_hands.HAND_CONNECTIONS,
-                        mp_drawing_styles.get_default_hand_landmarks_style(),
-                        mp_drawing_styles.get_default_hand_connections_style())
+                    if display:
+                        draw_hand(image, hand_landmarks)
                     
                     # Determine if left or right hand
                     if results.multi_handedness[idx].classification[0].label == 'Left':
@@ -430,41 +698,80 @@ def calibrate_steering_wheel():
                         right_hand_landmarks = hand_landmarks.landmark
                 
                 if left_hand_landmarks and right_hand_landmarks:
+                    smoothed_left, smoothed_right = smooth_hand_landmarks(
+                        left_hand_landmarks, right_hand_landmarks)
+                    
                     # Calculate steering wheel parameters
                     wheel_center, wheel_radius, wheel_angle = detect_steering_wheel(
-                        left_hand_landmarks, right_hand_landmarks)
+                        smoothed_left, smoothed_right)
                     
-                    centers.append(wheel_center)
-                    radii.append(wheel_radius)
-                    angles.append(wheel_angle)
-                    frames_captured += 1
+                    stats.add(wheel_center, wheel_radius, wheel_angle)
                     
                     # Draw calibration progress
-                    progress = int((frames_captured / CALIBRATION_FRAMES) * 100)
-                    cv2.putText(image, f"Calibration: {progress}%", 
-                               (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        # Show instruction
-        cv2.putText(image, "Hold hands in neutral steering position", 
-                   (20, image.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                    progress = int(stats.progress() * 100)
+                    if display:
+                        cv2.putText(image, f"Calibration: {progress}%", 
+                                   (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
         
-        # Display the image
-        cv2.imshow('AirSync Calibration', image)
-        cv2.waitKey(1)
+        if display:
+            # Show instruction
+            cv2.putText(image, "Hold hands in neutral steering position", 
+                       (20, image.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            
+            # Display the image
+            cv2.imshow('AirSync Calibration', image)
+            cv2.waitKey(1)
     
-    cap.release()
-    cv2.destroyAllWindows()
+    if display:
+        cv2.destroyWindow('AirSync Calibration')
+    
+    summary = stats.summary()
+    print(f"Measured {summary['accepted']} frames ({summary['rejected']} outliers rejected), "
+          f"neutral angle +/- {summary['angle_ci_deg']:.2f}°")
+    
+    return stats.result()
+
+
+def load_or_calibrate(cap):
+    """
+    Reuse the saved calibration if it still fits, otherwise run a full calibration
     
-    # Calculate average wheel center, radius and angle
-    neutral_wheel_center = np.mean(centers, axis=0)
-    neutral_wheel_radius = np.mean(radii)
-    neutral_wheel_angle = np.mean(angles)
+    The saved profile is checked over VERIFY_FRAMES frames; a full
+    calibration runs (and is saved) only if there is no profile for this
+    camera, the hands are not shown within VERIFY_TIMEOUT, or the neutral
+    angle or wheel size moved.
+    
+    Returns:
+        neutral_wheel_center, neutral_wheel_radius, neutral_wheel_angle
+    """
+    resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    profile = load_profile(resolution, CAMERA_ID, CALIBRATION_PROFILE_PATH)
+    
+    if profile is not None:
+        print("Checking saved calibration, hold your hands in the neutral steering position...")
+        measured = calibrate_steering_wheel(cap, VERIFY_FRAMES, VERIFY_FRAMES, timeout=VERIFY_TIMEOUT)
+        if measured is not None and profile_matches(
+                profile, measured[2], measured[1], angle_tolerance=VERIFY_ANGLE_TOLERANCE):
+            print(f"Using saved calibration (neutral angle {profile.angle:.1f}°)")
+            telemetry.event('calibration', source='saved', angle=round(profile.angle, 2),
+                            radius=round(profile.radius, 4))
+            return np.array(profile.center), profile.radius, profile.angle
+        print("Saved calibration does not match, recalibrating.")
+    
+    print("Starting calibration...")
+    print("Please hold your hands in a natural steering wheel position.")
+    print(f"Capturing up to {CALIBRATION_FRAMES} frames for calibration...")
+    neutral_wheel_center, neutral_wheel_radius, neutral_wheel_angle = calibrate_steering_wheel(cap)
     
     print("Calibration complete!")
     print(f"Neutral wheel center: {neutral_wheel_center}")
     print(f"Neutral wheel radius: {neutral_wheel_radius}")
     print(f"Neutral wheel angle: {neutral_wheel_angle}")
     
+    save_profile(neutral_wheel_center, neutral_wheel_radius, neutral_wheel_angle,
+                 resolution, CAMERA_ID, CALIBRATION_PROFILE_PATH)
+    telemetry.event('calibration', source='fresh', angle=round(neutral_wheel_angle, 2),
+                    radius=round(neutral_wheel_radius, 4))
     return neutral_wheel_center, neutral_wheel_radius, neutral_wheel_angle
 
 
@@ -472,16 +779,121 @@ def main():
     """
     Main function for AirSync Steering Wheel control
     """
-    # Run calibration
-    neutral_wheel_center, neutral_wheel_radius, neutral_wheel_angle = calibrate_steering_wheel()
+    # Optional template classifier replacing the rule-based finger checks
+    template_classifier = load_template_classifier()
     
-    cap = cv2.VideoCapture(0)
+    # One capture serves both calibration and the control loop
+    cap = cv2.VideoCapture(CAMERA_ID)
     
     # Try to set camera parameters for better performance
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
     cap.set(cv2.CAP_PROP_FPS, 60)  # Request 60 FPS if available
     
+    # Saved calibration if it still fits, otherwise a full calibration
+    neutral_wheel_center, neutral_wheel_radius, neutral_wheel_angle = load_or_calibrate(cap)
+    
+    # Gamepad output runs on its own fixed-rate thread
+    output_scheduler.start()
+    
+    # The preview window is drawn in the loop, on its own thread, in a
+    # separate viewer process, or not at all
+    preview = None
+    shared_publisher = None
+    if DISPLAY_MODE == 'preview':
+        preview = PreviewThread(render_frame, show_frame, fps=PREVIEW_FPS).start()
+    elif DISPLAY_MODE == 'shared':
+        # Rendered on the preview thread, shown by shared_preview.py in its own process
+        shared_publisher = SharedPreviewPublisher()
+        preview = PreviewThread(render_frame, shared_publisher.publish, fps=PREVIEW_FPS).start()
+    
+    if DISPLAY_MODE in ('headless', 'shared'):
+        print(f"Starting AirSync Steering Wheel ({DISPLAY_MODE}). Press Ctrl+C to exit.")
+    else:
+        print("Starting AirSync Steering Wheel. Press ESC to exit.")
+    telemetry.event('start', display=DISPLAY_MODE)
+    
+    # Slowly follows the neutral pose as the user's hands drift over a session
+    neutral_drift = NeutralDriftEstimator(
+        neutral_wheel_angle, max_offset=DRIFT_MAX_OFFSET, time_constant=DRIFT_TIME_CONSTANT,
+        steady_std=DRIFT_STEADY_STD, near_neutral=DRIFT_NEAR_NEUTRAL)
+    
+    try:
+        run_control_loop(cap, template_classifier, neutral_drift, preview)
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        flight_recorder.dump('exception', wait=True)
+        raise
+    
+    # Write queued log lines before the exit reports
+    logger.stop()
+    
+    # Clean up resources
+    if preview is not None:
+        preview.stop()
+    if shared_publisher is not None:
+        shared_publisher.close()
+    cap.release()
+    cv2.destroyAllWindows()
+    output_scheduler.stop()
+    flight_recorder.close()
+    gamepad_output.reset()
+    report_gesture_transitions()
+    report_output_stats()
+    output_scheduler.report()
+    report_neutral_drift(neutral_drift)
+    if preview is not None:
+        preview.report()
+    else:
+        report_render_stats(render_stats, "Inline preview")
+    stage_timer.report()
+    telemetry.event('stop', stages={stage: [round(s['p50_ms'], 2), round(s['p95_ms'], 2),
+                                            round(s['p99_ms'], 2), round(s['max_ms'], 2)]
+                                    for stage, s in stage_timer.summary().items() if s['count']})
+    telemetry.close()
+    logger.report()
+
+
+def report_neutral_drift(neutral_drift):
+    """Print how far the neutral angle was corrected during the session"""
+    stats = neutral_drift.summary()
+    print(f"Neutral drift: bias {stats['bias_deg']:+.2f}° "
+          f"(max {stats['max_abs_bias_deg']:.2f}°), "
+          f"adjusted in {stats['adapting_ratio']:.0%} of frames")
+
+
+def send_frame_telemetry(features, neutral_drift):
+    """Send the latest tracking state, output values and stage latencies"""
+    if features['actions'] is not None:
+        tracking = 'both'
+    elif features['predicted']:
+        tracking = 'predicted'
+    else:
+        tracking = 'none'
+    wheel = features['wheel']
+    telemetry.frame(
+        fps=round(features['fps'], 1),
+        tracking=tracking,
+        steer=round(float(wheel[4]), 2) if wheel is not None else None,
+        joy=round(float(target_output[0]), 3),
+        lt=target_output[1],
+        rt=target_output[2],
+        buttons=[int(pressed) for pressed in target_output[3:]],
+        bias=round(neutral_drift.bias, 2),
+        lat=stage_timer.last_ms())
+
+
+def run_control_loop(cap, template_classifier, neutral_drift, preview):
+    """
+    Process camera frames until ESC (or Ctrl+C in headless mode)
+    
+    Args:
+        cap: Opened camera capture
+        template_classifier: Optional TemplateClassifier replacing the rule-based gestures
+        neutral_drift: NeutralDriftEstimator holding the current neutral wheel angle
+        preview: PreviewThread in 'preview' and 'shared' modes, otherwise None
+    """
     # Previous hand positions for measuring rotation
     prev_left_hand = None
     prev_right_hand = None
@@ -490,16 +902,20 @@ def main():
     prev_time = time.time()
     fps_values = collections.deque(maxlen=30)
     
-    print("Starting AirSync Steering Wheel. Press ESC to exit.")
+    first_input_sent = False
+    flight_features = np.zeros(len(FLIGHT_FEATURES), dtype=np.float32)
+    next_stage_report = time.perf_counter() + STAGE_REPORT_INTERVAL
     
     while cap.isOpened():
+        stage_timer.begin()
         success, image = cap.read()
         if not success:
-            print("Failed to capture frame. Retrying...")
+            log("Failed to capture frame. Retrying...")
             continue
         
         # Flip image horizontally for a more intuitive experience
         image = cv2.flip(image, 1)
+        stage_timer.mark(CAPTURE)
         
         # Calculate FPS
         current_time = time.time()
@@ -512,9 +928,12 @@ def main():
         image.flags.writeable = False
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         results = hands.process(image)
+        stage_timer.mark(INFERENCE)
         
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        # Everything the preview needs to draw this frame (the image stays RGB;
+        # conversion back to BGR happens in render_frame)
+        features = {'hands': (), 'wheel': None, 'actions': None,
+                    'predicted': False, 'fps': avg_fps}
         
         left_hand_landmarks = None
         right_hand_landmarks = None
@@ -522,14 +941,11 @@ def main():
         if results.multi_hand_landmarks:
             # process detected hands
             if len(results.multi_hand_landmarks) >= 2: 
+                # hand landmarks are drawn by the preview
+                features['hands'] = results.multi_hand_landmarks
+                
                 # identify which hand is which
                 for idx, hand_landmarks in enumerate(results.multi_hand_landmarks):
-                    # draw hand landmarks on the image
-                    mp_drawing.draw_landmarks(
-                        image, hand_landmarks, mp_hands.HAND_CONNECTIONS,
-                        mp_drawing_styles.get_default_hand_landmarks_style(),
-                        mp_drawing_styles.get_default_hand_connections_style())
-                    
                     # Determine if left or right hand
                     if results.multi_handedness[idx].classification[0].label == 'Left':
                         left_hand_landmarks = hand_landmarks.landmark
@@ -537,9 +953,17 @@ def main():
                         right_hand_landmarks = hand_landmarks.landmark
                 
                 if left_hand_landmarks and right_hand_landmarks:
+                    # Smooth every landmark once; all downstream logic uses these
+                    smoothed_left, smoothed_right = smooth_hand_landmarks(
+                        left_hand_landmarks, right_hand_landmarks)
+                    
                     # Calculate steering wheel parameters including current angle
                     wheel_center, wheel_radius, wheel_angle = detect_steering_wheel(
-                        left_hand_landmarks, right_hand_landmarks)
+                        smoothed_left, smoothed_right)
+                    
+                    # Let the neutral follow slow drift, then steer relative to it
+                    frame_time = time.perf_counter()
+                    neutral_wheel_angle = neutral_drift.update(wheel_angle, frame_time)
                     
                     # Calculate steering based on deviation from neutral angle
                     raw_steering_angle = calculate_steering_from_neutral(
@@ -554,54 +978,55 @@ def main():
                     # Map to gamepad values with proportional control
                     joystick_value = map_steering_to_gamepad(smoothed_steering)
                     
-                    # Apply to gamepad
-                    gamepad.left_joystick_float(x_value_float=joystick_value, y_value_float=0.0)
+                    # A sudden jump in the output is worth a flight recorder dump
+                    if abs(joystick_value - target_output[0]) > FLIGHT_JUMP_THRESHOLD:
+                        flight_recorder.trigger('steering_jump', delay=FLIGHT_POST_TRIGGER)
+                    flight_features[:] = (wheel_center[0], wheel_center[1], wheel_radius, wheel_angle,
+                                          neutral_wheel_angle, raw_steering_angle, steering_angle,
+                                          smoothed_steering, avg_fps)
+                    
+                    # Target steering for the output thread
+                    target_output[0] = joystick_value
                     
                     # Get current hand positions for tracking
-                    current_left_hand = np.array([
-                        left_hand_landmarks[0].x, left_hand_landmarks[0].y])
-                    current_right_hand = np.array([
-                        right_hand_landmarks[0].x, right_hand_landmarks[0].y])
+                    current_left_hand = smoothed_left[0, :2].copy()
+                    current_right_hand = smoothed_right[0, :2].copy()
                     
                     # Update hand history for prediction
                     left_hand_history.append(current_left_hand)
                     right_hand_history.append(current_right_hand)
                     
                     # Detect control actions
-                    actions = detect_control_actions(
-                        left_hand_landmarks, right_hand_landmarks)
+                    if template_classifier is not None:
+                        actions = detect_control_actions_from_templates(
+                            template_classifier, landmark_filter.value)
+                    else:
+                        actions = detect_control_actions(
+                            smoothed_left, smoothed_right, frame_time)
+                    actions = detect_motion_actions(actions, smoothed_right, frame_time)
                     
                     # Apply control actions to gamepad
                     if actions['accelerate']:
-                        gamepad.right_trigger_float(1.0)  # Full acceleration
-                        gamepad.left_trigger_float(0.0)   # No brake
+                        left_trigger, right_trigger = 0.0, 1.0  # Full acceleration, no brake
                     elif actions['brake']:
-                        gamepad.right_trigger_float(0.0)  # No acceleration
-                        gamepad.left_trigger_float(1.0)   # Full brake
-                    else:
-                        gamepad.right_trigger_float(0.0)  # No acceleration
-                        gamepad.left_trigger_float(0.0)   # No brake
-                    
-                    # Apply handbrake (Y button)
-                    if actions['handbrake']:
-                        gamepad.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_Y)
+                        left_trigger, right_trigger = 1.0, 0.0  # Full brake, no acceleration
                     else:
-                        gamepad.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_Y)
-                    
-                    # Apply A button
+                        left_trigger, right_trigger = 0.0, 0.0
                     if actions['button_a']:
-                        gamepad.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A) 
-                        gamepad.right_trigger_float(1.0) 
-                    else:
-                        gamepad.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_A)
+                        right_trigger = 1.0  # A button also accelerates
+                    target_output[1] = left_trigger
+                    target_output[2] = right_trigger
                     
-                    # Update gamepad state
-                    gamepad.update()
+                    # Handbrake (Y), A button, and gear shifts on the shoulder buttons
+                    target_output[3] = actions['handbrake']
+                    target_output[4] = actions['button_a']
+                    target_output[5] = actions['gear_up']
+                    target_output[6] = actions['gear_down']
                     
-                    # Draw steering wheel overlay
-                    draw_steering_wheel_overlay(
-                        image, wheel_center, wheel_radius, wheel_angle, 
-                        neutral_wheel_angle, actions)
+                    # Steering wheel overlay for the preview
+                    features['wheel'] = (wheel_center, wheel_radius, wheel_angle, neutral_wheel_angle,
+                                         raw_steering_angle, map_steering_to_gamepad(raw_steering_angle))
+                    features['actions'] = actions
                     
                     # Update previous hand positions
                     prev_left_hand = current_left_hand
@@ -614,29 +1039,59 @@ def main():
                 
                 if predicted_left and predicted_right:
                     # Use predictions to maintain control during brief tracking loss
-                    cv2.putText(image, "Using predicted hand positions", 
-                               (20, 130), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
+                    features['predicted'] = True
                     
                     # Reset after too many predictions to prevent drift
                     if len(left_hand_history) > 0 and len(right_hand_history) > 0:
                         prev_left_hand = predicted_left
                         prev_right_hand = predicted_right
+        stage_timer.mark(FEATURES)
         
-        # Show FPS
-        cv2.putText(image, f"FPS: {avg_fps:.1f}", 
-                   (image.shape[1] - 120, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        if features['actions'] is not None:
+            # Hand the frame's state to the output thread
+            output_scheduler.publish(target_output)
+            if not first_input_sent:
+                first_input_sent = True
+                log("Time to first input: %.2f s", time.perf_counter() - startup_time)
+            stage_timer.mark(OUTPUT)
+        elif target_output[5] or target_output[6]:
+            # A flick shift lasts one frame; if tracking drops right after it,
+            # nothing would release the shoulder button. Steering and pedals
+            # keep their last value through the tracking loss.
+            target_output[5] = target_output[6] = False
+            output_scheduler.publish(target_output)
+            stage_timer.mark(OUTPUT)
+
+        if preview is not None:
+            # Latest frame for the preview thread; drawn later at PREVIEW_FPS
+            preview.submit(image, features)
+            if preview.quit_requested:
+                break
+        elif DISPLAY_MODE == 'inline':
+            render_start = time.perf_counter()
+            quit_requested = show_frame(render_frame(image, features))
+            render_stats.add(time.perf_counter() - render_start)
+            if quit_requested:
+                break
+        stage_timer.mark(RENDER)
+        stage_timer.end()
         
-        # Show instruction for exit
-        cv2.putText(image, "Press ESC to exit", 
-                   (20, image.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        tracked = features['actions'] is not None
+        flight_recorder.record(
+            time.perf_counter(),
+            landmarks=raw_landmarks if tracked else None,
+            smoothed=landmark_filter.value if tracked else None,
+            derivative=landmark_filter.derivative if tracked else None,
+            features=flight_features if tracked else None,
+            outputs=target_output,
+            tracking=2 if tracked else int(features['predicted']))
         
-        cv2.imshow('AirSync Steering Wheel', image)
-        if cv2.waitKey(5) & 0xFF == 27:  
-            break
-    
-    # Clean up resources
-    cap.release()
-    cv2.destroyAllWindows()
+        if telemetry.due():
+            send_frame_telemetry(features, neutral_drift)
+        
+        if STAGE_REPORT_INTERVAL and time.perf_counter() >= next_stage_report:
+            stage_timer.report()
+            next_stage_report += STAGE_REPORT_INTERVAL
 
 
 if __name__ == '__main__':
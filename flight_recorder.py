@@ -0,0 +1,310 @@
+"""
+Flight recorder for AirSync
+An always-on ring buffer of the last few seconds of the control loop:
+timestamped raw landmarks, landmark filter state, derived features and the
+outputs sent to the game, all in NumPy arrays allocated once at startup.
+Recording a frame copies a few small arrays into the next row; nothing is
+allocated while driving.
+
+The buffer is dumped to a compressed .npz file on request, when the engine
+crashes, or shortly after an anomaly (e.g. a large steering jump), so the
+moments before and after a reported glitch can be inspected. Snapshots are
+taken in the control loop (a copy of the buffer); compressing and writing
+happen on a background thread.
+
+View a dump:
+    python flight_recorder.py dump.npz            # replay in a window
+    python flight_recorder.py dump.npz --summary  # text summary only
+"""
+
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_DUMP_DIR = os.path.join(os.path.expanduser('~'), '.airsync', 'flight')
+
+# One recorded quantity: per-frame shape, dtype, value for frames that do not set it,
+# and optional names of its components (stored in the dump for the viewer)
+Field = collections.namedtuple('Field', ['shape', 'dtype', 'fill', 'labels'])
+
+
+def field(shape, dtype=np.float32, fill=np.nan, labels=None):
+    """Describe a recorded field (see Field)"""
+    return Field(tuple(shape), dtype, fill, labels)
+
+
+class FlightRecorder:
+    """
+    Fixed-memory ring buffer of per-frame records
+
+    Args:
+        fields: Dictionary of field name -> Field
+        capacity: Number of frames kept
+        dump_dir: Directory dumps are written to
+        min_interval: Minimum seconds between two triggered (anomaly) dumps
+    """
+
+    def __init__(self, fields, capacity, dump_dir=DEFAULT_DUMP_DIR, min_interval=10.0):
+        self.fields = dict(fields)
+        self.capacity = capacity
+        self.dump_dir = dump_dir
+        self.min_interval = min_interval
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.arrays = {name: np.full((capacity,) + f.shape, f.fill, dtype=f.dtype)
+                       for name, f in self.fields.items()}
+        self.count = 0
+        self.start = time.perf_counter()
+
+        self._pending = None  # (reason, time at which to dump)
+        self._last_trigger = -np.inf
+        self._writers = []
+
+        # Statistics
+        self.dumps = []
+        self.triggers_skipped = 0
+
+    @property
+    def nbytes(self):
+        """Memory held by the buffer"""
+        return self.times.nbytes + sum(a.nbytes for a in self.arrays.values())
+
+    def record(self, timestamp, **values):
+        """
+        Store one frame; fields not given are set to their fill value
+
+        Args:
+            timestamp: perf_counter() time of the frame
+            values: Field name -> array-like matching the field's shape
+        """
+        row = self.count % self.capacity
+        self.times[row] = timestamp - self.start
+        for name, array in self.arrays.items():
+            value = values.get(name)
+            array[row] = self.fields[name].fill if value is None else value
+        self.count += 1
+
+        if self._pending is not None and timestamp >= self._pending[1]:
+            reason = self._pending[0]
+            self._pending = None
+            self.dump(reason)
+
+    def trigger(self, reason, delay=0.0):
+        """
+        Request a dump after an anomaly
+
+        The dump is taken `delay` seconds later, so the buffer also holds
+        what happened after the event. Triggers within min_interval of the
+        previous one are ignored.
+
+        Returns:
+            accepted: False if the trigger was ignored
+        """
+        now = time.perf_counter()
+        if self._pending is not None or now - self._last_trigger < self.min_interval:
+            self.triggers_skipped += 1
+            return False
+        self._last_trigger = now
+        self._pending = (reason, now + delay)
+        return True
+
+    def request(self, reason):
+        """
+        Dump on the next record() call, regardless of min_interval
+
+        Safe to call from another thread (e.g. a preview window's key
+        handler): the snapshot is still taken by the recording thread.
+        """
+        self._pending = (reason, 0.0)
+
+    def snapshot(self):
+        """
+        Returns:
+            data: Dictionary of the recorded frames in chronological order
+                ('t' plus one array per field)
+        """
+        frames = min(self.count, self.capacity)
+        head = self.count % self.capacity
+        if self.count <= self.capacity:
+            order = slice(0, frames)
+            data = {'t': self.times[order].copy()}
+            data.update({name: array[order].copy() for name, array in self.arrays.items()})
+        else:
+            data = {'t': np.concatenate((self.times[head:], self.times[:head]))}
+            data.update({name: np.concatenate((array[head:], array[:head]))
+                         for name, array in self.arrays.items()})
+        return data
+
+    def dump(self, reason, wait=False):
+        """
+        Write the buffer to dump_dir (compressed on a background thread)
+
+        Args:
+            reason: Short reason stored in the file and its name (after the
+                time and the recorder's dump number)
+            wait: Block until the file is written (e.g. when crashing)
+
+        Returns:
+            path: Path of the dump file
+        """
+        data = self.snapshot()
+        wall_time = time.time()
+        meta = {
+            'reason': reason,
+            'wall_time': wall_time,
+            'recorder_time': time.perf_counter() - self.start,
+            'labels': {name: f.labels for name, f in self.fields.items() if f.labels},
+        }
+        data['meta'] = np.array(json.dumps(meta))
+
+        # The dump number keeps names unique when two dumps fall in the same second
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(wall_time))
+        path = os.path.join(self.dump_dir, f"flight-{stamp}-{len(self.dumps) + 1:03d}-{reason}.npz")
+        writer = threading.Thread(target=self._write, args=(path, data), name="flight-dump")
+        writer.start()
+        self._writers = [w for w in self._writers if w.is_alive()]
+        self._writers.append(writer)
+        if wait:
+            writer.join()
+        self.dumps.append(path)
+        return path
+
+    def _write(self, path, data):
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            np.savez_compressed(path, **data)
+            print(f"Flight recorder: wrote {len(data['t'])} frames to {path}")
+        except OSError as e:
+            print(f"Flight recorder: could not write {path}: {e}")
+
+    def close(self):
+        """Wait for dumps still being written"""
+        for writer in self._writers:
+            writer.join()
+        self._writers = []
+
+
+# Viewer ------------------------------------------------------------------
+
+def load_dump(path):
+    """
+    Returns:
+        data: Dictionary of arrays (chronological), as written by dump()
+        meta: Dump metadata (reason, wall_time, recorder_time, labels)
+    """
+    with np.load(path) as archive:
+        data = {name: archive[name] for name in archive.files if name != 'meta'}
+        meta = json.loads(str(archive['meta']))
+    return data, meta
+
+
+def wall_clock(meta, t):
+    """Wall clock time string of a recorded frame time"""
+    seconds = meta['wall_time'] - (meta['recorder_time'] - t)
+    return time.strftime('%H:%M:%S', time.localtime(seconds)) + f".{int(seconds % 1 * 1000):03d}"
+
+
+def summarize(data, meta, jumps=3):
+    """Print the dump's span, per-component ranges and the largest frame-to-frame jumps"""
+    t = data['t']
+    print(f"Reason: {meta['reason']}")
+    if len(t) == 0:
+        print("No frames recorded")
+        return
+    print(f"{len(t)} frames, {t[-1] - t[0]:.2f} s, {wall_clock(meta, t[0])} to {wall_clock(meta, t[-1])}")
+    for name, labels in meta['labels'].items():
+        values = data[name].reshape(len(t), -1)
+        for i, label in enumerate(labels):
+            column = values[:, i].astype(np.float64)
+            valid = column[np.isfinite(column)]
+            if len(valid) == 0:
+                continue
+            print(f"  {name}.{label:<14} min {valid.min():9.3f}  max {valid.max():9.3f}  mean {valid.mean():9.3f}")
+            if len(valid) > 1:
+                step = np.abs(np.diff(column))
+                step[~np.isfinite(step)] = 0.0
+                for index in np.argsort(step)[::-1][:jumps]:
+                    if step[index] > 0:
+                        print(f"      jump {step[index]:8.3f} at {wall_clock(meta, t[index + 1])}")
+
+
+def replay(data, meta, speed=1.0, size=(640, 480)):
+    """
+    Replay a dump in a window: landmarks, wheel and outputs per frame
+
+    Keys: space pause, , and . step while paused, ESC quit
+    """
+    import cv2
+
+    t = data['t']
+    width, height = size
+    landmarks = data.get('smoothed', data.get('landmarks'))
+    feature_labels = meta['labels'].get('features', [])
+    output_labels = meta['labels'].get('outputs', [])
+    index, paused = 0, False
+    while 0 <= index < len(t):
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        if landmarks is not None:
+            for hand in landmarks[index]:
+                if np.isfinite(hand).all() and hand.any():
+                    for x, y in (hand[:, :2] * (width, height)).astype(int):
+                        cv2.circle(canvas, (x, y), 3, (0, 255, 0), cv2.FILLED)
+        features = dict(zip(feature_labels, data['features'][index])) if 'features' in data else {}
+        if 'center_x' in features and np.isfinite(features['center_x']):
+            center = (int(features['center_x'] * width), int(features['center_y'] * height))
+            radius = int(features['radius'] * width)
+            cv2.circle(canvas, center, radius, (0, 255, 0), 1)
+            for key, color in (('neutral_angle', (255, 255, 255)), ('wheel_angle', (0, 0, 255))):
+                angle = np.radians(features[key])
+                end = (center[0] + int(radius * np.cos(angle)), center[1] + int(radius * np.sin(angle)))
+                cv2.line(canvas, center, end, color, 2)
+
+        lines = [f"{wall_clock(meta, t[index])}  frame {index + 1}/{len(t)}  ({meta['reason']})"]
+        lines += [f"{k}: {v:.3f}" for k, v in features.items() if np.isfinite(v)]
+        if 'outputs' in data:
+            lines.append("  ".join(f"{k}={v:.2f}" for k, v in zip(output_labels, data['outputs'][index])))
+        for row, line in enumerate(lines):
+            cv2.putText(canvas, line, (10, 20 + 18 * row), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+        cv2.imshow('AirSync Flight Recorder', canvas)
+
+        if paused:
+            delay = 0
+        elif index + 1 < len(t):
+            delay = max(1, int((t[index + 1] - t[index]) / speed * 1000))
+        else:
+            delay = 0
+        key = cv2.waitKey(delay) & 0xFF
+        if key == 27:
+            break
+        elif key == ord(' '):
+            paused = not paused
+        elif paused and key == ord(','):
+            index = max(0, index - 1)
+        elif paused and key == ord('.'):
+            index = min(len(t) - 1, index + 1)
+        elif not paused:
+            if index + 1 == len(t):
+                break
+            index += 1
+    cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect an AirSync flight recorder dump")
+    parser.add_argument('path')
+    parser.add_argument('--summary', action='store_true', help="Print a summary instead of replaying")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed factor")
+    args = parser.parse_args()
+
+    data, meta = load_dump(args.path)
+    summarize(data, meta)
+    if not args.summary:
+        replay(data, meta, speed=args.speed)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ from pynput.keyboard import Controller, Key
 from pynput.mouse import Controller as MouseController, Button  
 import handtracking as htm  
 import time
+from gesture_table import GestureTable, pack_fingers
 
 cap = cv2.VideoCapture(0)  
 cap.set(3, 640) 
@@ -20,6 +21,52 @@ switch_delay = 5.0  # Delay
 
 mouse_pressed = False  # To track mouse clicks
 
+# Gesture definitions, compiled once into 5-bit lookup tables
+MODE_GESTURES = [
+    # Thumb and Pinky up = switch to keyboard mode
+    {'name': 'keyboard', 'fingers': {'thumb': 1, 'index': 0, 'middle': 0, 'ring': 0, 'pinky': 1}},
+]
+
+KEYBOARD_GESTURES = [
+    # Esc gesture: Thumb and Ring finger up
+    {'name': 'esc', 'keys': (Key.esc,),
+     'fingers': {'thumb': 1, 'index': 0, 'middle': 0, 'ring': 1, 'pinky': 0}},
+    # Move Forward (W): Only index finger up
+    {'name': 'forward', 'keys': ("w",),
+     'fingers': {'thumb': 0, 'index': 1, 'middle': 0, 'ring': 0, 'pinky': 0}},
+    # Turn Left (A): Thumb and index up
+    {'name': 'left', 'keys': ("w", "a"),
+     'fingers': {'thumb': 1, 'index': 1, 'middle': 0, 'ring': 0, 'pinky': 0}},
+    # Turn Right (D): Index and middle up
+    {'name': 'right', 'keys': ("w", "d"),
+     'fingers': {'thumb': 0, 'index': 1, 'middle': 1, 'ring': 0, 'pinky': 0}},
+    # Brake/Reverse (S): All fingers up
+    {'name': 'brake', 'keys': ("s",),
+     'fingers': {'thumb': 1, 'index': 1, 'middle': 1, 'ring': 1, 'pinky': 1}},
+]
+KEYBOARD_KEYS = (Key.esc, "w", "a", "d", "s")
+
+MOUSE_GESTURES = [
+    # Pinch gesture: Thumb up, index down = left click
+    {'name': 'click', 'group': 'click', 'fingers': {'thumb': 1, 'index': 0}},
+    # All fingers up = scroll up
+    {'name': 'scroll', 'group': 'scroll',
+     'fingers': {'thumb': 1, 'index': 1, 'middle': 1, 'ring': 1, 'pinky': 1}},
+    # Only index finger up = move the mouse pointer
+    {'name': 'move', 'group': 'move',
+     'fingers': {'thumb': 0, 'index': 1, 'middle': 0, 'ring': 0, 'pinky': 0}},
+]
+
+_keys_by_gesture = {g['name']: g['keys'] for g in KEYBOARD_GESTURES}
+mode_table = GestureTable(MODE_GESTURES)
+keyboard_table = GestureTable(
+    KEYBOARD_GESTURES,
+    build_action=lambda names: frozenset(k for n in names for k in _keys_by_gesture[n]))
+mouse_table = GestureTable(MOUSE_GESTURES, build_action=frozenset)
+for table in (mode_table, keyboard_table, mouse_table):
+    for conflict in table.conflicts:
+        print(f"Warning: {conflict}")
+
 def debounce_switch():
     """Returns True if the time delay for switching is satisfied."""
     global switch_time
@@ -36,67 +83,27 @@ while True:
 
     if len(lmList) != 0:  
         fingers = detector.fingersUp()  
-        # Gesture to switch to mouse mode (Thumb and Pinky up)
-        # if fingers[0] == 1 and fingers[4] == 1 and all(f == 0 for f in fingers[1:4]) and control_mode != "mouse":
-        #     if debounce_switch():  # Prevent accidental switching
-        #         control_mode = "mouse"
-        #         print("Switched to Mouse Mode")
-        
-        # Gesture to switch to keyboard mode (Index and Middle finger up)
-        if fingers[0] == 1 and fingers[4] == 1 and all(f == 0 for f in fingers[1:4]) and control_mode != "keyboard":
+        mask = pack_fingers(fingers)
+
+        # Gesture to switch to keyboard mode (Thumb and Pinky up)
+        if mode_table[mask] and control_mode != "keyboard":
             if debounce_switch():
                 control_mode = "keyboard"
                 print("Switched to Keyboard Mode")
 
         if control_mode == "keyboard":
-            # Keyboard controls
-            # if all(fingers):  # Jump (Space)wawa
-            #     keyboard.press(Key.space)
-            # else:
-            #     keyboard.release(Key.space)
-
-            # Esc gesture: Thumb and Ring finger up
-            if fingers[0] == 1 and fingers[3] == 1 and all(f == 0 for f in [1, 2, 4]):
-                keyboard.press(Key.esc)
-            else:
-                keyboard.release(Key.esc)
-
-            # Move Forward (W): Index finger up
-            if fingers[1] == 1 and all(f == 0 for f in fingers[:1] + fingers[2:]):  # Only index finger up
-                keyboard.press("w")
-                keyboard.release("s")
-            else:
-                keyboard.release("w")
-
-            # Turn Left (A): Thumb up
-            if fingers[0] == 1 and fingers[1] == 1 and all(f == 0 for f in fingers[2:]):  # Only thumb up
-                keyboard.press("w")
-                keyboard.press("a")
-            else:
-                keyboard.release("a")
-
-            # Turn Right (D):
-            if fingers[1] == 1 and fingers[2] == 1 and all(f == 0 for f in fingers[:1] + fingers[3:]): 
-                keyboard.press("w") 
-                keyboard.press("d")
-            else:
-                keyboard.release("d")
-
-            # Brake/Reverse (S): I
-            if all(fingers) :
-                keyboard.press("s")
-            else:
-                keyboard.release("s")
-
-            # # Honk (H): Thumb and Pinky up
-            # if fingers[0] == 1 and fingers[4] == 1:
-            #     keyboard.press("h")
-            # else:
-            #     keyboard.release("h")
+            # Keyboard controls: hold the keys of the matched gesture, release the rest
+            held_keys = keyboard_table[mask]
+            for key in KEYBOARD_KEYS:
+                if key in held_keys:
+                    keyboard.press(key)
+                else:
+                    keyboard.release(key)
 
         elif control_mode == "mouse":
             # Mouse controls
-            if fingers[0] == 1 and fingers[1] == 0:  # Pinch gesture: Thumb up, index down
+            mouse_actions = mouse_table[mask]
+            if 'click' in mouse_actions:
                 if not mouse_pressed:
                     mouse.click(Button.left, 1)  # Perform a left-click
                     mouse_pressed = True
@@ -104,15 +111,11 @@ while True:
                 mouse_pressed = False  # Release mouse click state
 
             # Scroll gesture: All fingers up
-            if all(fingers):
+            if 'scroll' in mouse_actions:
                 mouse.scroll(0, 1)  # Scroll up 
 
-            # # Fist gesture: Scroll down
-            # if fingers == [0, 0, 0, 0, 0]:
-            #     mouse.scroll(0, -1)  # Scroll down
-
             # Index finger up to move the mouse pointer
-            if fingers[1] == 1 and all(f == 0 for f in fingers[:1] + fingers[2:]):  # Only index finger up
+            if 'move' in mouse_actions:
                 x, y = lmList[8][1:3]  # Get position of index finger tip
                 screen_x, screen_y = mouse.position  # Current mouse position
                 mouse.move(x - screen_x, y - screen_y)  # Move the mouse pointer accordingly
@@ -0,0 +1,196 @@
+"""
+Gesture/keymap profiles for AirSync
+A profile is a JSON file describing gestures, thresholds, landmark filter
+parameters and output bindings. It is compiled once at load time into flat
+lookup structures (gesture tables, per-finger key tuples, resolved keys) so
+the frame loop never parses or validates anything. An optional "templates"
+section points at a template_classifier.py file for custom gestures.
+
+ProfileWatcher polls the file in a background thread and swaps in the newly
+compiled profile with a single reference assignment. Control loops read
+`watcher.current` once at the start of each frame, so a reload always lands
+between frames and never restarts the camera or the model.
+"""
+
+import collections
+import json
+import math
+import os
+import threading
+
+from gesture_table import FINGER_NAMES, GestureTable
+from landmark_filter import FILTER_PARAMETERS
+from template_classifier import TemplateClassifier
+
+MOUSE_BUTTONS = ('left_click', 'right_click', 'middle_click')
+BINDING_SECTIONS = ('movement', 'fingers', 'special')
+
+# A binding resolved at load time: kind is 'key' or 'mouse', code is whatever
+# the output backend's resolver returned for the key name (e.g. keyinput's key
+# id), passed straight back to the backend on every press and release
+ResolvedKey = collections.namedtuple('ResolvedKey', ['name', 'kind', 'code'])
+
+
+def _first_match(names):
+    return names[0] if names else None
+
+
+def _numeric_section(data, section, allowed=None):
+    """
+    Copy a {name: number} section of a profile
+
+    Raises:
+        ValueError: If the section is not an object, a name is not in
+            `allowed` (when given) or a value is not a finite number
+    """
+    values = data.get(section, {})
+    if not isinstance(values, dict):
+        raise ValueError(f"'{section}' must map names to numbers")
+    for name, value in values.items():
+        if allowed is not None and name not in allowed:
+            raise ValueError(f"Unknown {section} entry '{name}' (expected one of {', '.join(allowed)})")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"{section}.{name} must be a number, got {value!r}")
+    return dict(values)
+
+
+class CompiledProfile:
+    """Immutable, precompiled view of a profile file"""
+
+    def __init__(self, data, source=None, resolve_key=None):
+        self.source = source
+        self.name = data.get('name', os.path.basename(source or 'profile'))
+        # Checked here because the frame loop passes them on unchecked
+        # (filters as set_parameters keywords); a bad value keeps the old profile
+        self.thresholds = _numeric_section(data, 'thresholds')
+        self.filters = _numeric_section(data, 'filters', allowed=FILTER_PARAMETERS)
+        for name, value in self.filters.items():
+            if name.endswith('cutoff') and value <= 0:
+                raise ValueError(f"filters.{name} must be positive, got {value!r}")
+
+        # Resolve every bound key once; unknown keys fail here, not mid-game
+        bindings = data.get('bindings', {})
+        self.bindings = {}
+        for section in BINDING_SECTIONS:
+            self.bindings[section] = {
+                action: self._resolve(key_name, resolve_key)
+                for action, key_name in bindings.get(section, {}).items()
+            }
+
+        # Flat per-finger tuple, indexed like the finger state arrays
+        fingers = self.bindings['fingers']
+        self.finger_keys = tuple(fingers.get(name) for name in FINGER_NAMES)
+
+        # Gesture tables, one per hand count
+        gestures = data.get('gestures', {})
+        self.one_hand_table = GestureTable(
+            gestures.get('one_hand', []), hands=1, build_action=_first_match)
+        self.two_hand_table = GestureTable(
+            gestures.get('two_hands', []), hands=2, build_action=_first_match)
+        self.conflicts = self.one_hand_table.conflicts + self.two_hand_table.conflicts
+
+        # Optional nearest-neighbour classifier for custom one-hand gestures;
+        # two-hand or malformed template files raise ValueError here
+        self.template_classifier = None
+        templates = data.get('templates')
+        if templates:
+            path = templates['path']
+            if source and not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(source), path)
+            self.template_classifier = TemplateClassifier.load(
+                path, hands=1, k=templates.get('k', 3), max_distance=templates.get('max_distance', 0.6))
+
+    @staticmethod
+    def _resolve(key_name, resolve_key):
+        key_name = str(key_name).lower()
+        if key_name in MOUSE_BUTTONS:
+            return ResolvedKey(key_name, 'mouse', key_name)
+        code = resolve_key(key_name) if resolve_key else key_name
+        return ResolvedKey(key_name, 'key', code)
+
+    def threshold(self, name, default):
+        """Look up a threshold with a fallback default"""
+        return self.thresholds.get(name, default)
+
+
+def load_profile(path, resolve_key=None):
+    """
+    Load and compile a profile file
+
+    Args:
+        path: Path to a JSON profile
+        resolve_key: Optional callable mapping a key name to a backend key
+            object; it should raise ValueError for unknown keys
+
+    Returns:
+        profile: CompiledProfile
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return CompiledProfile(data, source=path, resolve_key=resolve_key)
+
+
+class ProfileWatcher:
+    """
+    Keeps a compiled profile up to date with its file on disk.
+
+    Reloading (parsing, validation, table compilation) happens on the watcher
+    thread. If the new file is invalid the previous profile stays active.
+    """
+
+    def __init__(self, path, resolve_key=None, interval=0.5):
+        self.path = path
+        self.resolve_key = resolve_key
+        self.interval = interval
+        self.current = load_profile(path, resolve_key)
+        self.reload_count = 0
+        self._mtime = self._read_mtime()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check(self):
+        """Reload the profile if the file changed; returns True on a swap"""
+        mtime = self._read_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            profile = load_profile(self.path, self.resolve_key)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Profile reload failed, keeping previous profile: {e}")
+            return False
+
+        for conflict in profile.conflicts:
+            print(f"Warning: {conflict}")
+
+        # Single reference assignment: readers see the old or the new profile
+        self.current = profile
+        self.reload_count += 1
+        print(f"Reloaded profile '{profile.name}'")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        """Start watching the profile file in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ProfileWatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
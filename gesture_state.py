@@ -0,0 +1,123 @@
+"""
+Gesture state machines for AirSync
+Sits between feature extraction and output: each gesture gets separate enter
+and exit thresholds (hysteresis) plus a minimum hold time, so a feature
+hovering around a single cutoff no longer flips the output every frame.
+"""
+
+
+class HysteresisGate:
+    """
+    Two-threshold on/off state with a minimum hold time.
+
+    If enter >= exit the gesture is active for high values (turns on above
+    enter, off below exit). If enter < exit it is active for low values.
+    Once the state changes it is held for at least min_hold_ms.
+    """
+
+    def __init__(self, enter, exit, min_hold_ms=0.0, state=False):
+        self.enter = enter
+        self.exit = exit
+        self.rising = enter >= exit
+        self.min_hold = min_hold_ms / 1000.0
+        self.state = state
+        self.changed_at = None
+        self.transitions = 0
+
+    def update(self, value, timestamp):
+        """
+        Feed one feature value
+
+        Args:
+            value: Current feature value
+            timestamp: Frame time in seconds
+
+        Returns:
+            state: True while the gesture is active
+        """
+        if self.state:
+            wanted = value >= self.exit if self.rising else value <= self.exit
+        else:
+            wanted = value > self.enter if self.rising else value < self.enter
+
+        if wanted != self.state:
+            if self.changed_at is None or timestamp - self.changed_at >= self.min_hold:
+                self.state = wanted
+                self.changed_at = timestamp
+                self.transitions += 1
+        return self.state
+
+    def reset(self, state=False):
+        """Drop state and hold timer"""
+        self.state = state
+        self.changed_at = None
+
+
+class GestureStateMachine:
+    """A named bank of HysteresisGates updated once per frame"""
+
+    def __init__(self, gates):
+        self.gates = dict(gates)
+
+    def update(self, name, value, timestamp):
+        """Update one gate and return its state"""
+        return self.gates[name].update(value, timestamp)
+
+    def reset(self):
+        """Reset every gate"""
+        for gate in self.gates.values():
+            gate.reset()
+
+
+class TransitionCounter:
+    """
+    Counts output changes with and without the state machine.
+
+    Feed it the output key (e.g. packed gesture mask) the raw single-cutoff
+    features would have produced and the one actually emitted; every change
+    of the key is one burst of output events.
+    """
+
+    def __init__(self):
+        self.raw_events = 0
+        self.filtered_events = 0
+        self.start_time = None
+        self.last_time = None
+        self._raw = None
+        self._filtered = None
+
+    def update(self, raw, filtered, timestamp):
+        """Record the raw and emitted output keys for one frame"""
+        if self.start_time is None:
+            self.start_time = timestamp
+        elif timestamp - self.last_time > 1.0:
+            # Tracking gap: don't count the idle time towards the rate
+            self.start_time += timestamp - self.last_time
+        self.last_time = timestamp
+
+        if self._raw is not None and raw != self._raw:
+            self.raw_events += 1
+        if self._filtered is not None and filtered != self._filtered:
+            self.filtered_events += 1
+        self._raw = raw
+        self._filtered = filtered
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary with tracked minutes and per-minute event rates
+        """
+        minutes = 0.0
+        if self.start_time is not None:
+            minutes = (self.last_time - self.start_time) / 60.0
+        if minutes <= 0:
+            return {'minutes': 0.0, 'raw_per_minute': 0.0,
+                    'emitted_per_minute': 0.0, 'removed_per_minute': 0.0}
+        raw_rate = self.raw_events / minutes
+        emitted_rate = self.filtered_events / minutes
+        return {
+            'minutes': minutes,
+            'raw_per_minute': raw_rate,
+            'emitted_per_minute': emitted_rate,
+            'removed_per_minute': raw_rate - emitted_rate,
+        }
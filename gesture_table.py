@@ -0,0 +1,167 @@
+"""
+Bitmask gesture classification for AirSync
+Finger states are packed into a 5-bit (one hand) or 10-bit (two hands)
+integer that indexes a precompiled action table, so classifying a frame is a
+single list lookup instead of a chain of if/elif checks.
+
+Gestures are declared as plain dicts:
+
+    {'name': 'accelerate', 'group': 'pedals',
+     'left': {'thumb': 1}, 'right': {'thumb': 0}}
+
+One-hand tables use a 'fingers' pattern instead of 'left'/'right'. Fingers
+that are not listed are "don't care". Gestures in the same group are
+alternatives (the first matching one wins, like an if/elif chain); gestures
+in different groups combine.
+"""
+
+import collections
+
+FINGER_NAMES = ('thumb', 'index', 'middle', 'ring', 'pinky')
+FINGER_BITS = {name: 1 << i for i, name in enumerate(FINGER_NAMES)}
+HAND_SHIFT = {'fingers': 0, 'left': 0, 'right': len(FINGER_NAMES)}
+
+GestureConflict = collections.namedtuple(
+    'GestureConflict', ['first', 'second', 'overlap', 'shadowed'])
+
+
+def _describe_conflict(conflict):
+    if conflict.shadowed:
+        return (f"gesture '{conflict.second}' can never match: "
+                f"it is fully covered by '{conflict.first}'")
+    return (f"gestures '{conflict.first}' and '{conflict.second}' overlap on "
+            f"{conflict.overlap} finger combination(s); '{conflict.first}' wins")
+
+
+GestureConflict.__str__ = _describe_conflict
+
+
+def pack_fingers(fingers):
+    """
+    Pack one hand's finger states into a 5-bit integer
+
+    Args:
+        fingers: Sequence of 5 truthy values [thumb, index, middle, ring, pinky]
+
+    Returns:
+        mask: Integer with bit i set when finger i is extended
+    """
+    mask = 0
+    for i, extended in enumerate(fingers):
+        if extended:
+            mask |= 1 << i
+    return mask
+
+
+def pack_hands(left_fingers, right_fingers):
+    """Pack both hands into a 10-bit integer (left in the low bits)"""
+    return pack_fingers(left_fingers) | (pack_fingers(right_fingers) << len(FINGER_NAMES))
+
+
+def compile_pattern(definition):
+    """
+    Compile a gesture definition into (care, value) bitmasks
+
+    Returns:
+        care: Bits the gesture constrains
+        value: Required state of those bits
+    """
+    care = 0
+    value = 0
+    for hand, shift in HAND_SHIFT.items():
+        for finger, state in definition.get(hand, {}).items():
+            if finger not in FINGER_BITS:
+                raise ValueError(
+                    f"Unknown finger '{finger}' in gesture '{definition['name']}'")
+            bit = FINGER_BITS[finger] << shift
+            care |= bit
+            if state:
+                value |= bit
+    return care, value
+
+
+def _match_count(care, num_bits):
+    """Number of masks of num_bits bits matched by a pattern with these care bits"""
+    return 1 << (num_bits - bin(care).count('1'))
+
+
+def find_conflicts(definitions, hands=1):
+    """
+    Report overlapping gesture definitions within each group
+
+    Args:
+        definitions: List of gesture definition dicts
+        hands: 1 for a 5-bit table, 2 for a 10-bit table
+
+    Returns:
+        conflicts: List of GestureConflict tuples
+    """
+    num_bits = len(FINGER_NAMES) * hands
+    compiled = [(d['name'], d.get('group'), *compile_pattern(d)) for d in definitions]
+    conflicts = []
+
+    for i, (name_a, group_a, care_a, value_a) in enumerate(compiled):
+        for name_b, group_b, care_b, value_b in compiled[i + 1:]:
+            if group_a != group_b:
+                continue
+            # Patterns overlap unless they disagree on a bit both constrain
+            if (value_a ^ value_b) & care_a & care_b:
+                continue
+            overlap = _match_count(care_a | care_b, num_bits)
+            # The later gesture is dead if the earlier one matches all of its masks
+            shadowed = (care_a & ~care_b) == 0
+            conflicts.append(GestureConflict(name_a, name_b, overlap, shadowed))
+
+    return conflicts
+
+
+class GestureTable:
+    """
+    Precompiled lookup table from packed finger states to actions.
+
+    The table is built once: every possible mask is matched against the
+    definitions, and build_action turns the matched gesture names (a tuple,
+    at most one per group, in definition order) into the stored value.
+    """
+
+    def __init__(self, definitions, hands=1, build_action=None, strict=False):
+        if hands not in (1, 2):
+            raise ValueError("GestureTable supports 1 or 2 hands")
+        if build_action is None:
+            build_action = tuple
+
+        self.hands = hands
+        self.definitions = list(definitions)
+        self.conflicts = find_conflicts(self.definitions, hands)
+        if strict and self.conflicts:
+            raise ValueError("; ".join(str(c) for c in self.conflicts))
+
+        compiled = [(d['name'], d.get('group'), *compile_pattern(d))
+                    for d in self.definitions]
+        size = 1 << (len(FINGER_NAMES) * hands)
+
+        # Identical match tuples share a single action object
+        actions = {}
+        self.table = []
+        for mask in range(size):
+            matched = []
+            used_groups = set()
+            for name, group, care, value in compiled:
+                if group in used_groups or (mask & care) != value:
+                    continue
+                matched.append(name)
+                used_groups.add(group)
+            matched = tuple(matched)
+            if matched not in actions:
+                actions[matched] = build_action(matched)
+            self.table.append(actions[matched])
+
+    def lookup(self, mask):
+        """Return the precompiled action for a packed finger mask"""
+        return self.table[mask]
+
+    def __getitem__(self, mask):
+        return self.table[mask]
+
+    def __len__(self):
+        return len(self.table)
@@ -3,12 +3,32 @@ Advanced Hand Simulator Controller
 Includes calibration, rotation tracking, improved gesture detection, and multi-hand support
 """
 
+import os
+import sys
 import cv2
 import mediapipe as mp
 import numpy as np
 import time
 import math
-from keyinput import press_key, release_key, mouse_click, mouse_release, mouse_move, release_all
+from keyinput import press_key_id, release_key_id, mouse_click, mouse_release, mouse_move, release_all, resolve_key
+
+# Shared engine modules live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmark_filter import LandmarkFilterBank, landmarks_to_array
+from gesture_table import pack_fingers
+from gesture_profile import ProfileWatcher
+from output_state import DiffingKeyboardOutput
+from stage_timer import StageTimer, CAPTURE, INFERENCE, FEATURES, OUTPUT, RENDER
+
+# Gesture/keymap profile, hot-reloaded while the controller runs
+PROFILE_PATH = os.environ.get(
+    'AIRSYNC_PROFILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles', 'default.json'))
+
+# Calibration bounds: percentiles of the sampled wrist positions, so a few
+# stray detections do not stretch the range, widened by a padding fraction
+CALIBRATION_PERCENTILES = (5, 95)
+CALIBRATION_PADDING = 0.1
 
 class AdvancedHandSimulatorController:
     def __init__(self):
@@ -34,34 +54,14 @@ class AdvancedHandSimulatorController:
             'max_y': 1.0,
             'min_z': -0.2,
             'max_z': 0.2,
-            'is_calibrated': False,
-            'samples': []
-        }
-        
-        # Key mappings based on Hand Simulator image
-        self.controls = {
-            'movement': {
-                'up': 'up',
-                'down': 'down', 
-                'left': 'left',
-                'right': 'right'
-            },
-            'fingers': {
-                'thumb': 'space',
-                'index': 'f',
-                'middle': 'd',
-                'ring': 's',  # Corrected from 'g' to 's' per image
-                'pinky': 'a'
-            },
-            'special': {
-                'fist': 'left_click',
-                'rotation': 'right_click',
-                'hand_switch': 'shift',
-            }
+            'is_calibrated': False
         }
+        # normalize_position() as one affine transform: pos * scale + offset
+        self.position_scale = np.ones(3, dtype=np.float32)
+        self.position_offset = np.zeros(3, dtype=np.float32)
         
         # Tracking data
-        self.active_keys = set()
+        self.keys = DiffingKeyboardOutput(self.press, self.release)  # Held keys, sent as changes
         self.active_hand = "right"  # Default to right hand
         self.prev_hand_pos = None
         
@@ -75,6 +75,18 @@ class AdvancedHandSimulatorController:
         self.rotation_history = []
         self.wrist_base = None  # For tracking rotation
         
+        # Landmark smoothing (slot 0 = left hand, slot 1 = right hand)
+        self.landmark_filter = LandmarkFilterBank(max_hands=2)
+        self.raw_landmarks = np.zeros((2, 21, 3), dtype=np.float32)
+        self.hand_present = np.zeros(2, dtype=bool)
+        
+        # Key mappings, thresholds and gestures come from the profile file
+        self.profiles = ProfileWatcher(PROFILE_PATH, resolve_key)
+        self.apply_profile(self.profiles.current)
+        
+        # Latency of each stage of the control loop
+        self.stage_timer = StageTimer()
+        
         # Debug mode
         self.debug_mode = False
     
@@ -88,18 +100,19 @@ class AdvancedHandSimulatorController:
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         
-        samples = []
+        # Wrist positions (x, y, z), filled in place
+        samples = np.empty((max_samples, 3), dtype=np.float32)
+        count = 0
         start_time = time.time()
         sample_interval = 0.1  # Sample every 100ms
         last_sample_time = 0
         
         # Reset calibration
-        self.calibration['samples'] = []
         self.calibration['is_calibrated'] = False
         
-        while len(samples) < max_samples:
+        while count < max_samples:
             # Calculate progress
-            progress = min(100, int((len(samples) / max_samples) * 100))
+            progress = min(100, int((count / max_samples) * 100))
             
             ret, frame = cap.read()
             if not ret:
@@ -132,15 +145,11 @@ class AdvancedHandSimulatorController:
                             self.mp_drawing_styles.get_default_hand_landmarks_style(),
                             self.mp_drawing_styles.get_default_hand_connections_style())
                         
-                        # Extract and store landmarks for calibration
-                        wrist = hand_landmarks.landmark[0]
-                        mcp_points = [hand_landmarks.landmark[i] for i in [5, 9, 13, 17]]
-                        
-                        # Store x, y, z coordinates
-                        samples.append({
-                            'wrist': {'x': wrist.x, 'y': wrist.y, 'z': wrist.z},
-                            'mcp': [{'x': p.x, 'y': p.y, 'z': p.z} for p in mcp_points]
-                        })
+                        # Store the wrist position, the only point the bounds use
+                        if count < max_samples:
+                            wrist = hand_landmarks.landmark[0]
+                            samples[count] = (wrist.x, wrist.y, wrist.z)
+                            count += 1
                     
                     last_sample_time = current_time
             
@@ -160,37 +169,27 @@ class AdvancedHandSimulatorController:
         cv2.destroyAllWindows()
         
         # Process calibration data
-        if samples:
-            # Find min/max values for each dimension
-            min_x, max_x = float('inf'), float('-inf')
-            min_y, max_y = float('inf'), float('-inf')
-            min_z, max_z = float('inf'), float('-inf')
-            
-            for sample in samples:
-                wrist = sample['wrist']
-                min_x = min(min_x, wrist['x'])
-                max_x = max(max_x, wrist['x'])
-                min_y = min(min_y, wrist['y'])
-                max_y = max(max_y, wrist['y'])
-                min_z = min(min_z, wrist['z'])
-                max_z = max(max_z, wrist['z'])
-            
-            # Add padding to boundaries (10%)
-            x_pad = (max_x - min_x) * 0.1
-            y_pad = (max_y - min_y) * 0.1
-            z_pad = (max_z - min_z) * 0.1
+        if count:
+            # Robust bounds for all three axes in one pass, then padding
+            low, high = np.percentile(samples[:count], CALIBRATION_PERCENTILES, axis=0)
+            padding = (high - low) * CALIBRATION_PADDING
+            low, high = low - padding, high + padding
             
             self.calibration = {
-                'min_x': min_x - x_pad,
-                'max_x': max_x + x_pad,
-                'min_y': min_y - y_pad,
-                'max_y': max_y + y_pad,
-                'min_z': min_z - z_pad,
-                'max_z': max_z + z_pad,
-                'is_calibrated': True,
-                'samples': samples
+                'min_x': float(low[0]),
+                'max_x': float(high[0]),
+                'min_y': float(low[1]),
+                'max_y': float(high[1]),
+                'min_z': float(low[2]),
+                'max_z': float(high[2]),
+                'is_calibrated': True
             }
             
+            # Precompute the mapping of [low, high] onto [0, 1]
+            span = np.maximum(high - low, 1e-6)
+            self.position_scale = (1.0 / span).astype(np.float32)
+            self.position_offset = (-low / span).astype(np.float32)
+            
             print("Calibration completed successfully!")
             print(f"X range: {self.calibration['min_x']:.2f} to {self.calibration['max_x']:.2f}")
             print(f"Y range: {self.calibration['min_y']:.2f} to {self.calibration['max_y']:.2f}")
@@ -200,9 +199,32 @@ class AdvancedHandSimulatorController:
         print("Calibration failed - not enough samples")
         return False
     
+    def apply_profile(self, profile):
+        """Switch to a compiled profile (called between frames)"""
+        self.profile = profile
+        self.controls = profile.bindings
+        self.landmark_filter.set_parameters(**profile.filters)
+    
+    def classify_special(self, landmarks, finger_states):
+        """Match the profile's finger-state gestures, then its custom templates"""
+        special = self.profile.one_hand_table[pack_fingers(finger_states)]
+        if special is None and self.profile.template_classifier is not None:
+            special = self.profile.template_classifier.predict(landmarks)
+        return special
+    
+    def smooth_landmarks(self, hand_landmarks, is_right_hand):
+        """Smooth the main hand's landmarks, returns a (21, 3) array"""
+        slot = 1 if is_right_hand else 0
+        landmarks_to_array(hand_landmarks.landmark, out=self.raw_landmarks[slot])
+        self.hand_present[:] = False
+        self.hand_present[slot] = True
+        smoothed = self.landmark_filter.update(
+            self.raw_landmarks, time.perf_counter(), self.hand_present)
+        return smoothed[slot]
+    
     def get_finger_states(self, landmarks, is_right_hand=True):
         """
-        Advanced finger state detection
+        Advanced finger state detection on a (21, 3) landmark array
         Returns: Array of 5 binary values [thumb, index, middle, ring, pinky]
         """
         fingers = []
@@ -210,13 +232,13 @@ class AdvancedHandSimulatorController:
         # Adjust for left/right hand
         if is_right_hand:
             # Thumb - check if thumb tip is to the right of thumb IP
-            if landmarks[4].x > landmarks[3].x:
+            if landmarks[4, 0] > landmarks[3, 0]:
                 fingers.append(1)  # Extended
             else:
                 fingers.append(0)  # Closed
         else:
             # For left hand, thumb is extended when x is less than thumb IP
-            if landmarks[4].x < landmarks[3].x:
+            if landmarks[4, 0] < landmarks[3, 0]:
                 fingers.append(1)  # Extended
             else:
                 fingers.append(0)  # Closed
@@ -235,10 +257,10 @@ class AdvancedHandSimulatorController:
         ]
         
         for finger_points in finger_landmarks:
-            tip, pip, mcp = [landmarks[i] for i in finger_points]
+            tip, pip, mcp = finger_points
             
             # Get finger straightness by checking if tip is higher than pip
-            if tip.y < pip.y:
+            if landmarks[tip, 1] < landmarks[pip, 1]:
                 fingers.append(1)  # Extended
             else:
                 fingers.append(0)  # Closed
@@ -255,8 +277,8 @@ class AdvancedHandSimulatorController:
         pinky_mcp = landmarks[17]
         
         # Calculate angle between these points (hand rotation)
-        dx = pinky_mcp.x - index_mcp.x
-        dy = pinky_mcp.y - index_mcp.y
+        dx = float(pinky_mcp[0] - index_mcp[0])
+        dy = float(pinky_mcp[1] - index_mcp[1])
         
         # Calculate angle in degrees (0-360)
         angle = math.degrees(math.atan2(dy, dx)) % 360
@@ -276,71 +298,76 @@ class AdvancedHandSimulatorController:
         if not self.calibration['is_calibrated']:
             return pos
         
-        x = (pos[0] - self.calibration['min_x']) / (self.calibration['max_x'] - self.calibration['min_x'])
-        y = (pos[1] - self.calibration['min_y']) / (self.calibration['max_y'] - self.calibration['min_y'])
-        z = (pos[2] - self.calibration['min_z']) / (self.calibration['max_z'] - self.calibration['min_z'])
-        
-        # Clamp values
-        x = max(0.0, min(1.0, x))
-        y = max(0.0, min(1.0, y))
-        z = max(0.0, min(1.0, z))
-        
-        return [x, y, z]
+        # Scale, shift and clamp all three axes at once
+        return np.clip(np.asarray(pos, dtype=np.float32) * self.position_scale + self.position_offset,
+                       0.0, 1.0).tolist()
+    
+    def press(self, key):
+        """Press a resolved profile key (keyboard key or mouse button)"""
+        if key.kind == 'mouse':
+            mouse_click(key.name)
+        else:
+            press_key_id(key.code)
+    
+    def release(self, key):
+        """Release a resolved profile key (keyboard key or mouse button)"""
+        if key.kind == 'mouse':
+            mouse_release(key.name)
+        else:
+            release_key_id(key.code)
+    
+    def report_output_stats(self):
+        """Print how many key events the state-diffing output layer suppressed"""
+        stats = self.keys.counters.summary()
+        if stats['flushes'] > 0:
+            print(f"Key output: {stats['emitted']} events emitted, {stats['suppressed']} suppressed "
+                  f"({stats['suppressed_ratio'] * 100:.1f}% unchanged) over {stats['flushes']} frames")
     
     def apply_controls(self, gestures, hand_pos=None, rotation=None):
         """Apply detected gestures to game controls"""
         
-        # Clear previous keys that are no longer active
-        for key in list(self.active_keys):
-            if key in ['left_click', 'right_click']:
-                mouse_release(key)
-            else:
-                release_key(key)
-        self.active_keys.clear()
+        # Describe this frame's held keys; unchanged keys are not re-sent
+        self.keys.begin_frame()
         
         # Apply finger controls with thumb working oppositely from other fingers
         fingers = gestures.get('fingers', {})
+        finger_keys = self.profile.finger_keys
         
         # Handle thumb separately - press when OPEN (1) [OPPOSITE LOGIC]
-        if 'thumb' in fingers and fingers['thumb'] == 1:  # Thumb is OPEN
-            key = self.controls['fingers']['thumb']
-            press_key(key)
-            self.active_keys.add(key)
+        if finger_keys[0] and fingers.get('thumb') == 1:  # Thumb is OPEN
+            self.keys.hold(finger_keys[0])
         
         # Handle other fingers - press when CLOSED (0) [SAME AS BEFORE]
         other_fingers = ['index', 'middle', 'ring', 'pinky']
-        for finger_name in other_fingers:
-            if finger_name in fingers and fingers[finger_name] == 0:  # Finger is CLOSED
-                key = self.controls['fingers'][finger_name]
-                press_key(key)
-                self.active_keys.add(key)
+        for i, finger_name in enumerate(other_fingers, start=1):
+            if finger_keys[i] and fingers.get(finger_name) == 0:  # Finger is CLOSED
+                self.keys.hold(finger_keys[i])
         
         # Apply special gestures
         special = gestures.get('special')
-        if special:
-            if special == 'fist':
-                mouse_click('left_click')
-                self.active_keys.add('left_click')
-            elif special == 'rotation':
-                mouse_click('right_click') 
-                self.active_keys.add('right_click')
-            elif special == 'hand_switch':
-                press_key(self.controls['special']['hand_switch'])
-                self.active_keys.add(self.controls['special']['hand_switch'])
+        if special and special in self.controls['special']:
+            self.keys.hold(self.controls['special'][special])
+        
+        # Send only the key changes since the last frame
+        self.keys.flush()
         
         # Apply mouse movement if hand position is provided
         if hand_pos:
             # Only move if we have previous position to compare
             if self.prev_hand_pos:
+                mouse_gain = self.profile.threshold('mouse_gain', 1000)
+                wheel_gain = self.profile.threshold('wheel_gain', 500)
+                deadband = self.profile.threshold('mouse_deadband', 1.0)
+                
                 # Map hand movements to mouse axes based on requirements
                 # X axis: Horizontal movement (side to side)
-                dx = (hand_pos[0] - self.prev_hand_pos[0]) * 1000
+                dx = (hand_pos[0] - self.prev_hand_pos[0]) * mouse_gain
                 
                 # Y axis: Z movement (depth - towards/away from camera)
-                dy = (hand_pos[2] - self.prev_hand_pos[2]) * 1000
+                dy = (hand_pos[2] - self.prev_hand_pos[2]) * mouse_gain
                 
                 # Wheel: Y movement (up and down)
-                wheel = (self.prev_hand_pos[1] - hand_pos[1]) * 500
+                wheel = (self.prev_hand_pos[1] - hand_pos[1]) * wheel_gain
                 
                 # Add to history for smoothing
                 self.movement_history.append((dx, dy, wheel))
@@ -359,11 +386,11 @@ class AdvancedHandSimulatorController:
                 wheel *= self.smoothing_factor
                 
                 # Move mouse if movement is significant
-                if abs(dx) > 1 or abs(dy) > 1:
+                if abs(dx) > deadband or abs(dy) > deadband:
                     mouse_move(dx, dy)
                 
                 # Scroll if movement is significant
-                if abs(wheel) > 1:
+                if abs(wheel) > deadband:
                     mouse_move(0, 0, wheel)
             
             # Update previous position
@@ -379,6 +406,9 @@ class AdvancedHandSimulatorController:
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         
+        # Pick up profile edits while running
+        self.profiles.start()
+        
         print("Advanced Hand Simulator Controller")
         print("Controls:")
         print("- Move hand horizontally for X-axis movement")
@@ -388,20 +418,29 @@ class AdvancedHandSimulatorController:
         print("- Close all fingers (fist) for Left Mouse Click")
         print("- Press 'd' to toggle debug mode")
         print("- Press 'c' to recalibrate")
+        print("- Press 't' for a stage timing report")
         print("- Press 'q' to quit")
         
+        timer = self.stage_timer
         while True:
+            timer.begin()
             ret, frame = cap.read()
             if not ret:
                 continue
+            
+            # Swap in a reloaded profile between frames
+            if self.profiles.current is not self.profile:
+                self.apply_profile(self.profiles.current)
                 
             # Flip frame horizontally
             frame = cv2.flip(frame, 1)
             h, w, c = frame.shape
+            timer.mark(CAPTURE)
             
             # Convert to RGB
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             results = self.hands.process(rgb_frame)
+            timer.mark(INFERENCE)
             
             gestures = {
                 'fingers': {},
@@ -444,9 +483,11 @@ class AdvancedHandSimulatorController:
                     self.mp_drawing.draw_landmarks(
                         frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
                 
+                # Smooth landmarks once for all downstream logic
+                landmarks = self.smooth_landmarks(hand_landmarks, is_right_hand)
+                
                 # Get wrist position
-                wrist = hand_landmarks.landmark[0]
-                raw_pos = [wrist.x, wrist.y, wrist.z]
+                raw_pos = landmarks[0].tolist()
                 
                 # Apply calibration if available
                 if self.calibration['is_calibrated']:
@@ -455,7 +496,7 @@ class AdvancedHandSimulatorController:
                     hand_pos = raw_pos
                 
                 # Get rotation
-                rotation = self.detect_rotation(hand_landmarks.landmark)
+                rotation = self.detect_rotation(landmarks)
                 
                 # Hand switch detection
                 if self.active_hand != hand_type:
@@ -463,7 +504,7 @@ class AdvancedHandSimulatorController:
                     self.active_hand = hand_type
                 
                 # Get finger states
-                finger_states = self.get_finger_states(hand_landmarks.landmark, is_right_hand)
+                finger_states = self.get_finger_states(landmarks, is_right_hand)
                 gestures['fingers'] = {
                     'thumb': finger_states[0],
                     'index': finger_states[1], 
@@ -472,13 +513,16 @@ class AdvancedHandSimulatorController:
                     'pinky': finger_states[4]
                 }
                 
-                # Check for special gestures
-                # Fist: all fingers closed (0)
-                if not any(finger_states):
-                    gestures['special'] = 'fist'
+                # Check for special gestures (e.g. fist: all fingers closed)
+                hand_gesture = self.classify_special(landmarks, finger_states)
+                if hand_gesture:
+                    gestures['special'] = hand_gesture
+                
+                timer.mark(FEATURES)
                 
                 # Apply controls
                 self.apply_controls(gestures, hand_pos, rotation)
+                timer.mark(OUTPUT)
                 
                 # Display current state
                 y_pos = 30
@@ -511,16 +555,16 @@ class AdvancedHandSimulatorController:
                     cv2.putText(frame, pos_text, (10, y_pos),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
             else:
-                # No hands detected - release all keys
-                release_all()
-                self.active_keys.clear()
+                # No hands detected - release all keys (no-op once released)
+                self.keys.release_all()
                 self.prev_hand_pos = None
+                timer.mark(OUTPUT)
                 
                 cv2.putText(frame, "No hands detected", (10, 30), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
             
             # Show help
-            cv2.putText(frame, "D: Debug | C: Calibrate | Q: Quit", (10, h-20), 
+            cv2.putText(frame, "D: Debug | C: Calibrate | T: Timing | Q: Quit", (10, h-20), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             
             # Show calibration status
@@ -534,8 +578,12 @@ class AdvancedHandSimulatorController:
             cv2.imshow('Advanced Hand Simulator Controller', frame)
             
             key = cv2.waitKey(1) & 0xFF
+            timer.mark(RENDER)
+            timer.end()
             if key == ord('q'):
                 break
+            elif key == ord('t'):
+                timer.report()
             elif key == ord('d'):
                 self.debug_mode = not self.debug_mode
                 print(f"Debug mode: {'ON' if self.debug_mode else 'OFF'}")
@@ -544,8 +592,11 @@ class AdvancedHandSimulatorController:
                 self.calibrate()
         
         # Clean up
+        self.keys.release_all()
         release_all()
-        self.active_keys.clear()
+        self.report_output_stats()
+        self.stage_timer.report()
+        self.profiles.stop()
         
         cap.release()
         cv2.destroyAllWindows()
@@ -1,13 +1,22 @@
 # Hand Simulator Gesture Controller
 # Complete gesture recognition system for Hand Simulator game control
 
+import os
+import sys
 import cv2
 import mediapipe as mp
 import numpy as np
 import time
 import collections
 import threading
-from keyinput import press_key, release_key
+from keyinput import press_key_id, release_key_id, resolve_key
+
+# Shared engine modules live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gesture_table import pack_hands
+from gesture_profile import ProfileWatcher
+from action_scheduler import default_scheduler
+from stage_timer import StageTimer, CAPTURE, INFERENCE, FEATURES, OUTPUT, RENDER
 
 # Configuration constants
 DETECTION_CONFIDENCE = 0.8
@@ -15,6 +24,10 @@ TRACKING_CONFIDENCE = 0.7
 FINGER_EXTENSION_THRESHOLD = 0.1
 GESTURE_SMOOTHING = 0.
 CALIBRATION_FRAMES = 60
+SPECIAL_TAP_SECONDS = 0.1  # How long special gesture keys (Enter/Esc) are held
+PROFILE_PATH = os.environ.get(
+    'AIRSYNC_PROFILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles', 'default.json'))
 
 # Initialize MediaPipe
 mp_hands = mp.solutions.hands
@@ -31,9 +44,19 @@ hands = mp_hands.Hands(
 class HandSimulatorController:
     def __init__(self):
         self.gesture_history = collections.deque(maxlen=5)
-        self.current_keys = set()
+        self.current_keys = set()  # Ids of held keys (from keyinput.resolve_key)
+        self.tapping = set()  # Special keys with a scheduled release pending
+        self.scheduler = default_scheduler()
         self.previous_gesture = None
         
+        # Key mappings, thresholds and special gestures come from the profile
+        self.profiles = ProfileWatcher(PROFILE_PATH, resolve_key)
+        self.profile = self.profiles.current
+    
+    def update_profile(self):
+        """Swap in a reloaded profile; call once per frame, between frames"""
+        self.profile = self.profiles.current
+        
     def detect_finger_states(self, hand_landmarks):
         """
         Detect which fingers are extended for each hand
@@ -86,6 +109,8 @@ class HandSimulatorController:
             'fingers': {},
             'special': None
         }
+        low = self.profile.threshold('movement_low', 0.3)
+        high = self.profile.threshold('movement_high', 0.7)
         
         # Movement controls (based on hand position)
         if left_hand_data and right_hand_data:
@@ -95,38 +120,40 @@ class HandSimulatorController:
             
             # Horizontal movement
             avg_x = (left_pos['center_x'] + right_pos['center_x']) / 2
-            if avg_x < 0.3:
+            if avg_x < low:
                 gesture['movement'] = 'left'
-            elif avg_x > 0.7:
+            elif avg_x > high:
                 gesture['movement'] = 'right'
             
             # Vertical movement
             avg_y = (left_pos['center_y'] + right_pos['center_y']) / 2
-            if avg_y < 0.3:
+            if avg_y < low:
                 gesture['movement'] = 'up'
-            elif avg_y > 0.7:
+            elif avg_y > high:
                 gesture['movement'] = 'down'
                 
         elif left_hand_data:
             # Left hand only
             left_pos = self.detect_hand_position(left_hand_data)
-            if left_pos['center_x'] < 0.3:
+            if left_pos['center_x'] < low:
                 gesture['movement'] = 'left'
-            elif left_pos['center_y'] < 0.3:
+            elif left_pos['center_y'] < low:
                 gesture['movement'] = 'up'
                 
         elif right_hand_data:
             # Right hand only
             right_pos = self.detect_hand_position(right_hand_data)
-            if right_pos['center_x'] > 0.7:
+            if right_pos['center_x'] > high:
                 gesture['movement'] = 'right'
-            elif right_pos['center_y'] > 0.7:
+            elif right_pos['center_y'] > high:
                 gesture['movement'] = 'down'
         
         # Finger controls
+        finger_states = {}
         for hand_name, hand_data in [('left', left_hand_data), ('right', right_hand_data)]:
             if hand_data:
                 fingers = self.detect_finger_states(hand_data)
+                finger_states[hand_name] = fingers
                 gesture['fingers'][hand_name] = {
                     'thumb': fingers[0],
                     'index': fingers[1],
@@ -136,17 +163,10 @@ class HandSimulatorController:
                     'all': all(fingers)
                 }
         
-        # Special gestures
+        # Special gestures (single table lookup on both hands' finger states)
         if left_hand_data and right_hand_data:
-            left_fingers = gesture['fingers']['left']
-            right_fingers = gesture['fingers']['right']
-            
-            # Check for special combinations
-            if left_fingers['all'] and right_fingers['all']:
-                gesture['special'] = 'submit'
-            elif not any([left_fingers['thumb'], left_fingers['index'], 
-                         left_fingers['middle'], left_fingers['ring'], left_fingers['pinky']]):
-                gesture['special'] = 'cancel'
+            mask = pack_hands(finger_states['left'], finger_states['right'])
+            gesture['special'] = self.profile.two_hand_table[mask]
         
         return gesture
     
@@ -154,61 +174,64 @@ class HandSimulatorController:
         """
         Apply the detected gesture to game controls
         """
-        # Movement controls
-        movement_keys = {'up': 'up', 'down': 'down', 'left': 'left', 'right': 'right'}
+        bindings = self.profile.bindings
+        
+        # Movement controls; bindings carry key ids resolved at profile load.
+        # Mouse buttons are not bound by this controller, so only keys are used.
+        movement_keys = {action: binding.code for action, binding in bindings['movement'].items()
+                         if binding.kind == 'key'}
         
         # Release previous movement keys
         for key in movement_keys.values():
             if key in self.current_keys:
-                release_key(key)
+                release_key_id(key)
                 self.current_keys.discard(key)
         
         # Apply current movement
         if gesture['movement'] and gesture['movement'] in movement_keys:
             key = movement_keys[gesture['movement']]
-            press_key(key)
+            press_key_id(key)
             self.current_keys.add(key)
         
         # Finger controls
-        finger_key_map = {
-            'thumb': 'space',
-            'index': 'f',
-            'middle': 'd',
-            'ring': 's',
-            'pinky': 'a'
-        }
+        finger_key_map = bindings['fingers']
         
         # Apply finger controls for each hand
         for hand_name, finger_data in gesture['fingers'].items():
             for finger_name, is_extended in finger_data.items():
-                if finger_name in finger_key_map:
-                    key = finger_key_map[finger_name]
+                binding = finger_key_map.get(finger_name)
+                if binding is not None and binding.kind == 'key':
+                    key = binding.code
                     
                     if is_extended:
                         if key not in self.current_keys:
-                            press_key(key)
+                            press_key_id(key)
                             self.current_keys.add(key)
                     else:
                         if key in self.current_keys:
-                            release_key(key)
+                            release_key_id(key)
                             self.current_keys.discard(key)
         
         # Special gestures
-        special_key_map = {
-            'submit': 'enter',
-            'cancel': 'esc'
-        }
+        binding = bindings['special'].get(gesture['special']) if gesture['special'] else None
         
-        if gesture['special'] and gesture['special'] in special_key_map:
-            key = special_key_map[gesture['special']]
-            press_key(key)
-            time.sleep(0.1)
-            release_key(key)
+        if binding is not None and binding.kind == 'key':
+            key = binding.code
+            # Tap without blocking the frame loop; a held gesture re-taps
+            # only after the previous tap has been released
+            if key not in self.tapping:
+                self.tapping.add(key)
+                self.scheduler.tap(key, SPECIAL_TAP_SECONDS, press_key_id, self.end_tap)
+    
+    def end_tap(self, key):
+        """Release a tapped special key (runs on the scheduler thread)"""
+        release_key_id(key)
+        self.tapping.discard(key)
     
     def release_all_keys(self):
         """Release all currently pressed keys"""
         for key in list(self.current_keys):
-            release_key(key)
+            release_key_id(key)
         self.current_keys.clear()
 
 def main():
@@ -216,6 +239,7 @@ def main():
     Main function for Hand Simulator gesture control
     """
     controller = HandSimulatorController()
+    controller.profiles.start()
     cap = cv2.VideoCapture(0)
     
     # Set camera properties
@@ -227,21 +251,30 @@ def main():
     prev_time = time.time()
     fps_values = collections.deque(maxlen=30)
     
+    # Latency of each stage of the loop; press T in the window for a report
+    stage_timer = StageTimer()
+    
     print("Hand Simulator Controller started. Press ESC to exit.")
     print("Controls:")
     print("- Hand position: Arrow keys")
     print("- Fingers: Space, F, D, G, A")
     print("- All fingers up: Enter (Submit)")
     print("- Fist: Escape (Cancel)")
+    print("- T: Stage timing report")
     
     try:
         while cap.isOpened():
+            stage_timer.begin()
             success, image = cap.read()
             if not success:
                 continue
             
+            # Swap in a reloaded profile between frames
+            controller.update_profile()
+            
             # Flip image horizontally for mirror effect
             image = cv2.flip(image, 1)
+            stage_timer.mark(CAPTURE)
             
             # Calculate FPS
             current_time = time.time()
@@ -254,6 +287,7 @@ def main():
             image.flags.writeable = False
             image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             results = hands.process(image)
+            stage_timer.mark(INFERENCE)
             
             image.flags.writeable = True
             image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
@@ -278,7 +312,9 @@ def main():
                 
                 # Classify and apply gesture
                 gesture = controller.classify_gesture(left_hand_data, right_hand_data)
+                stage_timer.mark(FEATURES)
                 controller.apply_gesture(gesture)
+                stage_timer.mark(OUTPUT)
                 
                 # Display gesture information
                 y_offset = 50
@@ -301,6 +337,7 @@ def main():
             else:
                 # No hands detected - release all keys
                 controller.release_all_keys()
+                stage_timer.mark(OUTPUT)
             
             # Display FPS
             cv2.putText(image, f"FPS: {avg_fps:.1f}", 
@@ -312,8 +349,14 @@ def main():
             
             cv2.imshow('Hand Simulator Controller', image)
             
+            key = cv2.waitKey(5) & 0xFF
+            stage_timer.mark(RENDER)
+            stage_timer.end()
+            if key == ord('t'):
+                stage_timer.report()
+            
             # Exit on ESC key
-            if cv2.waitKey(5) & 0xFF == 27:
+            if key == 27:
                 break
                 
     except KeyboardInterrupt:
@@ -322,7 +365,10 @@ def main():
         print(f"Error: {e}")
     finally:
         # Clean up
+        controller.scheduler.stop()  # Runs any pending tap releases
         controller.release_all_keys()
+        controller.profiles.stop()
+        stage_timer.report()
         cap.release()
         cv2.destroyAllWindows()
 
@@ -3,12 +3,29 @@ Hand Tracking Test Module for Hand Simulator
 Tests MediaPipe hand detection accuracy and visualizes landmark detection
 """
 
+import os
+import sys
 import cv2
 import mediapipe as mp
 import numpy as np
 import time
 import math
 
+# Shared engine modules live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmark_filter import landmarks_to_array
+
+# Landmark colours by type: fingertips red, knuckles green, wrist blue, others white
+FINGERTIPS = (4, 8, 12, 16, 20)
+KNUCKLES = (2, 5, 9, 13, 17)
+LANDMARK_COLORS = tuple(
+    (0, 0, 255) if i in FINGERTIPS else
+    (0, 255, 0) if i in KNUCKLES else
+    (255, 0, 0) if i == 0 else
+    (255, 255, 255)
+    for i in range(21))
+BONE_COLOR = (255, 255, 255)
+
 class HandSimulatorDetector:
     def __init__(self):
         # Initialize MediaPipe
@@ -31,6 +48,10 @@ class HandSimulatorDetector:
         self.show_rotation = True
         self.fps_history = []
         
+        # Skeleton drawing buffers: bone endpoint indices and landmark array
+        self.bones = np.array(sorted(self.mp_hands.HAND_CONNECTIONS), dtype=np.intp)
+        self.landmark_array = np.empty((21, 3), dtype=np.float32)
+        
     def calculate_finger_angles(self, landmarks):
         """Calculate angles for each finger"""
         # Define landmarks for each finger (tip, pip, mcp)
@@ -98,29 +119,13 @@ class HandSimulatorDetector:
     
     def draw_custom_landmarks(self, frame, landmarks, width, height):
         """Draw custom landmarks with detailed information"""
-        connections = self.mp_hands.HAND_CONNECTIONS
+        # All landmarks to pixel coordinates and depth-based radii at once
+        points = landmarks_to_array(landmarks, self.landmark_array)
+        pixels = (points[:, :2] * (width, height)).astype(np.int32)
+        radii = np.clip((5 - points[:, 2] * 40).astype(np.int32), 2, 8)
         
-        # Draw each landmark
-        for i, landmark in enumerate(landmarks):
-            # Convert normalized coordinates to pixel coordinates
-            x, y = int(landmark.x * width), int(landmark.y * height)
-            
-            # Adjust circle size by Z depth
-            z_value = landmark.z
-            radius = int(5 - z_value * 40)
-            radius = max(2, min(radius, 8))
-            
-            # Color based on landmark type (knuckles, fingertips, etc.)
-            if i in [4, 8, 12, 16, 20]:  # Fingertips
-                color = (0, 0, 255)  # Red
-            elif i in [2, 5, 9, 13, 17]:  # Knuckles
-                color = (0, 255, 0)  # Green
-            elif i == 0:  # Wrist
-                color = (255, 0, 0)  # Blue
-            else:
-                color = (255, 255, 255)  # White
-            
-            # Draw the landmark
+        # Draw each landmark, coloured by type (knuckles, fingertips, etc.)
+        for i, ((x, y), radius, color) in enumerate(zip(pixels.tolist(), radii.tolist(), LANDMARK_COLORS)):
             cv2.circle(frame, (x, y), radius, color, -1)
             
             # Show landmark number if in detailed view
@@ -128,17 +133,8 @@ class HandSimulatorDetector:
                 cv2.putText(frame, f"{i}", (x+5, y+5), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.3, color, 1)
         
-        # Draw connections
-        for connection in connections:
-            start_idx, end_idx = connection
-            start_point = landmarks[start_idx]
-            end_point = landmarks[end_idx]
-            
-            start_x, start_y = int(start_point.x * width), int(start_point.y * height)
-            end_x, end_y = int(end_point.x * width), int(end_point.y * height)
-            
-            # Draw the connection line
-            cv2.line(frame, (start_x, start_y), (end_x, end_y), (255, 255, 255), 1)
+        # Draw every connection with one polylines call
+        cv2.polylines(frame, list(pixels[self.bones]), False, BONE_COLOR, 1)
     
     def process_frame(self, frame, start_time):
         """Process a single frame for hand tracking analysis"""
@@ -1,112 +1,155 @@
 """
 Keyboard and mouse input module for Hand Simulator Controller
 Provides cross-platform key press, release, and mouse control functionality
+
+Every key name is resolved to its pynput key object once, when the controller
+is created, and gets an integer id. Pressed keys and mouse buttons are kept as
+bits of an integer indexed by that id, so a press or release is a dict lookup,
+a bit test and the pynput call. Without pynput a NullInputController with the
+same interface is used, so callers never check availability themselves.
 """
 
+import os
+import string
+import sys
+import threading
+import time
+
+# Shared engine modules live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_log import log
+
 try:
     from pynput.keyboard import Key, Controller as KeyboardController
     from pynput.mouse import Button, Controller as MouseController
-    import time
     PYNPUT_AVAILABLE = True
 except ImportError:
     print("Warning: pynput not installed. Install with: pip install pynput")
     PYNPUT_AVAILABLE = False
 
-class InputController:
+# Key names and the pynput Key attribute they map to
+SPECIAL_KEYS = {
+    # Arrow keys
+    'up': 'up',
+    'down': 'down',
+    'left': 'left',
+    'right': 'right',
+
+    # Special keys
+    'space': 'space',
+    'enter': 'enter',
+    'esc': 'esc',
+    'ctrl': 'ctrl_l',
+    'alt': 'alt_l',
+    'shift': 'shift_l',
+    'tab': 'tab',
+    'backspace': 'backspace',
+    'delete': 'delete',
+
+    # Function keys
+    'f1': 'f1', 'f2': 'f2', 'f3': 'f3', 'f4': 'f4',
+    'f5': 'f5', 'f6': 'f6', 'f7': 'f7', 'f8': 'f8',
+    'f9': 'f9', 'f10': 'f10', 'f11': 'f11', 'f12': 'f12',
+}
+
+# Single-character keys that are pressed as their character
+CHARACTER_KEYS = string.ascii_lowercase + string.digits + string.punctuation + ' '
+
+# Mouse button names and the pynput Button attribute they map to
+MOUSE_BUTTONS = {
+    'left_click': 'left',
+    'right_click': 'right',
+    'middle_click': 'middle',
+}
+
+
+class NullInputController:
+    """
+    Input controller that does nothing (used when pynput is missing)
+
+    Key names resolve to the same ids as in the real controller, so profiles
+    still validate. Nothing is sent to the OS and no key is ever recorded as
+    pressed: every press/release call returns False, pressed_keys stays
+    empty and release_all() has nothing to release.
+    """
+
+    available = False
+
     def __init__(self):
-        if PYNPUT_AVAILABLE:
-            self.keyboard = KeyboardController()
-            self.mouse = MouseController()
-        else:
-            self.keyboard = None
-            self.mouse = None
-        
-        # Key mapping for string keys to pynput Key objects
-        self.key_map = {
-            # Arrow keys
-            'up': Key.up,
-            'down': Key.down,
-            'left': Key.left,
-            'right': Key.right,
-            
-            # Special keys
-            'space': Key.space,
-            'enter': Key.enter,
-            'esc': Key.esc,
-            'ctrl': Key.ctrl_l,
-            'alt': Key.alt_l,
-            'shift': Key.shift_l,
-            'tab': Key.tab,
-            'backspace': Key.backspace,
-            'delete': Key.delete,
-            
-            # Function keys
-            'f1': Key.f1, 'f2': Key.f2, 'f3': Key.f3, 'f4': Key.f4,
-            'f5': Key.f5, 'f6': Key.f6, 'f7': Key.f7, 'f8': Key.f8,
-            'f9': Key.f9, 'f10': Key.f10, 'f11': Key.f11, 'f12': Key.f12,
-        }
-        
-        # Mouse button mapping
-        self.mouse_map = {
-            'left_click': Button.left,
-            'right_click': Button.right,
-            'middle_click': Button.middle
-        }
-        
-        # Currently pressed keys
-        self.pressed_keys = set()
-        self.pressed_mouse_buttons = set()
-    
-    def _get_key(self, key_str):
-        """Convert string key to appropriate key object"""
-        if not PYNPUT_AVAILABLE:
-            return None
-            
-        key_str = str(key_str).lower()
-        
-        # Check if it's a special key
-        if key_str in self.key_map:
-            return self.key_map[key_str]
-        
-        # For single character keys, return as string
-        if len(key_str) == 1:
-            return key_str
-        
-        # Return as string for other cases
-        return key_str
-    
+        self.key_ids = {}
+        self.key_names = []
+        self.key_objects = []
+        for name, attribute in SPECIAL_KEYS.items():
+            self._add_key(name, self._special_key(attribute))
+        for char in CHARACTER_KEYS:
+            self._add_key(char, char)
+
+        self.button_ids = {name: button_id for button_id, name in enumerate(MOUSE_BUTTONS)}
+        self.button_objects = [self._mouse_button(attribute) for attribute in MOUSE_BUTTONS.values()]
+
+        # Bit i set = key / mouse button with id i is pressed
+        self.pressed = 0
+        self.pressed_buttons = 0
+        # Held across check, OS call and bit update: releases also come from
+        # the action scheduler's thread (end_tap) while the frame loop presses
+        self._lock = threading.Lock()
+
+        # Errors from the OS are counted and logged (rate limited)
+        self.errors = 0
+        self.last_error = None
+
+    def _special_key(self, attribute):
+        return attribute
+
+    def _mouse_button(self, attribute):
+        return attribute
+
+    def _add_key(self, name, key_object):
+        self.key_ids[name] = len(self.key_objects)
+        self.key_names.append(name)
+        self.key_objects.append(key_object)
+
+    def key_id(self, key_str):
+        """
+        Integer id of a key name
+
+        Names are matched case-insensitively; the spelling used is cached so
+        the next lookup of it is a single dict access.
+
+        Returns:
+            key_id: Id of the key, or None if it is not mapped
+        """
+        key_id = self.key_ids.get(key_str)
+        if key_id is None:
+            key_id = self.key_ids.get(str(key_str).lower())
+            if key_id is not None:
+                self.key_ids[key_str] = key_id
+        return key_id
+
+    def _error(self, action, name, error):
+        self.errors += 1
+        self.last_error = error
+        # Off the input path and rate limited: a failing key can error every frame
+        log("Error %s '%s': %s", action, name, error, key='input_error')
+
     def press_key(self, key_str):
         """Press and hold a key"""
-        if not PYNPUT_AVAILABLE or self.keyboard is None:
-            print(f"Cannot press key '{key_str}' - pynput not available")
-            return False
-        
-        try:
-            key = self._get_key(key_str)
-            if key and key_str not in self.pressed_keys:
-                self.keyboard.press(key)
-                self.pressed_keys.add(key_str)
-                return True
-        except Exception as e:
-            print(f"Error pressing key '{key_str}': {e}")
-        return False
-    
+        key_id = self.key_id(key_str)
+        return key_id is not None and self.press_id(key_id)
+
     def release_key(self, key_str):
         """Release a key"""
-        if not PYNPUT_AVAILABLE or self.keyboard is None:
-            print(f"Cannot release key '{key_str}' - pynput not available")
-            return False
-        
-        try:
-            key = self._get_key(key_str)
-            if key and key_str in self.pressed_keys:
-                self.keyboard.release(key)
-                self.pressed_keys.discard(key_str)
-                return True
-        except Exception as e:
-            print(f"Error releasing key '{key_str}': {e}")
+        key_id = self.key_id(key_str)
+        return key_id is not None and self.release_id(key_id)
+
+    def press_id(self, key_id):
+        """Press and hold a key by its id (from key_id()), without the name lookup"""
         return False
-    
+
+    def release_id(self, key_id):
+        """Release a key by its id (from key_id())"""
+        return False
+
     def tap_key(self, key_str, duration=0.1):
         """Press and release a key with optional duration"""
         if self.press_key(key_str):
@@ -114,67 +157,141 @@ class InputController:
             self.release_key(key_str)
             return True
         return False
-    
+
     def mouse_click(self, button='left_click'):
         """Press and hold a mouse button"""
-        if not PYNPUT_AVAILABLE or self.mouse is None:
-            print(f"Cannot click mouse '{button}' - pynput not available")
-            return False
-        
-        try:
-            btn = self.mouse_map.get(button, Button.left)
-            if button not in self.pressed_mouse_buttons:
-                self.mouse.press(btn)
-                self.pressed_mouse_buttons.add(button)
-                return True
-        except Exception as e:
-            print(f"Error clicking mouse '{button}': {e}")
         return False
-    
+
     def mouse_release(self, button='left_click'):
         """Release a mouse button"""
-        if not PYNPUT_AVAILABLE or self.mouse is None:
-            print(f"Cannot release mouse '{button}' - pynput not available")
-            return False
-        
-        try:
-            btn = self.mouse_map.get(button, Button.left)
-            if button in self.pressed_mouse_buttons:
-                self.mouse.release(btn)
-                self.pressed_mouse_buttons.discard(button)
-                return True
-        except Exception as e:
-            print(f"Error releasing mouse '{button}': {e}")
         return False
-    
+
+    def mouse_move(self, dx, dy, wheel=0):
+        """Move mouse by delta x, y and scroll wheel"""
+        return False
+
+    @property
+    def pressed_keys(self):
+        """Names of the currently pressed keys"""
+        return {name for key_id, name in enumerate(self.key_names) if self.pressed >> key_id & 1}
+
+    def release_all(self):
+        """Release all currently pressed keys and mouse buttons"""
+        key_id = 0
+        while self.pressed >> key_id:
+            if self.pressed >> key_id & 1:
+                self.release_key(self.key_names[key_id])
+            key_id += 1
+
+        for name, button_id in self.button_ids.items():
+            if self.pressed_buttons >> button_id & 1:
+                self.mouse_release(name)
+
+        # Drop the state even if the OS refused a release
+        with self._lock:
+            self.pressed = 0
+            self.pressed_buttons = 0
+
+
+class InputController(NullInputController):
+    """Sends key and mouse input through pynput"""
+
+    available = True
+
+    def __init__(self):
+        self.keyboard = KeyboardController()
+        self.mouse = MouseController()
+        super().__init__()
+
+    def _special_key(self, attribute):
+        return getattr(Key, attribute)
+
+    def _mouse_button(self, attribute):
+        return getattr(Button, attribute)
+
+    def press_id(self, key_id):
+        """Press and hold a key by its id (from key_id()), without the name lookup"""
+        bit = 1 << key_id
+        with self._lock:
+            if self.pressed & bit:
+                return False
+            try:
+                self.keyboard.press(self.key_objects[key_id])
+            except Exception as e:
+                self._error("pressing key", self.key_names[key_id], e)
+                return False
+            self.pressed |= bit
+            return True
+
+    def release_id(self, key_id):
+        """Release a key by its id (from key_id())"""
+        bit = 1 << key_id
+        with self._lock:
+            if not self.pressed & bit:
+                return False
+            try:
+                self.keyboard.release(self.key_objects[key_id])
+            except Exception as e:
+                self._error("releasing key", self.key_names[key_id], e)
+                return False
+            self.pressed &= ~bit
+            return True
+
+    def mouse_click(self, button='left_click'):
+        """Press and hold a mouse button"""
+        button_id = self.button_ids.get(button, 0)
+        bit = 1 << button_id
+        with self._lock:
+            if self.pressed_buttons & bit:
+                return False
+            try:
+                self.mouse.press(self.button_objects[button_id])
+            except Exception as e:
+                self._error("clicking mouse", button, e)
+                return False
+            self.pressed_buttons |= bit
+            return True
+
+    def mouse_release(self, button='left_click'):
+        """Release a mouse button"""
+        button_id = self.button_ids.get(button, 0)
+        bit = 1 << button_id
+        with self._lock:
+            if not self.pressed_buttons & bit:
+                return False
+            try:
+                self.mouse.release(self.button_objects[button_id])
+            except Exception as e:
+                self._error("releasing mouse", button, e)
+                return False
+            self.pressed_buttons &= ~bit
+            return True
+
     def mouse_move(self, dx, dy, wheel=0):
         """Move mouse by delta x, y and scroll wheel"""
-        if not PYNPUT_AVAILABLE or self.mouse is None:
-            return False
-        
         try:
             if dx != 0 or dy != 0:
                 self.mouse.move(dx, dy)
-            
+
             if wheel != 0:
                 self.mouse.scroll(0, wheel)
             return True
         except Exception as e:
-            print(f"Error moving mouse: {e}")
+            self._error("moving", "mouse", e)
         return False
-    
-    def release_all(self):
-        """Release all currently pressed keys and mouse buttons"""
-        # Release all keys
-        for key_str in list(self.pressed_keys):
-            self.release_key(key_str)
-        
-        # Release all mouse buttons
-        for button in list(self.pressed_mouse_buttons):
-            self.mouse_release(button)
+
+
+def create_controller():
+    """Real controller if pynput can be used, otherwise the null controller"""
+    if PYNPUT_AVAILABLE:
+        try:
+            return InputController()
+        except Exception as e:
+            print(f"Warning: pynput controllers unavailable ({e}), input is disabled")
+    return NullInputController()
 
 # Global controller instance
-_input_controller = InputController()
+_input_controller = create_controller()
 
 # Public API functions
 def press_key(key_str):
@@ -189,6 +306,21 @@ def tap_key(key_str, duration=0.1):
     """Press and release a key with optional duration"""
     return _input_controller.tap_key(key_str, duration)
 
+def resolve_key(key_str):
+    """Resolve a key name to its key id for press_key_id(), raising ValueError for unknown keys"""
+    key_id = _input_controller.key_id(key_str)
+    if key_id is None:
+        raise ValueError(f"Key '{key_str}' not mapped.")
+    return key_id
+
+def press_key_id(key_id):
+    """Press and hold a key resolved with resolve_key()"""
+    return _input_controller.press_id(key_id)
+
+def release_key_id(key_id):
+    """Release a key resolved with resolve_key()"""
+    return _input_controller.release_id(key_id)
+
 def mouse_click(button='left_click'):
     """Press and hold a mouse button"""
     return _input_controller.mouse_click(button)
@@ -207,7 +339,7 @@ def release_all():
 
 def is_available():
     """Check if input control is available"""
-    return PYNPUT_AVAILABLE
+    return _input_controller.available
 
 # Test function
 def test_keys():
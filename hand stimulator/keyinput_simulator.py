@@ -1,9 +1,22 @@
 # Enhanced keyinput module for Hand Simulator
 # Includes mouse control and additional keys for Hand Simulator
 
-import ctypes
+import os
+import sys
 import time
 
+# Shared engine modules live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from input_backend import (
+    KEYEVENTF_EXTENDEDKEY, KEYEVENTF_KEYUP, KEYEVENTF_SCANCODE,
+    MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP, MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP,
+    MOUSEEVENTF_MOVE, MOUSEEVENTF_ABSOLUTE, MOUSEEVENTF_WHEEL, MOUSEEVENTF_HWHEEL,
+    PUL, KeyBdInput, HardwareInput, MouseInput, Input_I, Input,
+    InputBatch, KeyTable, create_backend,
+)
+from action_scheduler import default_scheduler
+from async_log import log
+
 # Virtual Key Codes and scan codes for Hand Simulator controls
 keys = {
     # Movement keys
@@ -50,123 +63,65 @@ keys = {
     "5": {"vk": 0x35, "scan": 0x06},
 }
 
-# Define Windows API constants
-KEYEVENTF_EXTENDEDKEY = 0x0001
-KEYEVENTF_KEYUP = 0x0002
-KEYEVENTF_SCANCODE = 0x0008
-
-# Mouse constants
-MOUSEEVENTF_LEFTDOWN = 0x0002
-MOUSEEVENTF_LEFTUP = 0x0004
-MOUSEEVENTF_RIGHTDOWN = 0x0008
-MOUSEEVENTF_RIGHTUP = 0x0010
-MOUSEEVENTF_MOVE = 0x0001
-MOUSEEVENTF_ABSOLUTE = 0x8000
-MOUSEEVENTF_WHEEL = 0x0800
-MOUSEEVENTF_HWHEEL = 0x1000
-
-PUL = ctypes.POINTER(ctypes.c_ulong)
-
-class KeyBdInput(ctypes.Structure):
-    _fields_ = [("wVk", ctypes.c_ushort),
-                ("wScan", ctypes.c_ushort),
-                ("dwFlags", ctypes.c_ulong),
-                ("time", ctypes.c_ulong),
-                ("dwExtraInfo", PUL)]
+# Press/release INPUT records for every key above, built once and indexed by key id
+key_table = KeyTable(keys)
 
-class HardwareInput(ctypes.Structure):
-    _fields_ = [("uMsg", ctypes.c_ulong),
-                ("wParamL", ctypes.c_short),
-                ("wParamH", ctypes.c_ushort)]
+# Output backend (win32 SendInput by default, see input_backend.py)
+backend = create_backend()
 
-class MouseInput(ctypes.Structure):
-    _fields_ = [("dx", ctypes.c_long),
-                ("dy", ctypes.c_long),
-                ("mouseData", ctypes.c_ulong),
-                ("dwFlags", ctypes.c_ulong),
-                ("time", ctypes.c_ulong),
-                ("dwExtraInfo", PUL)]
+# Profile names for mouse buttons
+MOUSE_KEYS = {"left_click": "left", "right_click": "right"}
 
-class Input_I(ctypes.Union):
-    _fields_ = [("ki", KeyBdInput),
-                 ("mi", MouseInput),
-                 ("hi", HardwareInput)]
+def set_backend(new_backend):
+    """Send all further input events through another backend (e.g. RecordingBackend)"""
+    global backend
+    backend = new_backend
 
-class Input(ctypes.Structure):
-    _fields_ = [("type", ctypes.c_ulong),
-                ("ii", Input_I)]
+def batch():
+    """
+    Start a batch of key and mouse events that is sent with a single SendInput
+    
+    Usage:
+        with keyinput_simulator.batch() as b:
+            queue_key(b, 'space', down=True)
+            b.mouse_move(10, 0)
+    """
+    return InputBatch(backend, key_table)
+
+def queue_key(input_batch, key, down):
+    """Add a key (or left_click/right_click) press or release to a batch"""
+    if key in MOUSE_KEYS:
+        input_batch.mouse_button(MOUSE_KEYS[key], down)
+    elif key not in key_table:
+        log("Warning: Key '%s' not mapped.", key)
+    elif down:
+        input_batch.press(key)
+    else:
+        input_batch.release(key)
 
 def press_key(key):
     """Press a keyboard key"""
-    if key == "left_click":
-        mouse_click(button="left", action="down")
-        return
-    elif key == "right_click":
-        mouse_click(button="right", action="down")
+    key_id = key_table.ids.get(key)
+    if key_id is None:
+        # Mouse buttons (and the unmapped-key warning) go through a batch
+        with batch() as b:
+            queue_key(b, key, down=True)
         return
-    
-    if key not in keys:
-        print(f"Warning: Key '{key}' not mapped.")
-        return
-    
-    key_info = keys[key]
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    
-    # Set flags
-    flags = KEYEVENTF_SCANCODE
-    if key_info.get("extended", False):
-        flags |= KEYEVENTF_EXTENDEDKEY
-    
-    ii_.ki = KeyBdInput(key_info["vk"], key_info["scan"], flags, 0, ctypes.pointer(extra))
-    x = Input(ctypes.c_ulong(1), ii_)
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
+    backend.send(key_table.press_events[key_id])
 
 def release_key(key):
     """Release a keyboard key"""
-    if key == "left_click":
-        mouse_click(button="left", action="up")
-        return
-    elif key == "right_click":
-        mouse_click(button="right", action="up")
+    key_id = key_table.ids.get(key)
+    if key_id is None:
+        with batch() as b:
+            queue_key(b, key, down=False)
         return
-    
-    if key not in keys:
-        print(f"Warning: Key '{key}' not mapped.")
-        return
-    
-    key_info = keys[key]
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    
-    # Set flags for key release
-    flags = KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP
-    if key_info.get("extended", False):
-        flags |= KEYEVENTF_EXTENDEDKEY
-    
-    ii_.ki = KeyBdInput(key_info["vk"], key_info["scan"], flags, 0, ctypes.pointer(extra))
-    x = Input(ctypes.c_ulong(1), ii_)
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
+    backend.send(key_table.release_events[key_id])
 
 def mouse_click(button="left", action="down"):
     """Perform mouse click"""
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    
-    if button == "left":
-        if action == "down":
-            flags = MOUSEEVENTF_LEFTDOWN
-        else:
-            flags = MOUSEEVENTF_LEFTUP
-    else:  # right button
-        if action == "down":
-            flags = MOUSEEVENTF_RIGHTDOWN
-        else:
-            flags = MOUSEEVENTF_RIGHTUP
-    
-    ii_.mi = MouseInput(0, 0, 0, flags, 0, ctypes.pointer(extra))
-    x = Input(ctypes.c_ulong(0), ii_)  # 0 for mouse input
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
+    with batch() as b:
+        b.mouse_button("left" if button == "left" else "right", action == "down")
 
 def mouse_move(dx, dy, wheel=0):
     """
@@ -177,65 +132,56 @@ def mouse_move(dx, dy, wheel=0):
         dy: vertical movement (positive = down, negative = up)
         wheel: mouse wheel movement (positive = up/away, negative = down/toward)
     """
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    
-    # First handle regular movement if needed
-    if dx != 0 or dy != 0:
-        flags = MOUSEEVENTF_MOVE
-        ii_.mi = MouseInput(int(dx), int(dy), 0, flags, 0, ctypes.pointer(extra))
-        x = Input(ctypes.c_ulong(0), ii_)  # 0 for mouse input
-        ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
-    
-    # Then handle wheel if needed
-    if wheel != 0:
-        flags = MOUSEEVENTF_WHEEL
-        wheel_amount = int(wheel)  # Positive = scroll up, negative = scroll down
-        ii_.mi = MouseInput(0, 0, wheel_amount, flags, 0, ctypes.pointer(extra))
-        x = Input(ctypes.c_ulong(0), ii_)
-        ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
+    # Movement and wheel go out together in one SendInput
+    with batch() as b:
+        b.mouse_move(dx, dy, wheel)
 
 def tap_key(key, duration=0.1):
-    """Press and release a key quickly"""
-    press_key(key)
-    time.sleep(duration)
-    release_key(key)
+    """Press a key now and release it after duration seconds (does not block)"""
+    return default_scheduler().tap(key, duration, press_key, release_key)
 
 def hold_key(key, duration=1.0):
-    """Hold a key for specified duration"""
-    press_key(key)
-    time.sleep(duration)
-    release_key(key)
+    """Hold a key for specified duration (does not block)"""
+    return default_scheduler().tap(key, duration, press_key, release_key)
 
 def press_key_combination(keys_list):
-    """Press multiple keys simultaneously"""
-    for key in keys_list:
-        press_key(key)
+    """Press multiple keys simultaneously (one SendInput for all of them)"""
+    with batch() as b:
+        for key in keys_list:
+            queue_key(b, key, down=True)
 
 def release_key_combination(keys_list):
-    """Release multiple keys"""
-    for key in keys_list:
-        release_key(key)
+    """Release multiple keys (one SendInput for all of them)"""
+    with batch() as b:
+        for key in keys_list:
+            queue_key(b, key, down=False)
 
 def release_all():
     """Release all currently pressed keys and mouse buttons"""
     # Common keys to ensure are released
     important_keys = ['a', 's', 'd', 'f', 'space', 'ctrl', 'shift', 'up', 'down', 'left', 'right']
     
-    for key in important_keys:
-        release_key(key)
-    
-    # Release mouse buttons
-    mouse_click("left", "up")
-    mouse_click("right", "up")
+    # Keys and mouse buttons are released in a single SendInput
+    with batch() as b:
+        for key in important_keys:
+            b.release(key)
+        b.mouse_button("left", False)
+        b.mouse_button("right", False)
 
 def type_text(text, delay=0.05):
-    """Type text by sending individual key presses"""
+    """Type text by sending individual key presses (scheduled, does not block)"""
+    steps = []
     for char in text:
         if char.lower() in keys:
-            tap_key(char.lower(), delay)
+            key = char.lower()
         elif char == " ":
-            tap_key("space", delay)
+            key = "space"
+        else:
+            continue
+        # Each key is held for delay and pressed right after the previous release
+        steps.append((0.0, press_key, (key,)))
+        steps.append((delay, release_key, (key,)))
+    return default_scheduler().sequence(steps)
 
 # Test function
 def test_keys():
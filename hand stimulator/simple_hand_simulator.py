@@ -1,11 +1,26 @@
 # Simple Hand Simulator Controller
 # Basic implementation for quick testing
 
+import os
+import sys
 import cv2
 import mediapipe as mp
 import numpy as np
 import time
-from keyinput import press_key, release_key, mouse_move, mouse_click, mouse_release
+from keyinput import press_key_id, release_key_id, mouse_move, mouse_click, mouse_release, resolve_key
+
+# Shared engine modules live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmark_filter import LandmarkFilterBank, landmarks_to_array
+from gesture_table import pack_fingers
+from gesture_profile import ProfileWatcher
+from output_state import DiffingKeyboardOutput
+from stage_timer import StageTimer, CAPTURE, INFERENCE, FEATURES, OUTPUT, RENDER
+
+# Gesture/keymap profile, hot-reloaded while the controller runs
+PROFILE_PATH = os.environ.get(
+    'AIRSYNC_PROFILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles', 'default.json'))
 
 class SimpleHandSimulator:
     def __init__(self):
@@ -20,30 +35,8 @@ class SimpleHandSimulator:
             min_tracking_confidence=0.5
         )
         
-        # Current active keys
-        self.active_keys = set()
-        
-        # Key mappings based on your Hand Simulator image
-        self.controls = {
-            'movement': {
-                'up': 'up',
-                'down': 'down', 
-                'left': 'left',
-                'right': 'right'
-            },
-            'fingers': {
-                'thumb': 'space',
-                'index': 'f',
-                'middle': 'd',
-                'ring': 's',  # Fixed: Changed from 'g' to 's' based on image
-                'pinky': 'a'
-            },
-            'special': {
-                'fist': 'left_click',
-                'rotation': 'right_click',
-                'hand_switch': 'shift',
-            }
-        }
+        # Held keys; only changes are sent, once per frame
+        self.keys = DiffingKeyboardOutput(self.press, self.release)
         
         # Track which hand is active
         self.active_hand = "right"  # Default to right hand
@@ -51,10 +44,46 @@ class SimpleHandSimulator:
         # Previous hand position for movement
         self.prev_hand_pos = None
         self.movement_smoothing = 0.5  # Smoothing factor
+        
+        # Landmark smoothing (slot 0 = left hand, slot 1 = right hand)
+        self.landmark_filter = LandmarkFilterBank(max_hands=2)
+        self.raw_landmarks = np.zeros((2, 21, 3), dtype=np.float32)
+        self.hand_present = np.zeros(2, dtype=bool)
+        
+        # Key mappings, thresholds and gestures come from the profile file
+        self.profiles = ProfileWatcher(PROFILE_PATH, resolve_key)
+        self.apply_profile(self.profiles.current)
+        
+        # Latency of each stage of the control loop
+        self.stage_timer = StageTimer()
+    
+    def apply_profile(self, profile):
+        """Switch to a compiled profile (called between frames)"""
+        self.profile = profile
+        self.controls = profile.bindings
+        self.landmark_filter.set_parameters(**profile.filters)
+    
+    def classify_special(self, landmarks, finger_states):
+        """Match the profile's finger-state gestures, then its custom templates"""
+        special = self.profile.one_hand_table[pack_fingers(finger_states)]
+        if special is None and self.profile.template_classifier is not None:
+            special = self.profile.template_classifier.predict(landmarks)
+        return special
+    
+    def smooth_landmarks(self, hand_landmarks, is_right_hand):
+        """Smooth the main hand's landmarks, returns a (21, 3) array"""
+        slot = 1 if is_right_hand else 0
+        landmarks_to_array(hand_landmarks.landmark, out=self.raw_landmarks[slot])
+        self.hand_present[:] = False
+        self.hand_present[slot] = True
+        smoothed = self.landmark_filter.update(
+            self.raw_landmarks, time.perf_counter(), self.hand_present)
+        return smoothed[slot]
     
     def get_finger_states(self, landmarks, is_right_hand=True):
         """
         Detect finger states (1=extended/open, 0=closed/down)
+        Takes a (21, 3) landmark array
         Returns: Array of 5 binary values [thumb, index, middle, ring, pinky]
         """
         fingers = []
@@ -62,13 +91,13 @@ class SimpleHandSimulator:
         # Adjust for left/right hand
         if is_right_hand:
             # Thumb - check x position relative to index base
-            if landmarks[4].x > landmarks[3].x:
+            if landmarks[4, 0] > landmarks[3, 0]:
                 fingers.append(1)  # Extended
             else:
                 fingers.append(0)  # Closed
         else:
             # For left hand, thumb is extended when x is less than previous joint
-            if landmarks[4].x < landmarks[3].x:
+            if landmarks[4, 0] < landmarks[3, 0]:
                 fingers.append(1)  # Extended
             else:
                 fingers.append(0)  # Closed
@@ -79,7 +108,7 @@ class SimpleHandSimulator:
         
         for tip, pip in zip(finger_tips, finger_pips):
             # Extended when tip is higher (smaller y) than pip
-            if landmarks[tip].y < landmarks[pip].y:
+            if landmarks[tip, 1] < landmarks[pip, 1]:
                 fingers.append(1)  # Extended
             else:
                 fingers.append(0)  # Closed
@@ -88,20 +117,22 @@ class SimpleHandSimulator:
     
     def detect_movement(self, wrist_pos):
         """Detect hand movement for directional control"""
-        x, y = wrist_pos.x, wrist_pos.y
+        x, y = wrist_pos[0], wrist_pos[1]
+        low = self.profile.threshold('movement_low', 0.3)
+        high = self.profile.threshold('movement_high', 0.7)
         
         movement = []
         
         # Horizontal movement
-        if x < 0.3:
+        if x < low:
             movement.append('left')
-        elif x > 0.7:
+        elif x > high:
             movement.append('right')
             
         # Vertical movement  
-        if y < 0.3:
+        if y < low:
             movement.append('up')
-        elif y > 0.7:
+        elif y > high:
             movement.append('down')
             
         return movement
@@ -113,23 +144,37 @@ class SimpleHandSimulator:
         else:
             return "left"
     
+    def press(self, key):
+        """Press a resolved profile key (keyboard key or mouse button)"""
+        if key.kind == 'mouse':
+            mouse_click(key.name)
+        else:
+            press_key_id(key.code)
+    
+    def release(self, key):
+        """Release a resolved profile key (keyboard key or mouse button)"""
+        if key.kind == 'mouse':
+            mouse_release(key.name)
+        else:
+            release_key_id(key.code)
+    
+    def report_output_stats(self):
+        """Print how many key events the state-diffing output layer suppressed"""
+        stats = self.keys.counters.summary()
+        if stats['flushes'] > 0:
+            print(f"Key output: {stats['emitted']} events emitted, {stats['suppressed']} suppressed "
+                  f"({stats['suppressed_ratio'] * 100:.1f}% unchanged) over {stats['flushes']} frames")
+    
     def apply_controls(self, gestures, hand_pos=None):
         """Apply detected gestures to game controls"""
         
-        # Clear previous keys
-        for key in list(self.active_keys):
-            if key in ['left_click', 'right_click']:
-                mouse_release(key)
-            else:
-                release_key(key)
-        self.active_keys.clear()
+        # Describe this frame's held keys; unchanged keys are not re-sent
+        self.keys.begin_frame()
         
         # Apply movement
         for movement in gestures.get('movement', []):
             if movement in self.controls['movement']:
-                key = self.controls['movement'][movement]
-                press_key(key)
-                self.active_keys.add(key)
+                self.keys.hold(self.controls['movement'][movement])
         
         # Apply finger controls - INVERTED LOGIC:
         # Now we press keys when fingers are CLOSED (0), not when open (1)
@@ -138,42 +183,40 @@ class SimpleHandSimulator:
         
         for i, finger_name in enumerate(finger_names):
             # Only press key when finger is closed (0), not open (1)
-            if fingers.get(finger_name, 1) == 0:  # Default to open if not found
-                key = self.controls['fingers'][finger_name]
-                press_key(key)
-                self.active_keys.add(key)
+            key = self.profile.finger_keys[i]
+            if key and fingers.get(finger_name, 1) == 0:  # Default to open if not found
+                self.keys.hold(key)
         
         # Apply special gestures
         special = gestures.get('special')
-        if special:
-            if special == 'fist':
-                mouse_click('left_click')
-                self.active_keys.add('left_click')
-            elif special == 'rotation':
-                mouse_click('right_click') 
-                self.active_keys.add('right_click')
-            elif special == 'hand_switch':
-                press_key(self.controls['special']['hand_switch'])
-                self.active_keys.add(self.controls['special']['hand_switch'])
+        if special and special in self.controls['special']:
+            self.keys.hold(self.controls['special'][special])
+        
+        # Send only the key changes since the last frame
+        self.keys.flush()
         
         # Apply mouse movement if hand position is provided
         if hand_pos:
             # Only move if we have previous position to compare
             if self.prev_hand_pos:
-                dx = (hand_pos[0] - self.prev_hand_pos[0]) * 1000  # X movement (horizontal)
-                dy = (hand_pos[2] - self.prev_hand_pos[2]) * 1000  # Z movement (depth for Y axis)
-                wheel = (self.prev_hand_pos[1] - hand_pos[1]) * 500  # Y movement (vertical for scroll)
+                mouse_gain = self.profile.threshold('mouse_gain', 1000)
+                wheel_gain = self.profile.threshold('wheel_gain', 500)
+                deadband = self.profile.threshold('mouse_deadband', 1.0)
+                
+                dx = (hand_pos[0] - self.prev_hand_pos[0]) * mouse_gain  # X movement (horizontal)
+                dy = (hand_pos[2] - self.prev_hand_pos[2]) * mouse_gain  # Z movement (depth for Y axis)
+                wheel = (self.prev_hand_pos[1] - hand_pos[1]) * wheel_gain  # Y movement (vertical for scroll)
                 
                 # Apply smoothing
                 dx *= self.movement_smoothing
                 dy *= self.movement_smoothing
                 
                 # Move mouse
-                if abs(dx) > 1 or abs(dy) > 1:
+                if abs(dx) > deadband or abs(dy) > deadband:
                     mouse_move(dx, dy)
                 
                 # Scroll
-                if abs(wheel) > 1:
+                if abs(wheel) > deadband:
                     mouse_move(0, 0, wheel)
             
             # Update previous position
@@ -185,26 +228,38 @@ class SimpleHandSimulator:
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         
+        # Pick up profile edits while running
+        self.profiles.start()
+        
         print("Simple Hand Simulator Controller")
         print("Controls:")
         print("- Move hands to edges for movement")
         print("- Close fingers for control: Thumb=Space, Index=F, Middle=D, Ring=S, Pinky=A") 
         print("- Closed fist = Left Mouse Click")
         print("- Open hand with rotation = Right Mouse Click") 
+        print("- Press 't' for a stage timing report")
         print("- Press 'q' to quit")
         
+        timer = self.stage_timer
         while True:
+            timer.begin()
             ret, frame = cap.read()
             if not ret:
                 continue
+            
+            # Swap in a reloaded profile between frames
+            if self.profiles.current is not self.profile:
+                self.apply_profile(self.profiles.current)
                 
             # Flip frame horizontally
             frame = cv2.flip(frame, 1)
             h, w, c = frame.shape
+            timer.mark(CAPTURE)
             
             # Convert to RGB
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             results = self.hands.process(rgb_frame)
+            timer.mark(INFERENCE)
             
             gestures = {
                 'movement': [],
@@ -238,17 +293,20 @@ class SimpleHandSimulator:
                 self.mp_drawing.draw_landmarks(
                     frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
                 
+                # Smooth landmarks once for all downstream logic
+                is_right_hand = (hand_type == "right")
+                landmarks = self.smooth_landmarks(hand_landmarks, is_right_hand)
+                
                 # Get wrist position for movement
-                wrist = hand_landmarks.landmark[0]
+                wrist = landmarks[0]
                 movement = self.detect_movement(wrist)
                 gestures['movement'].extend(movement)
                 
                 # Get 3D position for mouse control
-                hand_pos = [wrist.x, wrist.y, wrist.z]
+                hand_pos = wrist.tolist()
                 
                 # Get finger states
-                is_right_hand = (hand_type == "right")
-                finger_states = self.get_finger_states(hand_landmarks.landmark, is_right_hand)
+                finger_states = self.get_finger_states(landmarks, is_right_hand)
                 gestures['fingers'] = {
                     'thumb': finger_states[0],
                     'index': finger_states[1], 
@@ -257,18 +315,19 @@ class SimpleHandSimulator:
                     'pinky': finger_states[4]
                 }
                 
-                # Check for special gestures
-                # Fist: all fingers closed
-                if not any(finger_states):
-                    gestures['special'] = 'fist'
+                # Check for special gestures (e.g. fist: all fingers closed)
+                gestures['special'] = self.classify_special(landmarks, finger_states)
                 
                 # Hand switch detection based on active hand changing
                 if self.active_hand != hand_type:
                     gestures['special'] = 'hand_switch'
                     self.active_hand = hand_type
                 
+                timer.mark(FEATURES)
+                
                 # Apply controls
                 self.apply_controls(gestures, hand_pos)
+                timer.mark(OUTPUT)
                 
                 # Display current state
                 y_pos = 30
@@ -294,14 +353,10 @@ class SimpleHandSimulator:
                     cv2.putText(frame, f"Special: {gestures['special']}", (10, y_pos), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
             else:
-                # No hands detected - release all keys
-                for key in list(self.active_keys):
-                    if key in ['left_click', 'right_click']:
-                        mouse_release(key)
-                    else:
-                        release_key(key)
-                self.active_keys.clear()
+                # No hands detected - release all keys (no-op once released)
+                self.keys.release_all()
                 self.prev_hand_pos = None
+                timer.mark(OUTPUT)
                 
                 cv2.putText(frame, "No hands detected", (10, 30), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
@@ -312,16 +367,18 @@ class SimpleHandSimulator:
             cv2.imshow('Simple Hand Simulator Controller', frame)
             
             key = cv2.waitKey(1) & 0xFF
+            timer.mark(RENDER)
+            timer.end()
             if key == ord('q'):
                 break
+            elif key == ord('t'):
+                timer.report()
         
         # Clean up
-        for key in list(self.active_keys):
-            if key in ['left_click', 'right_click']:
-                mouse_release(key)
-            else:
-                release_key(key)
-        self.active_keys.clear()
+        self.keys.release_all()
+        self.report_output_stats()
+        self.stage_timer.report()
+        self.profiles.stop()
         
         cap.release()
         cv2.destroyAllWindows()
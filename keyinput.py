@@ -1,6 +1,12 @@
-import ctypes
 import time
 
+# Windows input structures and constants live with the output backends
+from input_backend import (
+    KEYEVENTF_EXTENDEDKEY, KEYEVENTF_KEYUP, KEYEVENTF_SCANCODE,
+    PUL, KeyBdInput, HardwareInput, MouseInput, Input_I, Input,
+    InputBatch, KeyTable, create_backend,
+)
+
 # Virtual Key Codes (VK) and scan codes for game controls
 # This expanded dictionary includes both VK and scan codes for better compatibility
 keys = {
@@ -27,79 +33,36 @@ keys = {
     "right": {"vk": 0x27, "scan": 0x4D, "extended": True},
 }
 
-# Define constants
-KEYEVENTF_EXTENDEDKEY = 0x0001
-KEYEVENTF_KEYUP = 0x0002
-KEYEVENTF_SCANCODE = 0x0008
-
-PUL = ctypes.POINTER(ctypes.c_ulong)
-
-class KeyBdInput(ctypes.Structure):
-    _fields_ = [("wVk", ctypes.c_ushort),
-                ("wScan", ctypes.c_ushort),
-                ("dwFlags", ctypes.c_ulong),
-                ("time", ctypes.c_ulong),
-                ("dwExtraInfo", PUL)]
+# Press/release INPUT records for every key above, built once and indexed by key id
+key_table = KeyTable(keys)
 
-class HardwareInput(ctypes.Structure):
-    _fields_ = [("uMsg", ctypes.c_ulong),
-                ("wParamL", ctypes.c_short),
-                ("wParamH", ctypes.c_ushort)]
+# Output backend (win32 SendInput by default, see input_backend.py)
+backend = create_backend()
 
-class MouseInput(ctypes.Structure):
-    _fields_ = [("dx", ctypes.c_long),
-                ("dy", ctypes.c_long),
-                ("mouseData", ctypes.c_ulong),
-                ("dwFlags", ctypes.c_ulong),
-                ("time", ctypes.c_ulong),
-                ("dwExtraInfo", PUL)]
+def set_backend(new_backend):
+    """Send all further key events through another backend (e.g. RecordingBackend)"""
+    global backend
+    backend = new_backend
 
-class Input_I(ctypes.Union):
-    _fields_ = [("ki", KeyBdInput),
-                 ("mi", MouseInput),
-                 ("hi", HardwareInput)]
-
-class Input(ctypes.Structure):
-    _fields_ = [("type", ctypes.c_ulong),
-                ("ii", Input_I)]
+def batch():
+    """
+    Start a batch of key events that is sent with a single SendInput
+    
+    Usage:
+        with keyinput.batch() as b:
+            b.release('s')
+            b.press('w')
+            b.press('a')
+    """
+    return InputBatch(backend, key_table)
 
 def press_key(key):
     """Press a keyboard key using both VK and scan code for better game compatibility"""
-    if key not in keys:
-        raise ValueError(f"Key '{key}' not mapped.")
-    
-    key_info = keys[key]
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    
-    # Set flags based on whether it's an extended key
-    flags = KEYEVENTF_SCANCODE
-    if key_info.get("extended", False):
-        flags |= KEYEVENTF_EXTENDEDKEY
-    
-    # Use both vk and scan code for better compatibility across games
-    ii_.ki = KeyBdInput(key_info["vk"], key_info["scan"], flags, 0, ctypes.pointer(extra))
-    x = Input(ctypes.c_ulong(1), ii_)
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
+    backend.send(key_table.press_events[key_table.key_id(key)])
 
 def release_key(key):
     """Release a keyboard key using both VK and scan code for better game compatibility"""
-    if key not in keys:
-        raise ValueError(f"Key '{key}' not mapped.")
-    
-    key_info = keys[key]
-    extra = ctypes.c_ulong(0)
-    ii_ = Input_I()
-    
-    # Set flags based on whether it's an extended key
-    flags = KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP
-    if key_info.get("extended", False):
-        flags |= KEYEVENTF_EXTENDEDKEY
-    
-    # Use both vk and scan code for better compatibility across games
-    ii_.ki = KeyBdInput(key_info["vk"], key_info["scan"], flags, 0, ctypes.pointer(extra))
-    x = Input(ctypes.c_ulong(1), ii_)
-    ctypes.windll.user32.SendInput(1, ctypes.pointer(x), ctypes.sizeof(x))
+    backend.send(key_table.release_events[key_table.key_id(key)])
 
 # Add these additional utility functions for game control
 
@@ -110,14 +73,16 @@ def key_press_and_release(key, duration=0.1):
     release_key(key)
 
 def press_keys_combination(keys_list):
-    """Press multiple keys simultaneously"""
-    for key in keys_list:
-        press_key(key)
+    """Press multiple keys simultaneously (one SendInput for all of them)"""
+    with batch() as b:
+        for key in keys_list:
+            b.press(key)
 
 def release_keys_combination(keys_list):
-    """Release multiple keys that were pressed simultaneously"""
-    for key in keys_list:
-        release_key(key)
+    """Release multiple keys that were pressed simultaneously (one SendInput)"""
+    with batch() as b:
+        for key in keys_list:
+            b.release(key)
 
 def tap_key(key, duration=0.1):
     """Briefly tap a key - useful for actions like changing weapons or entering vehicles"""
@@ -0,0 +1,154 @@
+"""
+Landmark smoothing for AirSync
+Provides a vectorized One Euro filter bank that smooths the full
+(hands, 21, 3) MediaPipe landmark tensor in a single update per frame.
+
+Fingertips move faster and jitter more than the palm, so they get their own
+cutoff/beta parameters. Everything downstream (steering, finger states,
+gesture logic) reads the smoothed tensor instead of keeping its own history.
+"""
+
+import numpy as np
+
+NUM_LANDMARKS = 21
+FINGERTIP_INDICES = (4, 8, 12, 16, 20)
+
+# Default One Euro parameters (cutoffs in Hz)
+TIP_MIN_CUTOFF = 1.5  # Fingertips: allow more motion through
+TIP_BETA = 0.05
+PALM_MIN_CUTOFF = 0.8  # Wrist, knuckles and joints: smooth harder
+PALM_BETA = 0.01
+DERIVATE_CUTOFF = 1.0
+MAX_GAP = 0.5  # Seconds without an update after which history is dropped
+
+# Keyword arguments accepted by LandmarkFilterBank.set_parameters
+FILTER_PARAMETERS = ('tip_min_cutoff', 'tip_beta', 'palm_min_cutoff', 'palm_beta', 'd_cutoff')
+
+
+def landmarks_to_array(landmark_list, out=None):
+    """
+    Convert a MediaPipe landmark list into a (21, 3) float32 array
+
+    Args:
+        landmark_list: Sequence of landmarks with x, y, z attributes
+        out: Optional preallocated (21, 3) array to fill in place
+
+    Returns:
+        landmarks: Array of [x, y, z] rows
+    """
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+    out[:] = [(lm.x, lm.y, lm.z) for lm in landmark_list]
+    return out
+
+
+def _smoothing_factor(dt, cutoff):
+    """Exponential smoothing factor for a given time step and cutoff frequency"""
+    tau = 1.0 / (2.0 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class LandmarkFilterBank:
+    """
+    One Euro filter over every coordinate of every landmark of every hand.
+
+    Each hand occupies a fixed slot (e.g. 0 = left, 1 = right). Slots that are
+    not present in a frame are reset, so a hand re-entering the view starts
+    from its raw position instead of sliding in from where it was lost.
+    """
+
+    def __init__(self, max_hands=2,
+                 tip_min_cutoff=TIP_MIN_CUTOFF, tip_beta=TIP_BETA,
+                 palm_min_cutoff=PALM_MIN_CUTOFF, palm_beta=PALM_BETA,
+                 d_cutoff=DERIVATE_CUTOFF, max_gap=MAX_GAP):
+        self.max_hands = max_hands
+        self.d_cutoff = d_cutoff
+        self.max_gap = max_gap
+
+        # Per-landmark parameters, shaped to broadcast over (hands, 21, 3)
+        self.min_cutoff = np.full((NUM_LANDMARKS, 1), palm_min_cutoff, dtype=np.float32)
+        self.beta = np.full((NUM_LANDMARKS, 1), palm_beta, dtype=np.float32)
+        self.min_cutoff[list(FINGERTIP_INDICES)] = tip_min_cutoff
+        self.beta[list(FINGERTIP_INDICES)] = tip_beta
+
+        # Filter state
+        shape = (max_hands, NUM_LANDMARKS, 3)
+        self.value = np.zeros(shape, dtype=np.float32)
+        self.derivative = np.zeros(shape, dtype=np.float32)
+        self.active = np.zeros(max_hands, dtype=bool)
+        self.last_time = None
+
+    def set_parameters(self, tip_min_cutoff=None, tip_beta=None,
+                       palm_min_cutoff=None, palm_beta=None, d_cutoff=None):
+        """Update filter parameters in place without losing filter state"""
+        tips = list(FINGERTIP_INDICES)
+        palm = np.ones(NUM_LANDMARKS, dtype=bool)
+        palm[tips] = False
+
+        if tip_min_cutoff is not None:
+            self.min_cutoff[tips] = tip_min_cutoff
+        if tip_beta is not None:
+            self.beta[tips] = tip_beta
+        if palm_min_cutoff is not None:
+            self.min_cutoff[palm] = palm_min_cutoff
+        if palm_beta is not None:
+            self.beta[palm] = palm_beta
+        if d_cutoff is not None:
+            self.d_cutoff = d_cutoff
+
+    def reset(self, hand=None):
+        """Forget filter history for one hand slot, or for all of them"""
+        if hand is None:
+            self.active[:] = False
+            self.last_time = None
+        else:
+            self.active[hand] = False
+
+    def update(self, landmarks, timestamp, present=None):
+        """
+        Filter one frame of landmarks
+
+        Args:
+            landmarks: (max_hands, 21, 3) array of raw landmarks
+            timestamp: Frame time in seconds (monotonic clock)
+            present: Optional boolean array marking which slots hold a hand
+
+        Returns:
+            smoothed: (max_hands, 21, 3) array of filtered landmarks. The array
+                is owned by the filter bank and overwritten on the next update.
+        """
+        if present is None:
+            present = np.ones(self.max_hands, dtype=bool)
+        else:
+            present = np.asarray(present, dtype=bool)
+
+        # After a long tracking gap the old state is meaningless
+        if self.last_time is not None and timestamp - self.last_time > self.max_gap:
+            self.active[:] = False
+
+        # Slots that just appeared start from their raw position
+        fresh = present & ~self.active
+        self.value[fresh] = landmarks[fresh]
+        self.derivative[fresh] = 0.0
+
+        tracked = present & self.active
+        if self.last_time is not None and tracked.any():
+            dt = max(timestamp - self.last_time, 1e-6)
+            x = landmarks[tracked]
+            prev = self.value[tracked]
+
+            # Smoothed speed drives the adaptive cutoff
+            a_d = _smoothing_factor(dt, self.d_cutoff)
+            dx = (x - prev) / dt
+            dx_hat = self.derivative[tracked]
+            dx_hat += a_d * (dx - dx_hat)
+
+            cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+            a = _smoothing_factor(dt, cutoff)
+
+            self.value[tracked] = prev + a * (x - prev)
+            self.derivative[tracked] = dx_hat
+
+        self.active = present.copy()
+        self.last_time = timestamp
+        return self.value
@@ -0,0 +1,262 @@
+"""
+Temporal (motion) gesture recognition for AirSync
+Recognizes swipes, flicks and circles from the recent trajectory of the
+wrist and fingertips instead of from a single frame.
+
+A timestamped ring buffer holds the last second or so of tracked points.
+Each frame the recent window is resampled to a fixed length and compared
+against every template with a banded dynamic time warping (DTW) distance.
+The DTW is computed row by row, vectorized across all templates of the same
+duration, and stops early once every template is already worse than its
+threshold. Frames without enough motion skip matching entirely.
+"""
+
+import collections
+
+import numpy as np
+
+TRACKED_LANDMARKS = (0, 4, 8, 12, 16, 20)  # Wrist and fingertips
+
+MotionTemplate = collections.namedtuple('MotionTemplate', ['name', 'duration', 'path', 'threshold'])
+
+
+def normalize_path(path):
+    """Translate a path to start at the origin and scale its largest extent to 1"""
+    path = path - path[0]
+    extent = np.abs(path).max()
+    return path / extent if extent > 0 else path
+
+
+def straightness(path):
+    """Net displacement over travelled distance: 1 for a line, 0 for a closed loop"""
+    length = np.linalg.norm(np.diff(path, axis=0), axis=1).sum()
+    return np.linalg.norm(path[-1] - path[0]) / length if length > 0 else 0.0
+
+
+def _line(dx, dy, samples):
+    # Eased straight stroke: slow start, fast middle, slow stop
+    s = 0.5 - 0.5 * np.cos(np.linspace(0.0, np.pi, samples))
+    return np.stack([s * dx, s * dy], axis=1)
+
+
+def _circle(direction, samples):
+    # Full circle starting at the top, clockwise on screen when direction = 1
+    a = np.linspace(0.0, 2.0 * np.pi, samples)
+    return np.stack([direction * np.sin(a), -np.cos(a)], axis=1)
+
+
+def default_templates(samples=32):
+    """Built-in swipe, flick and circle templates (image coordinates, y down)"""
+    specs = [
+        ('swipe_left', 0.6, _line(-1.0, 0.0, samples), 0.12),
+        ('swipe_right', 0.6, _line(1.0, 0.0, samples), 0.12),
+        ('flick_up', 0.35, _line(0.0, -1.0, samples), 0.12),
+        ('flick_down', 0.35, _line(0.0, 1.0, samples), 0.12),
+        ('circle_cw', 1.0, _circle(1.0, samples), 0.15),
+        ('circle_ccw', 1.0, _circle(-1.0, samples), 0.15),
+    ]
+    return [MotionTemplate(name, duration, normalize_path(path), threshold)
+            for name, duration, path, threshold in specs]
+
+
+class TrajectoryBuffer:
+    """Fixed-size ring buffer of timestamped (points, 2) positions"""
+
+    def __init__(self, capacity=128, points=len(TRACKED_LANDMARKS)):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.positions = np.zeros((capacity, points, 2), dtype=np.float32)
+        self.count = 0
+        self.head = 0  # Next slot to write
+
+    def append(self, timestamp, points):
+        self.times[self.head] = timestamp
+        self.positions[self.head] = points
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def clear(self):
+        self.count = 0
+
+    def window(self, duration, now):
+        """
+        Samples covering the last `duration` seconds, oldest first
+
+        Returns:
+            times, positions: Arrays, or (None, None) if history is too short
+        """
+        if self.count < 2:
+            return None, None
+        order = (self.head - self.count + np.arange(self.count)) % self.capacity
+        times = self.times[order]
+        start = np.searchsorted(times, now - duration, side='right') - 1
+        if start < 0:
+            return None, None
+        return times[start:], self.positions[order[start:]]
+
+
+class MotionGestureRecognizer:
+    """
+    Matches the recent trajectory of one tracked point against templates.
+
+    Args:
+        templates: List of MotionTemplate (defaults to default_templates())
+        samples: Resampled window length
+        band: Sakoe-Chiba band radius in samples
+        track_point: Index into the tracked points (0 = wrist)
+        min_extent: Minimum travel (normalized image units) before matching
+        straightness_tolerance: Maximum straightness difference between the
+            window and a template; keeps arcs of a circle from matching lines
+        cooldown: Seconds after a recognized gesture before the next one
+        max_gap: Tracking gap (seconds) after which the history is dropped
+    """
+
+    def __init__(self, templates=None, samples=32, band=4, track_point=0,
+                 min_extent=0.1, straightness_tolerance=0.15, cooldown=0.6,
+                 max_gap=0.25, capacity=128):
+        self.samples = samples
+        self.band = band
+        self.track_point = track_point
+        self.min_extent = min_extent
+        self.straightness_tolerance = straightness_tolerance
+        self.cooldown = cooldown
+        self.max_gap = max_gap
+        self.last_time = None
+        self.buffer = TrajectoryBuffer(capacity)
+        self.last_event_time = -np.inf
+
+        # Templates grouped by duration so each group shares one window
+        self.groups = []
+        by_duration = collections.defaultdict(list)
+        for template in (templates or default_templates(samples)):
+            by_duration[template.duration].append(template)
+        for duration, group in sorted(by_duration.items()):
+            paths = np.stack([t.path for t in group])
+            thresholds = np.array([t.threshold for t in group])
+            shapes = np.array([straightness(t.path) for t in group])
+            self.groups.append((duration, [t.name for t in group], paths, thresholds, shapes))
+
+        # Additive band mask: 0 inside the Sakoe-Chiba band, inf outside
+        offsets = np.arange(samples)
+        self.band_mask = np.where(np.abs(offsets[:, None] - offsets[None, :]) <= band,
+                                  0.0, np.inf)
+        self.pending = None
+        self.pending_score = np.inf
+
+    def reset(self):
+        """Forget the trajectory history, e.g. after the hand was lost"""
+        self.buffer.clear()
+        self.pending = None
+        self.pending_score = np.inf
+
+    def banded_dtw(self, query, paths, thresholds):
+        """
+        Length-normalized DTW distance from one query path to several templates
+
+        Each row of the accumulated cost matrix is computed in one shot for all
+        templates: the horizontal dependency D[i, j-1] turns into a running
+        minimum over prefix sums, so the only Python loop is over rows.
+
+        Args:
+            query: (samples, 2) normalized query path
+            paths: (templates, samples, 2) normalized template paths
+            thresholds: Per-template acceptance thresholds for early stopping
+
+        Returns:
+            distances: (templates,) array; inf where matching stopped early
+        """
+        n = self.samples
+        count = len(paths)
+        cost = np.linalg.norm(paths[:, :, None, :] - query[None, None, :, :], axis=-1)
+        prefix = np.cumsum(cost, axis=2)
+        shifted = prefix - cost  # Prefix sum up to the previous column
+        limit = thresholds * (2 * n)
+
+        # Row i of the accumulated cost, with column 0 as the DTW border
+        previous = np.full((count, n + 1), np.inf)
+        previous[:, 0] = 0.0
+
+        for i in range(n):
+            # Best of the vertical and diagonal predecessors
+            entry = np.minimum(previous[:, 1:], previous[:, :-1]) + self.band_mask[i]
+            # D[j] = S[j] + min_{k <= j} (entry[k] - S[k - 1]) with S the row prefix sum
+            row = prefix[:, i] + np.minimum.accumulate(entry - shifted[:, i], axis=1)
+            row += self.band_mask[i]
+
+            # Every warping path crosses every row: once the cheapest cell of
+            # this row is over the limit no template can match any more
+            if (row.min(axis=1) > limit).all():
+                return np.full(count, np.inf)
+
+            previous[:, 0] = np.inf
+            previous[:, 1:] = row
+
+        return previous[:, -1] / (2 * n)
+
+    def update(self, timestamp, points):
+        """
+        Add one frame and look for a completed motion gesture
+
+        Args:
+            timestamp: Frame time in seconds
+            points: (len(TRACKED_LANDMARKS), 2) array of tracked point positions
+
+        Returns:
+            name: Recognized gesture name, or None
+        """
+        # Interpolating across a tracking gap would look like a fast stroke
+        if self.last_time is not None and timestamp - self.last_time > self.max_gap:
+            self.reset()
+        self.last_time = timestamp
+
+        self.buffer.append(timestamp, points)
+        if timestamp - self.last_event_time < self.cooldown:
+            return None
+
+        best_name = None
+        best_score = np.inf
+        grid = np.empty(self.samples, dtype=np.float64)
+
+        for duration, names, paths, thresholds, shapes in self.groups:
+            times, positions = self.buffer.window(duration, timestamp)
+            if times is None:
+                continue
+            track = positions[:, self.track_point]
+
+            # Cheap gate: no DTW unless the point actually travelled
+            if np.ptp(track, axis=0).max() < self.min_extent:
+                continue
+
+            grid[:] = np.linspace(timestamp - duration, timestamp, self.samples)
+            resampled = np.stack([np.interp(grid, times, track[:, 0]),
+                                  np.interp(grid, times, track[:, 1])], axis=1)
+
+            # Second cheap gate: only templates of a similar shape class
+            candidates = np.abs(shapes - straightness(resampled)) <= self.straightness_tolerance
+            if not candidates.any():
+                continue
+            distances = np.full(len(names), np.inf)
+            distances[candidates] = self.banded_dtw(
+                normalize_path(resampled), paths[candidates], thresholds[candidates])
+
+            # Score relative to each template's threshold so groups compare fairly
+            scores = distances / thresholds
+            index = int(np.argmin(scores))
+            if scores[index] < 1.0 and scores[index] < best_score:
+                best_name = names[index]
+                best_score = scores[index]
+
+        # Report a match once its score stops improving, so a gesture fires
+        # when it is complete rather than as soon as a partial stroke fits
+        if best_name is not None and best_score <= self.pending_score:
+            self.pending = best_name
+            self.pending_score = best_score
+            return None
+
+        event = self.pending
+        if event is not None:
+            self.last_event_time = timestamp
+            self.buffer.clear()
+            self.pending = None
+            self.pending_score = np.inf
+        return event
@@ -0,0 +1,106 @@
+"""
+Online neutral drift compensation for AirSync
+Over a long session the hands' "straight ahead" pose drifts away from the
+calibrated neutral and steering picks up a constant bias. The estimator
+watches the steering angle relative to the neutral: whenever it has been
+steady and close to straight for a while, the user is evidently driving
+straight, and the neutral is nudged towards the current pose. Corrections
+are slow and limited to a set range around the calibrated neutral, so real
+steering input is never learned away.
+
+All state is a handful of floats updated once per frame.
+"""
+
+import math
+
+from calibration_stats import angle_difference
+
+
+class NeutralDriftEstimator:
+    """
+    Args:
+        neutral_angle: Calibrated neutral wheel angle in degrees
+        max_offset: Largest correction away from the calibrated neutral (degrees)
+        time_constant: Seconds of steady driving for the neutral to close
+            about 63% of the gap to the current pose
+        window: Time constant (seconds) of the running mean/variance that
+            decides whether the wheel is steady
+        steady_std: Largest running standard deviation (degrees) that counts as steady
+        near_neutral: Only poses within this many degrees of the neutral are learned
+    """
+
+    def __init__(self, neutral_angle, max_offset=10.0, time_constant=30.0, window=1.5,
+                 steady_std=1.0, near_neutral=6.0):
+        self.calibrated_angle = neutral_angle
+        self.neutral_angle = neutral_angle
+        self.max_offset = max_offset
+        self.time_constant = time_constant
+        self.window = window
+        self.steady_std = steady_std
+        self.near_neutral = near_neutral
+
+        self._mean = 0.0
+        self._var = 0.0
+        self._last_time = None
+
+        # Metrics
+        self.frames = 0
+        self.adapting_frames = 0
+        self.max_abs_bias = 0.0
+
+    @property
+    def bias(self):
+        """Current correction of the neutral angle in degrees"""
+        return angle_difference(self.neutral_angle, self.calibrated_angle)
+
+    def update(self, wheel_angle, timestamp):
+        """
+        Feed one frame's wheel angle
+
+        Args:
+            wheel_angle: Current wheel angle in degrees
+            timestamp: Frame time in seconds
+
+        Returns:
+            neutral_angle: Neutral angle to steer against this frame
+        """
+        relative = angle_difference(wheel_angle, self.neutral_angle)
+        self.frames += 1
+
+        if self._last_time is None:
+            self._last_time = timestamp
+            self._mean = relative
+            return self.neutral_angle
+        dt = min(max(timestamp - self._last_time, 0.0), 0.5)
+        self._last_time = timestamp
+
+        # Exponentially weighted running mean and variance of the relative angle
+        alpha = 1.0 - math.exp(-dt / self.window)
+        delta = relative - self._mean
+        self._mean += alpha * delta
+        self._var = (1.0 - alpha) * (self._var + alpha * delta * delta)
+
+        if abs(self._mean) < self.near_neutral and self._var < self.steady_std ** 2:
+            self.adapting_frames += 1
+            step = (1.0 - math.exp(-dt / self.time_constant)) * self._mean
+            offset = angle_difference(self.neutral_angle + step, self.calibrated_angle)
+            offset = max(-self.max_offset, min(self.max_offset, offset))
+            previous = self.neutral_angle
+            self.neutral_angle = angle_difference(self.calibrated_angle + offset, 0.0)
+            # The running mean is relative to the neutral, so it moves with it
+            self._mean -= angle_difference(self.neutral_angle, previous)
+            self.max_abs_bias = max(self.max_abs_bias, abs(offset))
+
+        return self.neutral_angle
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary with the current and largest bias (degrees) and
+                the fraction of frames in which the neutral was adjusted
+        """
+        return {
+            'bias_deg': self.bias,
+            'max_abs_bias_deg': self.max_abs_bias,
+            'adapting_ratio': self.adapting_frames / self.frames if self.frames else 0.0,
+        }
@@ -0,0 +1,181 @@
+"""
+Fixed-rate output scheduling for AirSync
+The vision loop publishes the latest target output state whenever it has a
+new frame; a separate output thread applies that state to the device at a
+steady rate (e.g. 250 Hz). The game then sees evenly spaced input updates no
+matter how much the camera or model timing varies.
+
+State is exchanged through a double buffer guarded by a sequence counter
+(a seqlock): the writer never waits and the reader simply retries if the
+writer flipped buffers while it was copying.
+"""
+
+import math
+import threading
+import time
+
+# Busy-wait margin before each deadline. The spin holds the GIL, so at 250 Hz
+# a 0.5 ms spin keeps the vision thread off the interpreter about 12% of the
+# time. 0.1 ms costs about 2% of a core and still lands ticks within a few
+# hundredths of a millisecond on average; 0 sleeps only, which is cheapest
+# but exposes every tick to the OS sleep overshoot.
+DEFAULT_SPIN = 0.0001
+
+
+def wait_until(deadline, spin=DEFAULT_SPIN):
+    """
+    Wait until a perf_counter deadline with sub-millisecond accuracy
+
+    Sleeps until `spin` seconds before the deadline, since OS sleeps can
+    overshoot, then busy-waits the rest (see DEFAULT_SPIN for the trade-off).
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class DoubleBufferedState:
+    """
+    Latest-value exchange between one writer and one reader without locks.
+
+    Values are stored in two preallocated lists. The writer fills the back
+    list, makes it the front one and bumps the sequence counter; the reader
+    copies the front list and retries if the sequence changed meanwhile.
+    """
+
+    def __init__(self, initial):
+        self.slots = [list(initial), list(initial)]
+        self.front = 0
+        self.sequence = 0
+
+    def write(self, values):
+        """Publish a new state (writer thread only)"""
+        back = 1 - self.front
+        self.slots[back][:] = values
+        self.front = back
+        self.sequence += 1
+
+    def read(self, out):
+        """
+        Copy the latest state into out (reader thread only)
+
+        Returns:
+            sequence: Sequence number of the copied state
+        """
+        while True:
+            sequence = self.sequence
+            out[:] = self.slots[self.front]
+            if self.sequence == sequence:
+                return sequence
+
+
+class JitterStats:
+    """Running statistics of tick timing errors (actual minus scheduled time)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.max_late = 0.0
+        self.late_ticks = 0
+        self.skipped_ticks = 0
+
+    def add(self, error, late_threshold):
+        self.count += 1
+        delta = error - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (error - self.mean)
+        self.max_late = max(self.max_late, error)
+        if error > late_threshold:
+            self.late_ticks += 1
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary of tick counts and timing errors in milliseconds
+        """
+        std = math.sqrt(self.m2 / self.count) if self.count > 1 else 0.0
+        return {
+            'ticks': self.count,
+            'mean_error_ms': self.mean * 1000.0,
+            'std_error_ms': std * 1000.0,
+            'max_late_ms': self.max_late * 1000.0,
+            'late_ticks': self.late_ticks,
+            'skipped_ticks': self.skipped_ticks,
+        }
+
+
+class OutputScheduler:
+    """
+    Applies the latest published state on a fixed-rate background thread.
+
+    Args:
+        apply_state: Called on the output thread with the latest state list;
+            it should push the state to the device (e.g. set values on a
+            DiffingGamepadOutput and flush it)
+        initial_state: Sequence of state values used until the first publish
+        rate_hz: Output rate
+        spin: Seconds before each deadline to stop sleeping and spin
+            (more precise ticks for more CPU and GIL time, see DEFAULT_SPIN)
+        late_threshold: Timing error (seconds) above which a tick counts as late
+    """
+
+    def __init__(self, apply_state, initial_state, rate_hz=250, spin=DEFAULT_SPIN, late_threshold=0.001):
+        self.apply_state = apply_state
+        self.buffer = DoubleBufferedState(initial_state)
+        self.period = 1.0 / rate_hz
+        self.rate_hz = rate_hz
+        self.spin = spin
+        self.late_threshold = late_threshold
+        self.jitter = JitterStats()
+        self._current = list(initial_state)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, values):
+        """Hand the vision loop's latest target state to the output thread"""
+        self.buffer.write(values)
+
+    def _run(self):
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            self.buffer.read(self._current)
+            self.apply_state(self._current)
+
+            deadline += self.period
+            now = time.perf_counter()
+            if now - deadline > self.period:
+                # Fell more than a tick behind (e.g. the process was suspended):
+                # skip the missed ticks instead of bursting to catch up
+                missed = int((now - deadline) / self.period)
+                self.jitter.skipped_ticks += missed
+                deadline += missed * self.period
+
+            wait_until(deadline, self.spin)
+            self.jitter.add(time.perf_counter() - deadline, self.late_threshold)
+
+    def start(self):
+        """Start the output thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="OutputScheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the output thread after its current tick"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def report(self):
+        """Print the tick timing statistics"""
+        stats = self.jitter.summary()
+        if stats['ticks'] > 0:
+            print(f"Output thread at {self.rate_hz} Hz: {stats['ticks']} ticks, "
+                  f"timing error {stats['mean_error_ms']:.3f} +/- {stats['std_error_ms']:.3f} ms, "
+                  f"max {stats['max_late_ms']:.3f} ms late, {stats['late_ticks']} late, "
+                  f"{stats['skipped_ticks']} skipped")
@@ -0,0 +1,188 @@
+"""
+State-diffing output layer for AirSync
+Control loops describe the state they want each frame (held keys, stick and
+trigger positions, pressed buttons); the output layer compares it with what
+was last sent and emits only the differences, in one flush per frame.
+
+Every flush counts each piece of state as either emitted (it changed and was
+sent) or suppressed (it matched what the device already has).
+"""
+
+
+class OutputCounters:
+    """Emitted versus suppressed event counts"""
+
+    def __init__(self):
+        self.emitted = 0
+        self.suppressed = 0
+        self.flushes = 0
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary with event counts and the suppressed fraction
+        """
+        total = self.emitted + self.suppressed
+        return {
+            'flushes': self.flushes,
+            'emitted': self.emitted,
+            'suppressed': self.suppressed,
+            'suppressed_ratio': self.suppressed / total if total else 0.0,
+        }
+
+
+class DiffingKeyboardOutput:
+    """
+    Holds the set of keys that should be down and sends only the changes.
+
+    Args:
+        press: Callable that sends a key press
+        release: Callable that sends a key release
+
+    Usage per frame:
+        output.begin_frame()
+        output.hold(key) for every key that should be down
+        output.flush()
+    """
+
+    def __init__(self, press, release):
+        self.press = press
+        self.release = release
+        self.desired = set()
+        self.sent = set()
+        self.counters = OutputCounters()
+
+    def begin_frame(self):
+        """Start describing a new frame; keys not held again will be released"""
+        self.desired.clear()
+
+    def hold(self, key):
+        """Request that a key is down after the next flush"""
+        self.desired.add(key)
+
+    def flush(self):
+        """Send the releases and presses needed to reach the desired state"""
+        releases = self.sent - self.desired
+        presses = self.desired - self.sent
+
+        # Release first so a key moving between bindings is never doubled up
+        for key in releases:
+            self.release(key)
+        for key in presses:
+            self.press(key)
+
+        self.counters.emitted += len(releases) + len(presses)
+        self.counters.suppressed += len(self.sent & self.desired)
+        self.counters.flushes += 1
+        self.sent, self.desired = self.desired, self.sent
+        self.desired.clear()
+
+    def release_all(self):
+        """Release every key this output has pressed"""
+        self.desired.clear()
+        self.flush()
+
+    @property
+    def active_keys(self):
+        """Keys currently held down"""
+        return self.sent
+
+
+# vgamepad sends sticks as signed 16-bit and triggers as 8-bit values, so
+# changes below one step are invisible to the game and are not re-sent
+JOYSTICK_STEPS = 32767
+TRIGGER_STEPS = 255
+
+
+class DiffingGamepadOutput:
+    """
+    Holds the desired virtual gamepad state and sends only the changes.
+
+    Stick and trigger values are compared after quantizing them to the
+    resolution of the virtual device. gamepad.update() is called at most once
+    per flush and only when something changed.
+    """
+
+    def __init__(self, gamepad):
+        self.gamepad = gamepad
+        self.joystick = (0.0, 0.0)
+        self.left_trigger = 0.0
+        self.right_trigger = 0.0
+        self.buttons = set()
+
+        # Last quantized state sent; None forces the first flush to send
+        self.sent_joystick = None
+        self.sent_left_trigger = None
+        self.sent_right_trigger = None
+        self.sent_buttons = set()
+        self.counters = OutputCounters()
+
+    def set_left_joystick(self, x, y=0.0):
+        self.joystick = (x, y)
+
+    def set_triggers(self, left, right):
+        self.left_trigger = left
+        self.right_trigger = right
+
+    def set_button(self, button, pressed):
+        if pressed:
+            self.buttons.add(button)
+        else:
+            self.buttons.discard(button)
+
+    def _changed(self, changed):
+        if changed:
+            self.counters.emitted += 1
+        else:
+            self.counters.suppressed += 1
+        return changed
+
+    def flush(self):
+        """
+        Send every changed control and a single gamepad report
+
+        Returns:
+            sent: True if a report was sent to the device
+        """
+        joystick = (round(self.joystick[0] * JOYSTICK_STEPS), round(self.joystick[1] * JOYSTICK_STEPS))
+        left_trigger = round(self.left_trigger * TRIGGER_STEPS)
+        right_trigger = round(self.right_trigger * TRIGGER_STEPS)
+        dirty = False
+
+        if self._changed(joystick != self.sent_joystick):
+            self.gamepad.left_joystick_float(x_value_float=self.joystick[0], y_value_float=self.joystick[1])
+            self.sent_joystick = joystick
+            dirty = True
+        if self._changed(left_trigger != self.sent_left_trigger):
+            self.gamepad.left_trigger_float(self.left_trigger)
+            self.sent_left_trigger = left_trigger
+            dirty = True
+        if self._changed(right_trigger != self.sent_right_trigger):
+            self.gamepad.right_trigger_float(self.right_trigger)
+            self.sent_right_trigger = right_trigger
+            dirty = True
+
+        releases = self.sent_buttons - self.buttons
+        presses = self.buttons - self.sent_buttons
+        for button in releases:
+            self.gamepad.release_button(button=button)
+        for button in presses:
+            self.gamepad.press_button(button=button)
+        self.counters.emitted += len(releases) + len(presses)
+        self.counters.suppressed += len(self.sent_buttons & self.buttons)
+        if releases or presses:
+            self.sent_buttons = set(self.buttons)
+            dirty = True
+
+        if dirty:
+            self.gamepad.update()
+        self.counters.flushes += 1
+        return dirty
+
+    def reset(self):
+        """Return every control to neutral and send it"""
+        self.joystick = (0.0, 0.0)
+        self.left_trigger = 0.0
+        self.right_trigger = 0.0
+        self.buttons.clear()
+        return self.flush()
@@ -0,0 +1,229 @@
+"""
+Cached overlay rendering for the AirSync preview
+Most of the overlay never changes between frames: the steering bar
+background, its centre line and the instruction text. Those are drawn once
+per frame size into a static layer, and each frame they are composited with
+a single masked copy limited to the layer's bounding box. Only the dynamic
+elements (wheel, steering line, indicator, status text) are drawn per frame.
+
+Run this file for a render micro-benchmark against drawing everything per
+frame:
+    python overlay_renderer.py
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Colours (BGR)
+WHEEL_COLOR = (0, 255, 0)
+NEUTRAL_COLOR = (255, 255, 255)
+STEERING_COLOR = (0, 0, 255)
+BAR_COLOR = (100, 100, 100)
+TEXT_COLOR = (255, 255, 255)
+PREDICTED_COLOR = (0, 165, 255)
+FPS_COLOR = (0, 255, 0)
+BUTTON_A_COLOR = (0, 255, 255)
+
+# Status text colour by the first active action
+STATUS_COLORS = (
+    ('accelerate', (0, 255, 0)),    # Green for accelerating
+    ('brake', (0, 0, 255)),         # Red for braking
+    ('handbrake', (0, 165, 255)),   # Orange for handbrake
+)
+IDLE_COLOR = (200, 200, 200)
+
+BAR_MARGIN = 40
+BAR_HEIGHT = 20
+
+
+class StaticLayer:
+    """Pre-drawn overlay pixels plus the mask and bounding box they cover"""
+
+    def __init__(self, shape, draw):
+        image = np.zeros(shape, dtype=np.uint8)
+        draw(image)
+        covered = image.any(axis=2)
+        rows = np.flatnonzero(covered.any(axis=1))
+        cols = np.flatnonzero(covered.any(axis=0))
+        if len(rows) == 0:
+            self.box = (slice(0, 0), slice(0, 0))
+        else:
+            self.box = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+        self.pixels = np.ascontiguousarray(image[self.box])
+        # Full per-channel mask: np.copyto is several times slower when the
+        # mask has to be broadcast across channels
+        self.mask = np.repeat(covered[self.box][..., None], shape[2], axis=2)
+
+    def composite(self, image):
+        """Copy the layer onto image (one masked copy of the bounding box)"""
+        np.copyto(image[self.box], self.pixels, where=self.mask)
+
+
+class OverlayRenderer:
+    """
+    Draws the steering overlay, reusing static layers between frames.
+
+    Args:
+        draw_hand: Optional callable(image, hand_landmarks) drawing one hand;
+            the caller builds its drawing styles once and closes over them
+    """
+
+    def __init__(self, draw_hand=None):
+        self.draw_hand = draw_hand
+        self._layers = {}
+
+    def _layer(self, shape, with_bar):
+        key = (shape, with_bar)
+        layer = self._layers.get(key)
+        if layer is None:
+            def draw(image):
+                if with_bar:
+                    draw_bar_background(image)
+                draw_instructions(image)
+            layer = self._layers[key] = StaticLayer(shape, draw)
+        return layer
+
+    def render(self, image, features):
+        """
+        Draw the overlay for one frame onto a BGR image in place
+
+        Args:
+            image: BGR frame
+            features: Dictionary with 'hands', 'wheel', 'actions', 'predicted'
+                and 'fps' as filled in by the control loop; 'wheel' is None or
+                (center, radius, wheel_angle, neutral_angle, relative_angle,
+                joystick_value)
+        """
+        if self.draw_hand is not None:
+            for hand_landmarks in features['hands']:
+                self.draw_hand(image, hand_landmarks)
+
+        wheel = features['wheel']
+        self._layer(image.shape, wheel is not None).composite(image)
+        if wheel is not None:
+            draw_wheel(image, wheel)
+            draw_indicator(image, wheel[5])
+            draw_status(image, features['actions'])
+
+        if features['predicted']:
+            cv2.putText(image, "Using predicted hand positions",
+                        (20, 130), FONT, 0.7, PREDICTED_COLOR, 2)
+        cv2.putText(image, f"FPS: {features['fps']:.1f}",
+                    (image.shape[1] - 120, 30), FONT, 0.7, FPS_COLOR, 2)
+
+
+def bar_geometry(image):
+    """Steering bar rectangle (x, y, width, height) for an image"""
+    h, w = image.shape[:2]
+    return BAR_MARGIN, h - BAR_MARGIN, w - 2 * BAR_MARGIN, BAR_HEIGHT
+
+
+# Static elements ---------------------------------------------------------
+
+def draw_bar_background(image):
+    """Steering bar background and centre line"""
+    bar_x, bar_y, bar_width, bar_height = bar_geometry(image)
+    cv2.rectangle(image, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height),
+                  BAR_COLOR, cv2.FILLED)
+    center_x = bar_x + bar_width // 2
+    cv2.line(image, (center_x, bar_y), (center_x, bar_y + bar_height), NEUTRAL_COLOR, 1)
+
+
+def draw_instructions(image):
+    """Exit hint at the bottom of the window"""
+    cv2.putText(image, "Press ESC to exit",
+                (20, image.shape[0] - 20), FONT, 0.7, TEXT_COLOR, 2)
+
+
+# Dynamic elements --------------------------------------------------------
+
+def draw_wheel(image, wheel):
+    """Wheel circle, neutral and current steering lines, and the angle readout"""
+    wheel_center, wheel_radius, steering_angle, neutral_angle, relative_angle, joystick_value = wheel
+    h, w = image.shape[:2]
+
+    # Convert normalized coordinates to pixel coordinates
+    center_x = int(wheel_center[0] * w)
+    center_y = int(wheel_center[1] * h)
+    radius = int(wheel_radius * w)
+    cv2.circle(image, (center_x, center_y), radius, WHEEL_COLOR, 2)
+
+    neutral_rad = np.radians(neutral_angle)
+    neutral_end = (center_x + int(radius * np.cos(neutral_rad)),
+                   center_y + int(radius * np.sin(neutral_rad)))
+    cv2.line(image, (center_x, center_y), neutral_end, NEUTRAL_COLOR, 1, cv2.LINE_AA)
+
+    angle_rad = np.radians(steering_angle)
+    end = (center_x + int(radius * np.cos(angle_rad)),
+           center_y + int(radius * np.sin(angle_rad)))
+    cv2.line(image, (center_x, center_y), end, STEERING_COLOR, 3, cv2.LINE_AA)
+
+    cv2.putText(image, f"Angle: {relative_angle:.1f}° (Joy: {joystick_value:.2f})",
+                (20, 50), FONT, 0.7, TEXT_COLOR, 2)
+
+
+def draw_indicator(image, joystick_value):
+    """Steering position marker on the bar"""
+    bar_x, bar_y, bar_width, bar_height = bar_geometry(image)
+    indicator_pos = int(bar_x + (bar_width / 2) + (joystick_value * bar_width / 2))
+    cv2.rectangle(image, (indicator_pos - 5, bar_y - 5),
+                  (indicator_pos + 5, bar_y + bar_height + 5),
+                  STEERING_COLOR, cv2.FILLED)
+
+
+def draw_status(image, actions):
+    """Action status text and the A button indicator"""
+    color = IDLE_COLOR
+    for action, action_color in STATUS_COLORS:
+        if actions[action]:
+            color = action_color
+            break
+    cv2.putText(image, actions['status_text'], (20, 90), FONT, 0.9, color, 2)
+
+    if actions['button_a']:
+        w = image.shape[1]
+        cv2.circle(image, (w - 50, 90), 20, BUTTON_A_COLOR, cv2.FILLED)
+        cv2.putText(image, "A", (w - 55, 95), FONT, 0.7, (0, 0, 0), 2)
+
+
+# Benchmark ---------------------------------------------------------------
+
+def draw_everything(image, features):
+    """Reference renderer: draws static and dynamic elements every frame"""
+    wheel = features['wheel']
+    draw_wheel(image, wheel)
+    draw_bar_background(image)
+    draw_indicator(image, wheel[5])
+    draw_status(image, features['actions'])
+    cv2.putText(image, f"FPS: {features['fps']:.1f}",
+                (image.shape[1] - 120, 30), FONT, 0.7, FPS_COLOR, 2)
+    draw_instructions(image)
+
+
+def benchmark(frames=2000, shape=(480, 640, 3)):
+    """Compare per-frame drawing with cached static layers on a synthetic frame"""
+    actions = {'accelerate': True, 'brake': False, 'handbrake': False,
+               'button_a': True, 'status_text': "Accelerating"}
+    features = {'hands': (), 'actions': actions, 'predicted': False, 'fps': 30.0,
+                'wheel': ((0.5, 0.5), 0.2, 10.0, 0.0, 10.0, 0.11)}
+    frame = np.random.default_rng(0).integers(0, 255, shape, dtype=np.uint8)
+    renderer = OverlayRenderer()
+
+    print(f"{frames} frames at {shape[1]}x{shape[0]}")
+    for label, render in (("draw everything", draw_everything),
+                          ("cached layers", renderer.render)):
+        image = frame.copy()
+        render(image, features)  # Builds the cached layer outside the timing
+        start = time.perf_counter()
+        for _ in range(frames):
+            render(image, features)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<16} {elapsed / frames * 1e6:8.1f} us per frame")
+
+
+if __name__ == '__main__':
+    benchmark()
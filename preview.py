@@ -0,0 +1,127 @@
+"""
+Preview rendering for AirSync
+Drawing the overlay and pumping the OpenCV window costs several milliseconds
+per frame, which is latency the control loop does not need to pay. The
+control loop submits the latest frame plus the features needed to draw it;
+a background thread renders and shows only the most recent submission at a
+lower rate (e.g. 15 Hz) and drops the rest.
+
+Render cost (drawing plus display) is measured in both the inline and the
+threaded mode, so the two can be compared from the exit report.
+"""
+
+import threading
+import time
+
+
+class RenderStats:
+    """Count, mean and worst render time per displayed frame"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary with the frame count and render times in milliseconds
+        """
+        return {
+            'frames': self.count,
+            'mean_ms': self.total / self.count * 1000.0 if self.count else 0.0,
+            'max_ms': self.max * 1000.0,
+        }
+
+
+class PreviewThread:
+    """
+    Renders the latest submitted frame on a background thread.
+
+    Args:
+        render: Called as render(image, features); returns the image to show
+            (e.g. a converted copy with the overlay drawn on it)
+        show: Called as show(rendered) to display the rendered image; returns
+            True when the user asked to quit (e.g. pressed ESC)
+        fps: Preview frame rate; submissions in between are dropped
+    """
+
+    def __init__(self, render, show, fps=15):
+        self.render = render
+        self.show = show
+        self.period = 1.0 / fps
+        self.fps = fps
+        self.stats = RenderStats()
+        self.submitted = 0
+        self.quit_requested = False
+        self._latest = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, image, features):
+        """
+        Hand the latest frame to the preview thread (control loop side)
+
+        The image is not copied: the caller must not modify it afterwards.
+        Each camera read returns a new array, so this holds for the main loop.
+        """
+        with self._lock:
+            self._latest = (image, features)
+            self.submitted += 1
+
+    def _run(self):
+        next_frame = time.perf_counter()
+        while not self._stop.is_set():
+            with self._lock:
+                snapshot = self._latest
+                self._latest = None
+
+            if snapshot is not None:
+                start = time.perf_counter()
+                image, features = snapshot
+                rendered = self.render(image, features)
+                if self.show(rendered):
+                    self.quit_requested = True
+                self.stats.add(time.perf_counter() - start)
+
+            next_frame += self.period
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.perf_counter()
+
+    def start(self):
+        """Start the preview thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="PreviewThread", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the preview thread after its current frame"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def report(self):
+        """Print render cost and how many frames were decimated"""
+        report_render_stats(self.stats, f"Preview thread at {self.fps} Hz",
+                            f", {self.submitted - self.stats.count} of {self.submitted} frames skipped")
+
+
+def report_render_stats(stats, label, extra=""):
+    """Print a RenderStats summary"""
+    summary = stats.summary()
+    if summary['frames'] > 0:
+        print(f"{label}: {summary['frames']} frames rendered, "
+              f"{summary['mean_ms']:.2f} ms mean, {summary['max_ms']:.2f} ms max render cost{extra}")
@@ -0,0 +1,210 @@
+"""
+Duty-cycle (PWM) keyboard steering for AirSync
+Keyboard-only games only understand "left key down" or "right key down".
+Instead of pressing A/D fully once the wheel passes a threshold, this module
+pulses the key at a fixed carrier frequency with an on-time proportional to
+the steering value, so the game's steering follows the hand smoothly.
+
+The pulses are generated on a dedicated thread using perf_counter deadlines.
+The vision loop only calls set_steering() with the latest value.
+
+Run this file to check pulse timing against the recording input backend:
+    python pwm_steering.py
+"""
+
+import threading
+import time
+
+from output_scheduler import DEFAULT_SPIN, JitterStats, wait_until
+
+
+class PwmSteering:
+    """
+    Pulse-width modulated left/right steering keys.
+
+    Args:
+        press: Callable pressing a key name
+        release: Callable releasing a key name
+        left_key, right_key: Keys for steering left and right
+        frequency: Carrier frequency in Hz (one press/release cycle per period)
+        deadband: Steering magnitude below which no key is pressed
+        min_pulse: Shortest press/gap in seconds; shorter ones may fall
+            between two game frames, so near the ends of the range duty
+            cycles round up: short presses are lengthened to min_pulse and
+            short gaps are closed into a continuous hold (see on_time)
+        spin: Busy-wait margin before each edge, see output_scheduler.wait_until
+    """
+
+    def __init__(self, press, release, left_key='a', right_key='d', frequency=10.0,
+                 deadband=0.05, min_pulse=0.02, spin=DEFAULT_SPIN):
+        self.press = press
+        self.release = release
+        self.left_key = left_key
+        self.right_key = right_key
+        self.period = 1.0 / frequency
+        self.frequency = frequency
+        self.deadband = deadband
+        self.min_pulse = min_pulse
+        self.spin = spin
+
+        self.steering = 0.0  # Latest target in [-1, 1]; written by the vision loop
+        self.held = None  # Key currently down
+        self.edge_jitter = JitterStats()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def set_steering(self, value):
+        """Set the steering target: -1 full left, 0 straight, 1 full right"""
+        self.steering = max(-1.0, min(1.0, value))
+
+    def on_time(self, value):
+        """
+        Key press duration per carrier period for a steering value
+
+        Outside the deadband, small errors always round towards more
+        steering: a press shorter than min_pulse is raised to min_pulse, and
+        a gap shorter than min_pulse is closed so the key is held the whole
+        period. Only values inside the deadband produce no press.
+
+        Returns:
+            key: Key to pulse, or None
+            on_time: Seconds the key is held each period (period = hold continuously)
+        """
+        duty = abs(value)
+        if duty < self.deadband:
+            return None, 0.0
+        key = self.left_key if value < 0 else self.right_key
+        on_time = duty * self.period
+        if on_time < self.min_pulse:
+            on_time = self.min_pulse
+        if on_time > self.period - self.min_pulse:
+            on_time = self.period
+        return key, on_time
+
+    def _set_key(self, key):
+        # Release before pressing so left and right are never down together
+        if self.held is not None and self.held != key:
+            self.release(self.held)
+            self.held = None
+        if key is not None and self.held is None:
+            self.press(key)
+            self.held = key
+
+    def _edge(self, deadline, key):
+        wait_until(deadline, self.spin)
+        self._set_key(key)
+        self.edge_jitter.add(time.perf_counter() - deadline, 0.001)
+
+    def _run(self):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            key, on_time = self.on_time(self.steering)
+
+            if key is None:
+                self._edge(start, None)
+            elif on_time >= self.period:
+                self._edge(start, key)
+            else:
+                self._edge(start, key)
+                self._edge(start + on_time, None)
+
+            start += self.period
+            if time.perf_counter() - start > self.period:
+                # Fell behind (e.g. suspended); restart the carrier from now
+                start = time.perf_counter()
+            wait_until(start, self.spin)
+
+        self._set_key(None)
+
+    def start(self):
+        """Start the PWM thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="PwmSteering", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the PWM thread and release the steering keys"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._set_key(None)
+
+    def report(self):
+        """Print how accurately press/release edges hit their deadlines"""
+        stats = self.edge_jitter.summary()
+        if stats['ticks'] > 0:
+            print(f"PWM steering at {self.frequency:.0f} Hz: {stats['ticks']} edges, "
+                  f"timing error {stats['mean_error_ms']:.3f} +/- {stats['std_error_ms']:.3f} ms, "
+                  f"max {stats['max_late_ms']:.3f} ms late")
+
+
+def measure_duty_cycles(backend, key):
+    """
+    Measured on-time fractions of each complete press/release cycle
+
+    Args:
+        backend: RecordingBackend that received the PWM key events
+        key: Key name to measure
+
+    Returns:
+        cycles: List of (period, duty) tuples from consecutive presses
+    """
+    from input_backend import KEYEVENTF_KEYUP
+
+    presses = []
+    releases = []
+    for sent_at, batch in zip(backend.times, backend.batches):
+        for event in batch:
+            if event.name == key:
+                (releases if event.flags & KEYEVENTF_KEYUP else presses).append(sent_at)
+
+    cycles = []
+    for i in range(len(presses) - 1):
+        period = presses[i + 1] - presses[i]
+        held = [r for r in releases if presses[i] < r <= presses[i + 1]]
+        if held:
+            cycles.append((period, (held[0] - presses[i]) / period))
+    return cycles
+
+
+def verify_timing(frequency=10.0, seconds=2.0, values=(0.25, 0.5, 0.75)):
+    """Run the PWM thread against the recording backend and print measured duty cycles"""
+    from input_backend import InputBatch, RecordingBackend
+
+    backend = RecordingBackend()
+    key_table = {'a': {"vk": 0x41, "scan": 0x1E}, 'd': {"vk": 0x44, "scan": 0x20}}
+
+    def press(key):
+        with InputBatch(backend, key_table) as batch:
+            batch.press(key)
+
+    def release(key):
+        with InputBatch(backend, key_table) as batch:
+            batch.release(key)
+
+    pwm = PwmSteering(press, release, frequency=frequency)
+    for value in values:
+        backend.clear()
+        pwm.edge_jitter = JitterStats()
+        pwm.set_steering(value)
+        pwm.start()
+        time.sleep(seconds)
+        pwm.stop()
+
+        cycles = measure_duty_cycles(backend, pwm.right_key)
+        if not cycles:
+            print(f"steering {value:.2f}: no complete cycles recorded")
+            continue
+        duties = [duty for _, duty in cycles]
+        periods = [period for period, _ in cycles]
+        error = max(abs(duty - value) for duty in duties)
+        print(f"steering {value:.2f}: {len(cycles)} cycles, mean duty {sum(duties) / len(duties):.3f} "
+              f"(max error {error:.3f}), mean period {sum(periods) / len(periods) * 1000:.2f} ms")
+        pwm.report()
+
+
+if __name__ == '__main__':
+    verify_timing()
@@ -0,0 +1,192 @@
+"""
+Out-of-process preview for AirSync
+The engine publishes preview frames into a shared-memory double buffer and a
+separate viewer process maps the same memory and shows frames at its own
+pace. A dragged, minimized or frozen preview window then lives in another
+process and can never stall the control loop; publishing costs one memcpy.
+
+Shared memory layout:
+    header  5 x int64: sequence, front slot, height, width, channels
+    slot 0  height x width x channels uint8
+    slot 1  height x width x channels uint8
+
+The writer fills the back slot, makes it the front one and bumps the
+sequence; a reader copies the front slot and retries if the sequence changed
+meanwhile (the same seqlock scheme as output_scheduler.DoubleBufferedState).
+
+Run the viewer with:
+    python shared_preview.py [name]
+"""
+
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DEFAULT_NAME = 'airsync_preview'
+HEADER_FIELDS = 5  # sequence, front, height, width, channels
+HEADER_BYTES = HEADER_FIELDS * 8
+
+
+def _open_shared_memory(name):
+    # An attaching process must not register the segment with its resource
+    # tracker, which would unlink the engine's segment when that process exits
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SharedFrameBuffer:
+    """
+    Double-buffered frames in named shared memory.
+
+    Use SharedFrameBuffer.create() in the engine and SharedFrameBuffer.attach()
+    in the viewer.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self.shape = tuple(int(v) for v in self.header[2:5])
+        size = int(np.prod(self.shape))
+        self.slots = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=shm.buf, offset=HEADER_BYTES + i * size)
+            for i in range(2)
+        ]
+
+    @classmethod
+    def create(cls, shape, name=DEFAULT_NAME):
+        """Create the buffer for frames of the given (height, width, channels) shape"""
+        size = HEADER_BYTES + 2 * int(np.prod(shape))
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from an engine that did not exit cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (0, 0) + tuple(shape)
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        """Map an existing buffer (FileNotFoundError if the engine has not created it yet)"""
+        return cls(_open_shared_memory(name), owner=False)
+
+    @property
+    def sequence(self):
+        return int(self.header[0])
+
+    def publish(self, frame):
+        """
+        Copy a frame into the back slot and make it current (writer only)
+
+        Returns:
+            quit: Always False, so this can be used as a PreviewThread show()
+        """
+        back = 1 - int(self.header[1])
+        np.copyto(self.slots[back], frame)
+        self.header[1] = back
+        self.header[0] += 1
+        return False
+
+    def read(self, out):
+        """
+        Copy the latest frame into out (reader only)
+
+        Returns:
+            sequence: Sequence number of the copied frame (0 = nothing published yet)
+        """
+        while True:
+            sequence = int(self.header[0])
+            np.copyto(out, self.slots[int(self.header[1])])
+            if int(self.header[0]) == sequence:
+                return sequence
+
+    def close(self):
+        """Unmap the buffer; the creating process also removes it"""
+        self.header = None
+        self.slots = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedPreviewPublisher:
+    """
+    Engine side: creates the buffer on the first frame (when the frame size
+    is known) and optionally starts the viewer process.
+
+    Args:
+        name: Shared memory name
+        launch_viewer: Start `python shared_preview.py name` on the first frame
+    """
+
+    def __init__(self, name=DEFAULT_NAME, launch_viewer=True):
+        self.name = name
+        self.launch_viewer = launch_viewer
+        self.buffer = None
+        self.viewer = None
+
+    def publish(self, frame):
+        """
+        Publish a frame (PreviewThread show() compatible; never requests quit)
+
+        Args:
+            frame: The image returned by the preview's render() - the BGR copy
+                with the overlay drawn on it, exactly what the viewer displays
+        """
+        if self.buffer is None:
+            self.buffer = SharedFrameBuffer.create(frame.shape, self.name)
+            if self.launch_viewer:
+                self.viewer = subprocess.Popen([sys.executable, __file__, self.name])
+        return self.buffer.publish(frame)
+
+    def close(self):
+        """Stop the viewer and remove the buffer"""
+        if self.viewer is not None and self.viewer.poll() is None:
+            self.viewer.terminate()
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+
+def view(name=DEFAULT_NAME, poll_ms=10):
+    """Show frames from the engine's buffer until ESC (the engine terminates the viewer on exit)"""
+    import cv2
+
+    buffer = None
+    while buffer is None:
+        try:
+            buffer = SharedFrameBuffer.attach(name)
+        except FileNotFoundError:
+            time.sleep(0.1)
+
+    frame = np.empty(buffer.shape, dtype=np.uint8)
+    shown = 0
+    try:
+        while True:
+            if buffer.sequence != shown:
+                shown = buffer.read(frame)
+                cv2.imshow('AirSync Preview', frame)
+            if cv2.waitKey(poll_ms) & 0xFF == 27:
+                break
+    finally:
+        buffer.close()
+        cv2.destroyAllWindows()
+
+
+if __name__ == '__main__':
+    view(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_NAME)
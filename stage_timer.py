@@ -0,0 +1,203 @@
+"""
+Per-stage latency instrumentation for AirSync
+Each controller loop marks the end of its stages (capture, inference,
+features, output, render) with perf_counter_ns(); the time since the previous
+mark goes into a fixed-bucket histogram for that stage, plus one for the
+whole frame. Reports show p50/p95/p99/max per stage, so a report of lag can
+be traced to the stage that causes it.
+
+Histograms use HDR-style log-linear buckets: 32 linear sub-buckets per power
+of two, so every recorded value is kept to within about 3% no matter whether
+it is 2 us or 2 s, in a fixed array of about a thousand counters. Recording
+is a bit_length, a shift and a list increment.
+
+Run this file to measure the cost of a mark:
+    python stage_timer.py
+"""
+
+import time
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS  # Linear sub-buckets per power of two
+MAX_VALUE_NS = 60 * 10**9  # Longer spans are counted as this value
+
+# Stages of a controller loop, in report order
+CAPTURE = 'capture'
+INFERENCE = 'inference'
+FEATURES = 'features'
+OUTPUT = 'output'
+RENDER = 'render'
+FRAME = 'frame'
+DEFAULT_STAGES = (CAPTURE, INFERENCE, FEATURES, OUTPUT, RENDER)
+
+
+def bucket_index(value):
+    """Histogram bucket of a non-negative integer value"""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_upper_bound(index):
+    """Largest value that falls into a bucket"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    sub = index % SUB_BUCKETS + SUB_BUCKETS
+    return ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in nanoseconds"""
+
+    def __init__(self, max_value=MAX_VALUE_NS):
+        self.max_value = max_value
+        self.counts = [0] * (bucket_index(max_value) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        if value > self.max_value:
+            value = self.max_value
+        elif value < 0:
+            value = 0
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            value: Upper bound of the bucket holding the q-th percentile (ns),
+                never more than the recorded maximum
+        """
+        if self.count == 0:
+            return 0
+        rank = max(1, -(-self.count * q // 100))  # ceil without floats
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary with the sample count and mean/p50/p95/p99/max in milliseconds
+        """
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count / 1e6 if self.count else 0.0,
+            'p50_ms': self.percentile(50) / 1e6,
+            'p95_ms': self.percentile(95) / 1e6,
+            'p99_ms': self.percentile(99) / 1e6,
+            'max_ms': self.max / 1e6,
+        }
+
+
+class StageTimer:
+    """
+    Lap timer for a frame loop.
+
+    Call begin() at the top of the loop and mark(stage) after each stage;
+    each mark records the time since the previous one. end() records the
+    whole frame. Stages that are skipped in a frame are simply not recorded.
+
+    Args:
+        stages: Stage names in report order; other names are added on first use
+    """
+
+    def __init__(self, stages=DEFAULT_STAGES):
+        self.stages = list(stages)
+        self.histograms = {stage: LatencyHistogram() for stage in self.stages}
+        self.frame = LatencyHistogram()
+        self.last = {}  # Stage name -> latest lap in nanoseconds
+        self._frame_start = 0
+        self._last = 0
+
+    def begin(self):
+        self._frame_start = self._last = time.perf_counter_ns()
+
+    def mark(self, stage):
+        """Record the time since the previous mark (or begin) as `stage`"""
+        now = time.perf_counter_ns()
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            self.stages.append(stage)
+            histogram = self.histograms[stage] = LatencyHistogram()
+        lap = now - self._last
+        histogram.record(lap)
+        self.last[stage] = lap
+        self._last = now
+
+    def skip(self):
+        """Restart the lap without recording (e.g. after waiting on a key press)"""
+        self._last = time.perf_counter_ns()
+
+    def end(self):
+        """Record the time since begin() as one frame"""
+        lap = time.perf_counter_ns() - self._frame_start
+        self.frame.record(lap)
+        self.last[FRAME] = lap
+
+    def last_ms(self):
+        """Latest lap of every stage in milliseconds (rounded for compact telemetry)"""
+        return {stage: round(lap / 1e6, 2) for stage, lap in self.last.items()}
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.frame.reset()
+
+    def summary(self):
+        """
+        Returns:
+            stats: Dictionary of stage name (plus 'frame') -> histogram summary
+        """
+        stats = {stage: self.histograms[stage].summary() for stage in self.stages}
+        stats[FRAME] = self.frame.summary()
+        return stats
+
+    def report(self, label="Stage timing"):
+        """Print a latency table of all recorded stages"""
+        stats = self.summary()
+        frame_mean = stats[FRAME]['mean_ms']
+        print(f"{label} ({stats[FRAME]['count']} frames, ms):")
+        print(f"  {'stage':<10} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'share':>6}")
+        for stage, s in stats.items():
+            if s['count'] == 0:
+                continue
+            share = s['mean_ms'] * s['count'] / (frame_mean * stats[FRAME]['count']) if frame_mean else 0.0
+            print(f"  {stage:<10} {s['count']:>7} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} "
+                  f"{s['p99_ms']:>8.2f} {s['max_ms']:>8.2f} {share:>6.0%}")
+
+
+def benchmark(frames=200000):
+    """Measure the cost of one mark() and compare it to a 30 FPS frame"""
+    timer = StageTimer()
+    start = time.perf_counter_ns()
+    for _ in range(frames):
+        timer.mark(CAPTURE)
+    per_mark = (time.perf_counter_ns() - start) / frames
+    per_frame = per_mark * (len(DEFAULT_STAGES) + 2)  # marks plus begin() and end()
+    print(f"mark(): {per_mark:.0f} ns")
+    print(f"Per frame with {len(DEFAULT_STAGES)} stages: {per_frame / 1000:.2f} us "
+          f"({per_frame / (1e9 / 30):.4%} of a 30 FPS frame)")
+
+
+if __name__ == '__main__':
+    benchmark()
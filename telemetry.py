@@ -0,0 +1,268 @@
+"""
+Structured telemetry for AirSync
+Human-readable messages go to stdout; machine-readable telemetry goes to a
+separate channel as compact JSON lines, one object per line:
+
+    {"t":12.034,"type":"frame","fps":29.8,"tracking":"both","steer":0.12,...}
+    {"t":0.512,"type":"event","name":"calibration","source":"saved",...}
+
+"t" is seconds since the engine started. Frame records are rate limited
+(TELEMETRY_RATE_HZ in the engine) and carry the latest values; events are
+sent as they happen.
+
+The channel is chosen with the AIRSYNC_TELEMETRY environment variable, so a
+host process can enable it when it launches the engine:
+
+    udp://127.0.0.1:9777    datagrams to a local listener (never blocks)
+    file:telemetry.jsonl    appended to a file (a plain path works too)
+    unset or empty          telemetry off
+
+Reference consumer, printing records as they arrive:
+    python telemetry.py udp://127.0.0.1:9777
+    python telemetry.py telemetry.jsonl
+"""
+
+import argparse
+import json
+import os
+import socket
+import time
+
+from async_log import log
+
+ENV_VAR = 'AIRSYNC_TELEMETRY'
+DEFAULT_TARGET = 'udp://127.0.0.1:9777'
+DEFAULT_RATE_HZ = 10
+
+
+def _to_json(value):
+    # NumPy scalars and arrays (tolist()/item() turn them into plain Python values)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def parse_target(target):
+    """
+    Args:
+        target: 'udp://host:port', 'file:path' or a plain path
+
+    Returns:
+        kind: 'udp' or 'file'
+        address: (host, port) for UDP, the path for files
+    """
+    if target.startswith('udp://'):
+        host, _, port = target[len('udp://'):].rpartition(':')
+        return 'udp', (host or '127.0.0.1', int(port))
+    if target.startswith('file:'):
+        return 'file', target[len('file:'):]
+    return 'file', target
+
+
+class UdpSink:
+    """Sends each line as one datagram; a missing listener costs nothing"""
+
+    def __init__(self, address):
+        self.address = address
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def write(self, line):
+        self.socket.sendto(line.encode('utf-8'), self.address)
+
+    def close(self):
+        self.socket.close()
+
+
+class FileSink:
+    """Appends lines to a file, flushed per line so readers see them immediately"""
+
+    def __init__(self, path):
+        self.file = open(path, 'a', buffering=1, encoding='utf-8')
+
+    def write(self, line):
+        self.file.write(line + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class NullTelemetry:
+    """Telemetry switched off: every call is a no-op and due() is never True"""
+
+    enabled = False
+
+    def __init__(self):
+        self.sent = 0
+        self.errors = 0
+
+    def due(self):
+        return False
+
+    def frame(self, **fields):
+        pass
+
+    def event(self, name, **fields):
+        pass
+
+    def close(self):
+        pass
+
+
+class Telemetry(NullTelemetry):
+    """
+    JSON-lines telemetry on a sink
+
+    Check due() before building a frame record, so skipped frames cost
+    nothing but the check:
+
+        if telemetry.due():
+            telemetry.frame(fps=..., steer=...)
+
+    Args:
+        sink: UdpSink or FileSink
+        rate_hz: Maximum frame records per second
+    """
+
+    enabled = True
+
+    def __init__(self, sink, rate_hz=DEFAULT_RATE_HZ):
+        super().__init__()
+        self.sink = sink
+        self.period = 1.0 / rate_hz
+        self.start = time.perf_counter()
+        self._next_frame = self.start
+
+    def due(self):
+        """True if a frame record may be sent now"""
+        now = time.perf_counter()
+        if now < self._next_frame:
+            return False
+        self._next_frame = max(self._next_frame + self.period, now)
+        return True
+
+    def frame(self, **fields):
+        """Send a frame record (call only when due() returned True)"""
+        self._send('frame', fields)
+
+    def event(self, name, **fields):
+        """Send an event record immediately"""
+        fields['name'] = name
+        self._send('event', fields)
+
+    def _send(self, kind, fields):
+        record = {'t': round(time.perf_counter() - self.start, 3), 'type': kind}
+        record.update(fields)
+        try:
+            self.sink.write(json.dumps(record, separators=(',', ':'), default=_to_json))
+            self.sent += 1
+        except (OSError, TypeError, ValueError) as e:
+            # Telemetry must never disturb the control loop; failures are logged rate limited
+            log("Telemetry error: %s", e, key='telemetry_error')
+            self.errors += 1
+
+    def close(self):
+        self.sink.close()
+        if self.errors:
+            print(f"Telemetry: {self.sent} records sent, {self.errors} failed")
+
+
+def open_telemetry(target=None, rate_hz=DEFAULT_RATE_HZ):
+    """
+    Open the telemetry channel
+
+    Args:
+        target: Channel as described in the module docstring; defaults to
+            the AIRSYNC_TELEMETRY environment variable
+        rate_hz: Maximum frame records per second
+
+    Returns:
+        telemetry: Telemetry, or NullTelemetry if disabled or the target is invalid
+    """
+    if target is None:
+        target = os.environ.get(ENV_VAR, '')
+    if not target:
+        return NullTelemetry()
+    try:
+        kind, address = parse_target(target)
+        sink = UdpSink(address) if kind == 'udp' else FileSink(address)
+    except (OSError, ValueError) as e:
+        print(f"Telemetry disabled, cannot open {target}: {e}")
+        return NullTelemetry()
+    print(f"Telemetry: {target} at up to {rate_hz} Hz")
+    return Telemetry(sink, rate_hz)
+
+
+# Reference consumer ------------------------------------------------------
+
+def read_udp(address):
+    """Yield lines received on a UDP address"""
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(address)
+    try:
+        while True:
+            data, _ = receiver.recvfrom(65536)
+            yield data.decode('utf-8')
+    finally:
+        receiver.close()
+
+
+def read_file(path, follow=True):
+    """Yield lines of a file, waiting for new ones at the end if follow is set"""
+    with open(path, encoding='utf-8') as f:
+        while True:
+            line = f.readline()
+            if line:
+                yield line.rstrip('\n')
+            elif follow:
+                time.sleep(0.1)
+            else:
+                return
+
+
+def consume(lines):
+    """
+    Parse and print telemetry records
+
+    Returns:
+        counts: Dictionary of record type -> number of records (plus 'invalid')
+    """
+    counts = {'invalid': 0}
+    for line in lines:
+        try:
+            record = json.loads(line)
+            kind = record.pop('type')
+            t = record.pop('t')
+        except (ValueError, KeyError, TypeError, AttributeError):
+            counts['invalid'] += 1
+            print(f"invalid: {line[:80]}")
+            continue
+        counts[kind] = counts.get(kind, 0) + 1
+        if kind == 'event':
+            name = record.pop('name', '?')
+            print(f"{t:9.3f}  event {name}: {json.dumps(record, separators=(',', ':'))}")
+        else:
+            fields = ' '.join(f"{key}={value}" for key, value in record.items())
+            print(f"{t:9.3f}  {kind:<5} {fields}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print AirSync telemetry records")
+    parser.add_argument('target', nargs='?', default=DEFAULT_TARGET,
+                        help="udp://host:port to listen on, or a file to read")
+    parser.add_argument('--no-follow', action='store_true',
+                        help="Stop at the end of a file instead of waiting for more records")
+    args = parser.parse_args()
+
+    kind, address = parse_target(args.target)
+    lines = read_udp(address) if kind == 'udp' else read_file(address, follow=not args.no_follow)
+    try:
+        counts = consume(lines)
+    except KeyboardInterrupt:
+        return
+    print(f"Records: {counts}")
+
+
+if __name__ == '__main__':
+    main()
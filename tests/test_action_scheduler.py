@@ -0,0 +1,160 @@
+"""
+Deterministic tests for action_scheduler.ActionScheduler
+A fake clock is injected and run_due() is called by hand, so no test waits
+on the background thread or on real time.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from action_scheduler import ActionScheduler
+
+
+class FakeClock:
+    """Clock that only moves when step() is called"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def step(self, seconds):
+        self.now += seconds
+        return self.now
+
+
+class Keys:
+    """Records press/release calls with the fake time they happened at"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.events = []
+        self.held = set()
+
+    def press(self, key):
+        self.events.append(('press', key, self.clock()))
+        self.held.add(key)
+
+    def release(self, key):
+        self.events.append(('release', key, self.clock()))
+        self.held.discard(key)
+
+
+def make():
+    clock = FakeClock()
+    return clock, ActionScheduler(clock=clock), Keys(clock)
+
+
+def test_tap_presses_now_and_releases_after_duration():
+    clock, scheduler, keys = make()
+    scheduler.tap('w', 0.05, keys.press, keys.release)
+    assert keys.events == [('press', 'w', 100.0)]
+
+    clock.step(0.049)
+    assert scheduler.run_due() == 0
+    assert keys.held == {'w'}
+
+    clock.step(0.001)
+    assert scheduler.run_due() == 1
+    assert keys.events[-1] == ('release', 'w', clock.now)
+    assert keys.held == set()
+    assert scheduler.pending() == 0
+
+
+def test_pulse_alternates_press_and_release():
+    clock, scheduler, keys = make()
+    handles = scheduler.pulse('d', on_time=0.02, off_time=0.03, count=3,
+                              press=keys.press, release=keys.release)
+    assert len(handles) == 6
+    assert keys.events == []
+
+    # Step in 10 ms ticks, as the frame loop would
+    for _ in range(15):
+        scheduler.run_due()
+        clock.step(0.01)
+
+    kinds = [kind for kind, _, _ in keys.events]
+    assert kinds == ['press', 'release'] * 3
+    times = [round(t - 100.0, 3) for _, _, t in keys.events]
+    assert times == [0.0, 0.02, 0.05, 0.07, 0.1, 0.12]
+
+
+def test_sequence_offsets_are_relative_to_previous_step():
+    clock, scheduler, keys = make()
+    scheduler.sequence([
+        (0.0, keys.press, ('shift',)),
+        (0.1, keys.press, ('a',)),
+        (0.2, keys.release, ('a',)),
+        (0.0, keys.release, ('shift',)),
+    ], start_delay=0.5)
+
+    assert scheduler.next_due() == 100.5
+    assert scheduler.run_due(now=100.49) == 0
+    assert scheduler.run_due(now=100.5) == 1
+    assert scheduler.run_due(now=100.6) == 1
+    assert scheduler.run_due(now=100.79) == 0
+    assert scheduler.run_due(now=100.8) == 2
+    assert [(kind, key) for kind, key, _ in keys.events] == [
+        ('press', 'shift'), ('press', 'a'), ('release', 'a'), ('release', 'shift')]
+
+
+def test_cancel_skips_callback():
+    clock, scheduler, keys = make()
+    handle = scheduler.tap('space', 0.1, keys.press, keys.release)
+    scheduler.cancel(handle)
+    assert scheduler.pending() == 0
+
+    clock.step(1.0)
+    assert scheduler.run_due() == 0
+    assert keys.events == [('press', 'space', 100.0)]
+
+    # Cancelling a handle that already ran or never existed is a no-op
+    scheduler.cancel(handle)
+    scheduler.cancel(12345)
+    assert scheduler.pending() == 0
+
+
+def test_equal_due_times_run_in_fifo_order():
+    clock, scheduler, keys = make()
+    order = []
+    for name in 'abcde':
+        scheduler.call_at(101.0, order.append, name)
+    scheduler.call_at(100.5, order.append, 'first')
+
+    assert scheduler.run_due(now=101.0) == 6
+    assert order == ['first', 'a', 'b', 'c', 'd', 'e']
+
+
+def test_callbacks_may_schedule_more_actions():
+    clock, scheduler, keys = make()
+    scheduler.call_later(0.1, scheduler.tap, 'e', 0.1, keys.press, keys.release)
+
+    clock.step(0.1)
+    assert scheduler.run_due() == 1
+    assert keys.held == {'e'}
+    clock.step(0.1)
+    assert scheduler.run_due() == 1
+    assert keys.held == set()
+
+
+def test_stop_flush_releases_held_keys():
+    clock, scheduler, keys = make()
+    scheduler.tap('w', 5.0, keys.press, keys.release)
+    scheduler.tap('a', 10.0, keys.press, keys.release)
+    assert keys.held == {'w', 'a'}
+
+    scheduler.stop(flush=True)
+    assert keys.held == set()
+    assert scheduler.pending() == 0
+
+
+def test_stop_without_flush_drops_pending():
+    clock, scheduler, keys = make()
+    scheduler.tap('w', 5.0, keys.press, keys.release)
+
+    scheduler.stop(flush=False)
+    assert keys.held == {'w'}
+    assert scheduler.pending() == 1